@@ -6,15 +6,61 @@ A KevPaDa module for running real-valued and discrete-valued bidding Tic-Tac-Toe
 """
 
 import math
+import json
+import mmap
+import struct
+from array import array
 import os
 import sys
 import copy
+import random
+import threading
 import time
+from collections import OrderedDict
+import cProfile
+import pstats
+import StringIO
+
+# numpy is optional; it is only needed for the vectorized solvers.
+try:
+	import numpy
+except ImportError:
+	numpy = None
 
 X='X'
 O='O'
 BLANK=' '
 
+# The board is stored as a pair of 9-bit representations, one per player.
+# The most significant bit corresponds to the upper left square, so square
+# i (numbered 0-8 in row-major order) is the bit SQUARE_MASKS[i] and is the
+# move MOVES[i] = (row, col).
+SQUARE_MASKS = [1 << (8-i) for i in range(9)]
+MOVES = [(i / 3, i % 3) for i in range(9)]
+FULL_MASK = 0b111111111
+
+# The eight winning lines: three rows, three columns and two diagonals.
+WIN_MASKS = [0b111000000, 0b000111000, 0b000000111,
+             0b100100100, 0b010010010, 0b001001001,
+             0b100010001, 0b001010100]
+
+# Lookup tables over all 512 representations: IS_WIN[rep] is true if rep
+# covers a winning line, and BLANK_COUNTS[xRep | oRep] is the number of
+# blank squares.
+IS_WIN = [any(rep & mask == mask for mask in WIN_MASKS) for rep in range(512)]
+BLANK_COUNTS = [9 - bin(rep).count('1') for rep in range(512)]
+
+# The eight rotations and reflections of the board.  Symmetry s moves
+# the piece on square i to square SYMMETRIES[s][i]; TRANSFORMS[s][rep]
+# is the 9-bit representation rep moved by symmetry s, and
+# UNMAP[s][SYMMETRIES[s][i]] == i maps squares back.
+SYMMETRIES = [[3*r + c for r,c in [f(row, col) for row,col in MOVES]] for f in [
+	lambda r,c: (r, c),     lambda r,c: (c, 2-r),   lambda r,c: (2-r, 2-c), lambda r,c: (2-c, r),
+	lambda r,c: (r, 2-c),   lambda r,c: (2-r, c),   lambda r,c: (c, r),     lambda r,c: (2-c, 2-r)]]
+TRANSFORMS = [[sum(SQUARE_MASKS[perm[i]] for i in range(9) if rep & SQUARE_MASKS[i]) for rep in range(512)]
+              for perm in SYMMETRIES]
+UNMAP = [[perm.index(i) for i in range(9)] for perm in SYMMETRIES]
+
 PURPLE = '\033[95m'
 BLUE = '\033[94m'
 GREEN = '\033[92m'
@@ -23,9 +69,34 @@ RED = '\033[91m'
 ENDC = '\033[0m'
 
 DEBUG=True
+
+# The agent's share of the chips at the start of a game.  The agent
+# needs slightly more than half of the chips to be sure of winning.
+AGENT_SHARE = 0.51953126
+
+# The games PlayTTT starts solving before the user has chosen one: the
+# real-valued game, then the most common discrete-valued chip counts.
+SPECULATIVE_KEYS = [(O, 'r', 0), (O, 'd', 20), (O, 'd', 10), (O, 'd', 100)]
+
+# Every Richman value of Tic-Tac-Toe is a dyadic rational: a state i
+# steps away from a full state has a value (and optimal bid) with a
+# denominator of at most 2^i.  In fixed-point mode (see TTTRealPlayer),
+# values and bids are stored exactly as integer numerators over
+# RICHMAN_ONE = 2^9.
+RICHMAN_BITS = 9
+RICHMAN_ONE = 1 << RICHMAN_BITS
+
+# The default location of the compiled strategy file (see
+# compileStrategies), next to this module.
+STRATEGY_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), ".strategies")
+
 def debug(string):
-	""" A test/debugging method for printing. """
-	if DEBUG: 
+	"""
+	A test/debugging method for printing.  It prints nothing on a
+	speculative solve's thread, which runs while the user is prompted.
+
+	"""
+	if DEBUG and not _isSpeculative(): 
 		print RED + string + ENDC
 
 def green(string):
@@ -35,120 +106,642 @@ def flush():
 	"""	The conventional ANSI method for clearing the terminal. """
 	print chr(27) + "[2J"
 
-def partitionByDistance():
-	"""
-	This method assumes that a file '.legalStates' exists and contains
-	all legal states, where each line contains two comma-delimited tokens
-        and where the binary form of each token represents the state of a
-        player's pieces on the board. The tokens are encoded in decimal as: x,o
-
-	Suppose x is 111000000 and
-	suppose o is 000110110. Then the bitwise OR of 
-	the two is:  111110110.
-
-	Since the bitwise OR of x and o  has two zeroes (i.e., the
-	correponding TTT has two blanks squares), we say that state x,o 
-	is "two away" from a full board.  For any pair of bitwise tokens
-	that are "two away" from a full board, we write those tokens to a 
-	file 'distance2'.  We do same thing for all k from 0 to 8, where
-	k is the distance away from a full board.  We do not bother with 
-	k = 9, as the only game state that satisfies this is the start state;
-	hence, there is no 'distance9' file.
-
-	This partitions all legal states by their distance from a full state.
-	This is useful because we must calculate Richman and discrete-Richman
-	values backwards-recursively (that is, the Richman value of any state
-	is determined by the Richman values of its child states). With the
-        states partitioned by distance from a full state, and with the knowledge
-        that any child states of a given gamestate must be 1 closer to a full
-        state, we can systematically calculate the Richman values for all
-        terminal nodes (that is, all states in distance0), then for all states
-        in distance1, then in distance2, and so on.
-
-	"""
-	debug(str(time.time()) + "\tPartitioning files by distance...")
-        distances = os.getcwd() + "/.distances"
-        if not os.path.exists(distances):
-                os.makedirs(distances)
-	writers = [None for i in range(9)]
-	for i in range(9):
-		writers[i] = open(".distances/distance" + str(i), "w")
-
-	f = open(".legalStates", "r")
-	lines = f.readlines()
-	f.close()
 
-	for line in lines:
-		s=line.split(',')
-		x=s[0]
-		o=s[1]
-		num=TTTGameNode.numMissing(int(x),int(o))
-		if num == 9: continue
-		writers[num].write(x + "," + o)
+class TTTInstruments:
+	"""
+	Collects telemetry from the solvers and the game loop: phase
+	timers, counters, and latency histograms.  Instrumentation is off
+	until an instance is installed with instrument(); while it is off,
+	each instrumented site costs a single global lookup.
+
+	Phases are timed by name: 'states.enumerate', 'states.index' and
+	'states.transitions' for state loading, and for each solver
+	(prefix 'real', 'discrete' or 'discreteTable') 'generateStrategy',
+	'baseCases' and 'layer1' to 'layer9'.  The counters are
+	'nodesEvaluated', 'childrenGenerated' and 'tableLookups', and the
+	histograms are 'getMoveBid', 'getMoveBids' and 'arbitration'.
+
+	"""
+
+	def __init__(self, callback=None, profile=False):
+		"""
+		INSTANCE VARIABLES:
+		- callback (called with report() by publish(), or None)
+		- profile (whether measure() also runs cProfile)
+		- timers (maps phase names to [calls, total seconds, max seconds])
+		- counters (maps counter names to counts)
+		- histograms (maps names to lists of counts; bucket b counts
+		  latencies under 2**b microseconds, and at least half that)
+		- profiles (maps phase names to cProfile reports, as text)
+
+		"""
+		self.callback = callback
+		self.profile = profile
+		self.timers = {}
+		self.counters = {}
+		self.histograms = {}
+		self.profiles = {}
+		self._profiling = False
+
+	def addTime(self, name, seconds):
+		""" Adds one timing of the named phase. """
+		timer = self.timers.get(name)
+		if timer is None:
+			timer = self.timers[name] = [0, 0.0, 0.0]
+		timer[0] += 1
+		timer[1] += seconds
+		timer[2] = max(timer[2], seconds)
+
+	def count(self, name, n=1):
+		""" Adds n to the named counter. """
+		self.counters[name] = self.counters.get(name, 0) + n
+
+	def observe(self, name, seconds):
+		""" Records one latency in the named histogram. """
+		histogram = self.histograms.get(name)
+		if histogram is None:
+			histogram = self.histograms[name] = []
+		bucket = int(seconds * 1e6).bit_length()
+		if bucket >= len(histogram):
+			histogram.extend([0] * (bucket + 1 - len(histogram)))
+		histogram[bucket] += 1
+
+	def measure(self, name, func, *args):
+		"""
+		Calls func(*args), timing it as the named phase (and profiling
+		it if profile is set), and returns its result.  Only the
+		outermost phase is profiled: a second profiler would turn off the
+		first, so phases measured inside it are only timed.
+
+		"""
+		if not self.profile or self._profiling:
+			start = time.time()
+			result = func(*args)
+			self.addTime(name, time.time() - start)
+			return result
+		profiler = cProfile.Profile()
+		start = time.time()
+		self._profiling = True
+		try:
+			result = profiler.runcall(func, *args)
+		finally:
+			self._profiling = False
+		self.addTime(name, time.time() - start)
+		output = StringIO.StringIO()
+		pstats.Stats(profiler, stream=output).sort_stats('cumulative').print_stats(30)
+		self.profiles[name] = output.getvalue()
+		return result
+
+	def report(self):
+		""" Returns everything collected so far as a dictionary. """
+		timers = dict((name, {'calls':calls, 'seconds':total, 'max':high})
+		              for name,(calls,total,high) in self.timers.items())
+		histograms = {}
+		for name,histogram in self.histograms.items():
+			histograms[name] = dict(('<%dus' % (1 << b), n) for b,n in enumerate(histogram) if n)
+		return {'timers':timers, 'counters':dict(self.counters),
+		        'histograms':histograms, 'profiles':dict(self.profiles)}
+
+	def publish(self):
+		""" Passes report() to the callback, if there is one. """
+		if self.callback is not None:
+			self.callback(self.report())
+
+	def dump(self, path):
+		""" Writes report() to the given file as JSON. """
+		f = open(path, 'w')
+		json.dump(self.report(), f, indent=2, sort_keys=True)
+		f.close()
+
+	def reset(self):
+		""" Discards everything collected so far. """
+		self.timers = {}
+		self.counters = {}
+		self.histograms = {}
+		self.profiles = {}
+
+
+# The installed TTTInstruments, or None while instrumentation is off.
+_instruments = None
+
+def instrument(instruments):
+	"""
+	Installs the given TTTInstruments for the whole module, or turns
+	instrumentation off if instruments is None.  Returns the instance
+	that was installed before.
+
+	"""
+	global _instruments
+	previous = _instruments
+	_instruments = instruments
+	return previous
+
+def _measure(name, func, *args):
+	""" Calls func(*args), as TTTInstruments.measure() if instrumentation is on. """
+	if _instruments is None:
+		return func(*args)
+	return _instruments.measure(name, func, *args)
+
+def _recordLayer(instruments, solver, i, start, nodes, children):
+	""" Records the time and counts of one distance layer of a solver. """
+	instruments.addTime('%s.layer%d' % (solver, i), time.time() - start)
+	instruments.count('nodesEvaluated', nodes)
+	instruments.count('childrenGenerated', children)
+
+
+class TTTSolveCancelled(Exception):
+	""" Raised inside a solver when its speculative solve has been cancelled. """
+	pass
+
+# Solves on a TTTSpeculativeSolver's thread see its cancellation event here;
+# the solvers check it once per distance layer.
+_solveControl = threading.local()
+
+def _isSpeculative():
+	""" Returns true on a TTTSpeculativeSolver's thread. """
+	return getattr(_solveControl, 'cancel', None) is not None
+
+def _checkCancelled():
+	""" Raises TTTSolveCancelled if this thread's speculative solve was cancelled. """
+	cancel = getattr(_solveControl, 'cancel', None)
+	if cancel is not None and cancel.is_set():
+		raise TTTSolveCancelled()
+
+_layers = None
+
+def enumerateStates():
+	"""
+	Returns all legal states, partitioned by their distance from a full
+	state, as a list of 10 lists: the k-th list holds the (x, o) pairs
+	of bit representations of every legal state with k blank squares.
+	Within a list, states are sorted by their bit representations.
+
+	Since either player may win a bid, the legal states are exactly
+	those reached from the start state by placing X's and O's in any
+	order, never moving from a state that is won or full.  They are
+	enumerated in memory, one layer from the one before, the first time
+	this function is called, and cached for the life of the process.
+
+	Partitioning by distance is useful because we must calculate Richman
+	and discrete-Richman values backwards-recursively (that is, the
+	Richman value of any state is determined by the Richman values of
+	its child states).  Since any child of a given state is 1 closer to
+	a full state, we can systematically calculate the values for all
+	terminal nodes (that is, all states with 0 blanks), then for all
+	states with 1 blank, then with 2 blanks, and so on.
+
+	"""
+	global _layers
+	if _layers is None:
+		_layers = _measure('states.enumerate', _enumerateLayers)
+	return _layers
+
+
+def _enumerateLayers():
+	layers = [[] for k in range(10)]
+	layers[9].append((0, 0))
+	for k in range(9, 0, -1):
+		children = set()
+		for xRep,oRep in layers[k]:
+			if IS_WIN[xRep] or IS_WIN[oRep]:
+				continue
+			bits = xRep | oRep
+			for mask in SQUARE_MASKS:
+				if not (bits & mask):
+					children.add((xRep | mask, oRep))
+					children.add((xRep, oRep | mask))
+		layers[k-1] = sorted(children)
+	return layers
+
+
+def iterNodes(i):
+	"""
+	Returns an iterator over TTTGameNodes for all legal states that are
+	i steps away from a full state (see enumerateStates).
 
-	for writer in writers:
-		writer.close()
+	"""
+	for xRep,oRep in enumerateStates()[i]:
+		yield TTTGameNode(xRep=xRep, oRep=oRep)
 
 
 def getNodes(i):
 	"""
-	Returns a list of nodes read from a specified 'distance_' file.
-	Each line in the specified file will contain two comma-delimited
-	tokens in the form:
-	x,o
-	where each token will be some non-negative integer written in
-	decimal form. The bitwise representations of x and o encode
-	the locations of X's pieces and the locations of O's pieces,
-	respectively.  In particular, each bitwise representation consists
-	of 9 bits that correspond to the 9 squares of a TTT board, and
-	a 1-bit represents that there is a piece in the corresponding
-	square.
+	Returns a list of TTTGameNodes for all legal states that are i steps
+	away from a full state (see enumerateStates).
+
+	"""
+	return list(iterNodes(i))
+
+
+_stateIndex = None
+
+def getStateIndex():
+	"""
+	Returns the TTTStateIndex over all legal states.  The index is built
+	on the first call and shared by every caller for the life of the
+	process.
+
+	"""
+	global _stateIndex
+	if _stateIndex is None:
+		_stateIndex = _measure('states.index', TTTStateIndex)
+	return _stateIndex
+
+
+def canonicalForm(xRep, oRep):
+	"""
+	Returns (xRep, oRep, symmetry) for the canonical form of the given
+	state: of the (up to) eight rotations and reflections of the board,
+	the one with the smallest key (xRep << 9) | oRep.  symmetry is the
+	index into SYMMETRIES of the transformation that produces it; the
+	identity is preferred, so a canonical state maps to itself with
+	symmetry 0.
+
+	"""
+	best = None
+	for s in range(8):
+		key = (TRANSFORMS[s][xRep] << 9) | TRANSFORMS[s][oRep]
+		if best is None or key < best:
+			best = key
+			symmetry = s
+	return best >> 9, best & FULL_MASK, symmetry
+
+
+def orientMove(move, symmetry):
+	"""
+	Maps a move on the canonical form of a state (see canonicalForm)
+	back to the orientation of the state itself, given the symmetry
+	that produced the canonical form.
+
+	"""
+	row,col = move
+	return MOVES[UNMAP[symmetry][3*row + col]]
+
+
+class TTTStateIndex:
+
+	"""
+	A collision-free ranking of every legal state, up to rotation and
+	reflection, into a contiguous integer index 0, 1, ..., size()-1, so
+	that value and strategy tables can be flat arrays indexed by state
+	rather than dictionaries keyed by TTTGameNode objects.
+
+	Only canonical states (see canonicalForm) are ranked, and every
+	other legal state shares the index of its canonical form, since the
+	two have the same values.  This makes tables and solving close to
+	eight times smaller.  Moves stored for a canonical state are mapped
+	back to the orientation of the state asked about with orientMove.
+
+	States are ranked layer by layer: the states that are i steps away
+	from a full state occupy the contiguous block of indices
+	layerStart[i] to layerStart[i+1]-1.  A state's rank and symmetry are
+	found with single list lookups on its 18-bit key (xRep << 9) | oRep.
+
+	"""
+
+	def __init__(self):
+		"""
+		INSTANCE VARIABLES:
+		- xReps (the X bit representation of each canonical state)
+		- oReps (the O bit representation of each canonical state)
+		- layerStart (the first index of each distance layer, plus the size)
+		- ranks (maps 18-bit keys to the index of their canonical form,
+		  or -1 for illegal states)
+		- symmetries (maps 18-bit keys to the symmetry that produces
+		  their canonical form)
+
+		"""
+		self.xReps = []
+		self.oReps = []
+		self.layerStart = []
+		self.ranks = [-1] * (1 << 18)
+		self.symmetries = bytearray(1 << 18)
+		self._locateArrays = None
+
+		layers = enumerateStates()
+		for i in range(10):
+			self.layerStart.append(len(self.xReps))
+			for stateX,stateO in layers[i]:
+				xRep,oRep,symmetry = canonicalForm(stateX, stateO)
+				canonicalKey = (xRep << 9) | oRep
+				if self.ranks[canonicalKey] == -1:
+					self.ranks[canonicalKey] = len(self.xReps)
+					self.xReps.append(xRep)
+					self.oReps.append(oRep)
+				key = (stateX << 9) | stateO
+				self.ranks[key] = self.ranks[canonicalKey]
+				self.symmetries[key] = symmetry
+		self.layerStart.append(len(self.xReps))
+
+	def size(self):
+		""" Returns the number of canonical legal states. """
+		return len(self.xReps)
+
+	def rank(self, xRep, oRep):
+		"""
+		Returns the index of the state with the given bit
+		representations.  Raises ValueError if the state is not legal.
+
+		"""
+		idx = self.ranks[(xRep << 9) | oRep]
+		if idx < 0:
+			raise ValueError("illegal state: (%d, %d)" % (xRep, oRep))
+		return idx
+
+	def locate(self, xRep, oRep):
+		"""
+		Returns the (index, symmetry) pair of the state with the given
+		bit representations, where symmetry produces its canonical form.
+		Raises ValueError if the state is not legal.
+
+		"""
+		key = (xRep << 9) | oRep
+		idx = self.ranks[key]
+		if idx < 0:
+			raise ValueError("illegal state: (%d, %d)" % (xRep, oRep))
+		return idx, self.symmetries[key]
+
+	def locateArrays(self):
+		"""
+		Returns (ranks, symmetries) as numpy arrays over all 18-bit
+		keys, for locating many states at once.  Requires numpy; the
+		arrays are built once and cached.
+
+		"""
+		if self._locateArrays is None:
+			self._locateArrays = (numpy.array(self.ranks, dtype=numpy.int32),
+			                      numpy.frombuffer(bytes(self.symmetries), dtype=numpy.uint8))
+		return self._locateArrays
+
+	def layer(self, i):
+		""" Returns the range of indices of the states i steps away from a full state. """
+		return range(self.layerStart[i], self.layerStart[i+1])
+
+	def getNode(self, index):
+		""" Returns a TTTGameNode for the state with the given index. """
+		return TTTGameNode(xRep=self.xReps[index], oRep=self.oReps[index])
+
+
+_transitionTable = None
+
+def getTransitionTable():
+	"""
+	Returns the TTTTransitionTable over the shared TTTStateIndex.  The
+	table is built on the first call and shared by every solver for the
+	life of the process.
+
+	"""
+	global _transitionTable
+	if _transitionTable is None:
+		_transitionTable = _measure('states.transitions', TTTTransitionTable, getStateIndex())
+	return _transitionTable
+
+
+class TTTTransitionTable:
+
+	"""
+	The one-time transition table over a TTTStateIndex.  For every state
+	index it holds the winner of the state (if any) and, for each mover,
+	the indices of the children reachable by each legal move, so that
+	solving is a matter of table lookups rather than generating children.
+
+	"""
 
-	A list of TTTGameNodes, each generated from a line (i.e., a pair of bit
-	representations), is returned once the file has been completely read.
+	def __init__(self, index):
+		"""
+		INSTANCE VARIABLES:
+		- winner (X or O if that player has won the state, else None)
+		- terminal (true if the state is won or full)
+		- squares (the legal squares of each state, in row-major order)
+		- children (maps each mover to, for each state, the list of child
+		  indices in the same order as squares)
+
+		"""
+		size = index.size()
+		self.winner = [None] * size
+		self.terminal = [False] * size
+		self.squares = [[] for idx in range(size)]
+		self.children = {X:[[] for idx in range(size)], O:[[] for idx in range(size)]}
+		self._arrays = {}
+
+		for idx in range(size):
+			xRep = index.xReps[idx]
+			oRep = index.oReps[idx]
+			if IS_WIN[xRep]:
+				self.winner[idx] = X
+			elif IS_WIN[oRep]:
+				self.winner[idx] = O
+			bits = xRep | oRep
+			if self.winner[idx] is not None or bits == FULL_MASK:
+				self.terminal[idx] = True
+				continue
+			for i in range(9):
+				mask = SQUARE_MASKS[i]
+				if bits & mask: continue
+				self.squares[idx].append(i)
+				self.children[X][idx].append(index.rank(xRep | mask, oRep))
+				self.children[O][idx].append(index.rank(xRep, oRep | mask))
+
+	def childMatrix(self, player):
+		"""
+		Returns a flat list of 9 entries per state, where entry
+		9*idx + i is the index of the child reached when player moves
+		on square i of state idx, or -1 if that move is illegal.
+
+		"""
+		matrix = [-1] * (9 * len(self.winner))
+		for idx in range(len(self.winner)):
+			for i,child in zip(self.squares[idx], self.children[player][idx]):
+				matrix[9*idx + i] = child
+		return matrix
+
+	def childArray(self, player):
+		"""
+		Returns childMatrix(player) as a (size, 9) numpy array.
+		Requires numpy; the array is built once and cached.
+
+		"""
+		key = ('children', player)
+		if key not in self._arrays:
+			matrix = numpy.array(self.childMatrix(player), dtype=numpy.int32)
+			self._arrays[key] = matrix.reshape(-1, 9)
+		return self._arrays[key]
+
+	def winArray(self, player):
+		"""
+		Returns a boolean numpy array that is true at the states won by
+		player.  Requires numpy; the array is built once and cached.
+
+		"""
+		key = ('win', player)
+		if key not in self._arrays:
+			self._arrays[key] = numpy.array([w == player for w in self.winner])
+		return self._arrays[key]
+
+	def liveRows(self, index, i):
+		"""
+		Returns a numpy array of the indices of the non-terminal states
+		i steps away from a full state.  Requires numpy; the array is
+		built once and cached.
+
+		"""
+		key = ('live', i)
+		if key not in self._arrays:
+			rows = [idx for idx in index.layer(i) if not self.terminal[idx]]
+			self._arrays[key] = numpy.array(rows, dtype=numpy.int32)
+		return self._arrays[key]
+
+
+def _childExtrema(values, myKids, oppKids):
+	"""
+	A helper for the vectorized solvers.  Given an array of values
+	indexed by state and blocks of child indices (one row of 9 squares
+	per state, -1 for illegal moves), returns the minimum value over each
+	row of myKids, the square that attains it (the first in row-major
+	order, as in the scalar solvers) and the maximum value over each row
+	of oppKids.  If values has further axes (e.g. one column per total
+	chip count), the results carry those axes too.
+
+	"""
+	if values.dtype.kind == 'f':
+		low,high = -numpy.inf,numpy.inf
+	else:
+		# Integer values (fixed point) stay integers.
+		low,high = numpy.iinfo(values.dtype).min,numpy.iinfo(values.dtype).max
+	extraAxes = (1,) * (values.ndim - 1)
+	myLegal = (myKids >= 0).reshape(myKids.shape + extraAxes)
+	oppLegal = (oppKids >= 0).reshape(oppKids.shape + extraAxes)
+	myValues = numpy.where(myLegal, values[myKids], values.dtype.type(high))
+	oppValues = numpy.where(oppLegal, values[oppKids], values.dtype.type(low))
+	return myValues.min(axis=1), myValues.argmin(axis=1), oppValues.max(axis=1)
+
+
+def _discreteCase(Fmin, Fmax):
 	"""
-	if i == 9:
-		return [TTTGameNode()]
+	Returns the (discrete-Richman value, optimal bid) pair of a state
+	whose children have the given Fmin and Fmax, by the four cases of
+	TTTDiscretePlayer.generateStrategy.
 
-	w = open(".distances/distance" + str(i), "r")
-	nodeReps = w.readlines()
-	w.close()
+	"""
+	FmaxVal = math.floor(Fmax)
+	FminVal = math.floor(Fmin)
+	Fsum = FmaxVal + FminVal
+
+	# If Fsum is odd and Fmin \in \N*
+	if (Fsum % 2 == 1) and FminVal < Fmin:
+		epsilon = 1.0
+		bid = math.floor(abs(FmaxVal-FminVal)/2.0) * 1.0
+	# Else if Fsum is odd and Fmin \in \N
+	elif (Fsum % 2 == 1) and FminVal == Fmin:
+		epsilon = 0.5
+		bid = math.floor(abs(FmaxVal-FminVal)/2.0) + 0.25
+	# Else if Fsum is even and Fmin \in \N*
+	elif (Fsum % 2 == 0) and FminVal < Fmin:
+		epsilon = 0.5
+		bid = max(0,abs(FmaxVal-FminVal)/2.0 - 0.75)
+	# Else (i.e., if Fsum is even and Fmin \in \N)
+	else:
+		epsilon = 0.0
+		bid = abs(FmaxVal-FminVal)/2.0
+
+	return math.floor(Fsum/2.0) + epsilon, bid
+
+
+def _discreteCases(Fmin, Fmax):
+	"""
+	A helper for the vectorized discrete solvers.  Applies the four
+	cases of TTTDiscretePlayer.generateStrategy elementwise to arrays of
+	Fmin and Fmax, and returns the arrays of discrete-Richman values and
+	optimal bids (including the 0.25 marker).
+
+	"""
+	FmaxVal = numpy.floor(Fmax)
+	FminVal = numpy.floor(Fmin)
+	Fsum = FmaxVal + FminVal
+	half = abs(FmaxVal-FminVal)/2.0
+	odd = (Fsum % 2 == 1)
+	starred = FminVal < Fmin
 
-	nodes = []
-	for nodeRep in nodeReps:
-		xRep,oRep = nodeRep.split(",")
-		board = TTTGameNode.generateBoard(int(xRep),int(oRep))
-		node = TTTGameNode(board)
-		nodes.append(node)
-	return nodes
+	cases = [odd & starred, odd & ~starred, ~odd & starred]
+	epsilon = numpy.select(cases, [1.0, 0.5, 0.5], 0.0)
+	bids = numpy.select(cases, [numpy.floor(half), numpy.floor(half) + 0.25,
+	                            numpy.maximum(0, half - 0.75)], half)
+	return numpy.floor(Fsum/2.0) + epsilon, bids
 
 
 
 
-class TTTGameNode:
+# Every TTTGameNode ever made, by 18-bit key (xRep << 9) | oRep.  There are at
+# most 3**9 boards, so the table stays small.
+_internedNodes = {}
+
+# TTTGameNodes are immutable; the constructor and the lazily linked caches
+# set their slots through object.__setattr__.
+_setSlot = object.__setattr__
+
+class TTTGameNode(object):
 
 	"""
 	A basic data structure that stores a TTT board state and facilitates
 	generating legal moves, generating children states, checking if it is
 	a win state, etc.
 
+	The state is stored only as the pair of 9-bit representations
+	(xRep, oRep); every query below is answered with bitwise operations
+	on that pair.  The board (list of lists) is only built on request,
+	by getBoard() or for printing.
+
+	Nodes are interned flyweights: each state has exactly one immutable
+	instance, which the constructor, generateChild and generateChildren
+	return every time.  A node links to its children as they are first
+	generated, and caches its location in the shared TTTStateIndex, so
+	the solvers and the game loop allocate no nodes after the first
+	visit, and equality is an identity check.
+
 	"""
 
-	def __init__(self, board=None):
+	__slots__ = ('xRep', 'oRep', 'key', 'terminal', 'winner', '_children', '_childLists', '_location')
+
+	def __new__(cls, board=None, xRep=0, oRep=0):
 		"""
-		Constructs a TTTGameNode given a board (list of lists).
-		If no board is given, the board defaults to blanks.
+		Returns the TTTGameNode given a board (list of lists), or
+		given the 9-bit representations of X's and O's pieces.
+		If neither is given, the board defaults to blanks.
 		INSTANCE VARIABLES:
-		- board
 		- xRep
 		- oRep
-
-		"""
-		if not board:
-			self.board = [[BLANK,BLANK,BLANK],[BLANK,BLANK,BLANK],[BLANK,BLANK,BLANK]]
-		else:
-			self.board = self._unsharedCopy(board)
-		self.xRep,self.oRep = TTTGameNode.generateBitReps(self.board)
+		- key (the 18-bit key (xRep << 9) | oRep)
+		- terminal (true if the board is full or won)
+		- winner (X or O if that player has a line, otherwise None)
+
+		"""
+		if board:
+			xRep,oRep = TTTGameNode.generateBitReps(board)
+		key = (xRep << 9) | oRep
+		node = _internedNodes.get(key)
+		if node is not None:
+			return node
+		node = object.__new__(cls)
+		_setSlot(node, 'xRep', xRep)
+		_setSlot(node, 'oRep', oRep)
+		_setSlot(node, 'key', key)
+		_setSlot(node, 'winner', X if IS_WIN[xRep] else (O if IS_WIN[oRep] else None))
+		_setSlot(node, 'terminal', node.winner is not None or (xRep | oRep) == FULL_MASK)
+		_setSlot(node, '_children', None)
+		_setSlot(node, '_childLists', None)
+		_setSlot(node, '_location', None)
+		# setdefault keeps the first instance if two threads race here.
+		return _internedNodes.setdefault(key, node)
+
+	def __setattr__(self, name, value):
+		raise AttributeError("TTTGameNode objects are immutable")
+
+	def __delattr__(self, name):
+		raise AttributeError("TTTGameNode objects are immutable")
+
+	def __reduce__(self):
+		# Unpickling and copying return the interned instance.
+		return (TTTGameNode, (None, self.xRep, self.oRep))
 
 	def generateMove(self, nextNode):
 		"""
@@ -156,20 +749,18 @@ class TTTGameNode:
 		nextNode is assumed to be a legal successor of this node.
 
 		"""
-		nextBoard = nextNode.getBoard()
-		for row in range(3):
-			for col in range(3):
-				if self.board[row][col] != nextBoard[row][col]: 
-					return row,col
-		return 0,0
+		diff = (self.xRep | self.oRep) ^ (nextNode.xRep | nextNode.oRep)
+		if not diff:
+			return 0,0
+		return MOVES[9 - diff.bit_length()]
 
 	def getXRep(self):
 		"""
 		Returns the 9-bit representation for X's pieces on the board.
 		xRep, which is stored as an instance variable, is 111000000 for
-                the following board.
+		the following board.
 
-		 X | X | X 
+		 X | X | X
 		---+---+---
 		 O | O |
 		---+---+---
@@ -182,60 +773,62 @@ class TTTGameNode:
 		"""
 		Returns the 9-bit representation for O's pieces on the board.
 		oRep, which is stored as an instance variable, is 000110110 for
-                the following board.
-	       
-		 X | X | X  
+		the following board.
+
+		 X | X | X
 		---+---+---
-		 O | O |    
+		 O | O |
 		---+---+---
-		 O | O |    
+		 O | O |
 
 		"""
 		return self.oRep
 
+	def getRep(self, player):
+		""" Returns the 9-bit representation for the given player's pieces. """
+		if player == X:
+			return self.xRep
+		return self.oRep
+
 	def isWin(self,player):
 		"""
-		Returns true if this TTTGameNode's board is a win for the given player 
+		Returns true if this TTTGameNode's board is a win for the given player
 		(either an 'X' or 'O' char).
 
 		"""
-		board = self.board
-		return     ((board[0][0] == board[0][1] == board[0][2] == player) \
-				or  (board[1][0] == board[1][1] == board[1][2] == player) \
-				or  (board[2][0] == board[2][1] == board[2][2] == player) \
-				or  (board[0][0] == board[1][0] == board[2][0] == player) \
-				or  (board[0][1] == board[1][1] == board[2][1] == player) \
-				or  (board[0][2] == board[1][2] == board[2][2] == player) \
-				or  (board[0][0] == board[1][1] == board[2][2] == player) \
-				or  (board[0][2] == board[1][1] == board[2][0] == player))
+		return TTTGameNode.isWinRep(self.getRep(player))
 
-	def getBoard(self):
-		"""
-		Returns a deep copy of the board.
+	def index(self):
+		""" Returns this node's index in the shared TTTStateIndex. """
+		return getStateIndex().rank(self.xRep, self.oRep)
 
-		"""
-		return self._unsharedCopy(self.board)
+	def locate(self):
+		""" Returns this node's (index, symmetry) pair in the shared TTTStateIndex. """
+		location = self._location
+		if location is None:
+			location = getStateIndex().locate(self.xRep, self.oRep)
+			_setSlot(self, '_location', location)
+		return location
+
+	def isBlank(self, row, col):
+		""" Returns true if the square at (row, col) is unoccupied. """
+		return not ((self.xRep | self.oRep) & SQUARE_MASKS[3*row + col])
 
-	def _unsharedCopy(self,inList):
+	def getBoard(self):
 		"""
-		Returns a deep copy of something.
-		If given a list, this _unsharedCopy function maps itself over all 
-		elements of the given list. This is especially important for
-		getBoard(), since the boards of new TTTGameNode objects must not point
-		to the boards of any other TTTGameNode objects.
+		Returns the board (list of lists) built from the bit representations.
+		A new board is built on every call, so the caller may modify it.
 
 		"""
-		if isinstance(inList, list):
-			return list( map(self._unsharedCopy, inList) )
-		return inList
+		return TTTGameNode.generateBoard(self.xRep, self.oRep)
 
 	def isTerminal(self):
 		"""
 		Terminal states are either full or won.
 
 		"""
-		return self.isWin(X) or self.isWin(O) or self._isFull()
-	
+		return self.terminal
+
 	def generateLegalMoves(self):
 		"""
 		Returns a list of possible next moves, where a move is a (row, column)
@@ -243,14 +836,10 @@ class TTTGameNode:
 		This method is called in generateChildren(player).
 
 		"""
-		if self.isTerminal():
+		if self.terminal:
 			return []
-		legalMoves = []
-		for row in range(3):
-			for col in range(3):
-				if self.board[row][col] == BLANK:
-					legalMoves.append((row,col))
-		return legalMoves
+		bits = self.xRep | self.oRep
+		return [MOVES[i] for i in range(9) if not (bits & SQUARE_MASKS[i])]
 
 	def generateChild(self, player, (row,col)):
 		"""
@@ -258,74 +847,88 @@ class TTTGameNode:
 		the (row,col) tuple.
 		player is a character, either 'X' or 'O'
 		move is a tuple of the form (row, column).
-		
+
 		"""
-		board = self.getBoard()
-		board[row][col] = player
-		return TTTGameNode(board)
+		square = 3*row + col
+		children = self._children
+		if children is None:
+			children = [None] * 18
+			_setSlot(self, '_children', children)
+		slot = square if player == X else square + 9
+		child = children[slot]
+		if child is None:
+			mask = SQUARE_MASKS[square]
+			if player == X:
+				child = TTTGameNode(xRep=self.xRep | mask, oRep=self.oRep & ~mask)
+			else:
+				child = TTTGameNode(xRep=self.xRep & ~mask, oRep=self.oRep | mask)
+			children[slot] = child
+		return child
 
 	def generateChildren(self, player):
 		"""
-		Returns a list of all the possible next states / nodes.
-		Note: TTTGameNode makes a deep copy of the passed board.
-		
+		Returns a list of all the possible next states / nodes, in the
+		same (row-major) order as generateLegalMoves().
+
 		"""
-		children = []
-		board = self.getBoard()
-		for row,col in self.generateLegalMoves():
-			board[row][col] = player
-			children.append(TTTGameNode(board)) 
-			board[row][col] = BLANK 
-		return children
+		if self.terminal:
+			return []
+		childLists = self._childLists
+		if childLists is None:
+			childLists = [None, None]
+			_setSlot(self, '_childLists', childLists)
+		side = 0 if player == X else 1
+		kids = childLists[side]
+		if kids is None:
+			bits = self.xRep | self.oRep
+			kids = childLists[side] = tuple(self.generateChild(player, MOVES[i])
+			                                for i in range(9) if not (bits & SQUARE_MASKS[i]))
+		return list(kids)
 
 	def generateLastMoves(self):
 		"""
 		Returns a list of all possible moves that could have led
 		to the current gamenode.
-		
+
 		"""
-		board = self.getBoard()
 		lastMoves = []
-		for row in range(3):
-			for col in range(3):
-				if board[row][col] != BLANK:
-					player = board[row][col]
-					board[row][col] = BLANK
-					if not self.isWin(board):
-						lastMoves.append((row,col))
-					board[row][col] = player
-		return lastMoves			   
+		for i in range(9):
+			mask = SQUARE_MASKS[i]
+			if (self.xRep | self.oRep) & mask:
+				# The parent must not already have been a win.
+				xRep = self.xRep & ~mask
+				oRep = self.oRep & ~mask
+				if not (TTTGameNode.isWinRep(xRep) or TTTGameNode.isWinRep(oRep)):
+					lastMoves.append(MOVES[i])
+		return lastMoves
 
 	def generateParent(self,lastMove):
 		"""
 		Given a legal lastMove, returns a parent that is the result
 		of undoing lastMove.
-		
-		"""
 
-		board = self.getBoard()
+		"""
 		row,col = lastMove
-		board[row][col] = BLANK
-		return TTTGameNode(board)
+		mask = SQUARE_MASKS[3*row + col]
+		return TTTGameNode(xRep=self.xRep & ~mask, oRep=self.oRep & ~mask)
 
 
 	def __hash__(self):
-		return (hash(self.board[0][0]) ^ hash(self.xRep)) >> 1
+		return self.key
 
 	def __eq__(self,other):
-		otherBoard = other.getBoard()
-		for row in range(3):
-			for col in range(3):
-				if otherBoard[row][col] != self.board[row][col]:
-					return False
-		return True
+		return self is other
+
+	def __ne__(self,other):
+		return self is not other
 
 	def __str__(self):
-		return ' '+self.board[0][0]+' | '+self.board[0][1]+' | '+self.board[0][2]+' \n'+\
+		board = self.getBoard()
+		return ' '+board[0][0]+' | '+board[0][1]+' | '+board[0][2]+' \n'+\
 		       '---+---+---\n'+\
-		       ' '+self.board[1][0]+' | '+self.board[1][1]+' | '+self.board[1][2]+' \n'+\
+		       ' '+board[1][0]+' | '+board[1][1]+' | '+board[1][2]+' \n'+\
 		       '---+---+---\n'+\
-		       ' '+self.board[2][0]+' | '+self.board[2][1]+' | '+self.board[2][2]+' \n'
+		       ' '+board[2][0]+' | '+board[2][1]+' | '+board[2][2]+' \n'
 
 	@staticmethod
 	def generateBoard(intX, intO):
@@ -336,77 +939,72 @@ class TTTGameNode:
 		For instance, the bit representations are
 		111000000 for X and 000110110 for O in the following board:
 
-		 X | X | X  
+		 X | X | X
 		---+---+---
-		 O | O |    
+		 O | O |
 		---+---+---
-		 O | O |    
+		 O | O |
 
 		"""
 		board = [[BLANK,BLANK,BLANK],[BLANK,BLANK,BLANK],[BLANK,BLANK,BLANK]]
-		# We mask the most signficant bit (i.e., the upper left board space) first
-		mask = 0b100000000 
-		for row in range(3):
-			for col in range(3):
-				# ((intX & 1) == 1) and ((intO & 1) == 1) are mutually exclusive.
-				if intX & mask:
-					board[row][col] = X
-				elif intO & mask:
-					board[row][col] = O
-				# Shift the mask right to get the next bit/space for next iteration
-				mask >>= 1 
+		for i in range(9):
+			# intX & mask and intO & mask are mutually exclusive.
+			row,col = MOVES[i]
+			if intX & SQUARE_MASKS[i]:
+				board[row][col] = X
+			elif intO & SQUARE_MASKS[i]:
+				board[row][col] = O
 		return board
 
 	@staticmethod
 	def generateBitReps(board):
 		"""
 		Returns a tuple of 9-bit representations (x,o).
-		This method is private and only called in TTTGameNode's constructor.
+		This method is only called in TTTGameNode's constructor.
 		For instance, the X bit representation is 111000000 and
 		the O bit representation is 000110110 for the following board:
 
-		 X | X | X  
+		 X | X | X
 		---+---+---
-		 O | O |    
+		 O | O |
 		---+---+---
-		 O | O |    
+		 O | O |
 
 		"""
 		intX = 0
 		intO = 0
-		mask = 0b100000000
-		for row in range(3):
-			for col in range(3):
-				if board[row][col] == X:
-					intX += mask
-				elif board[row][col] == O:
-					intO += mask
-				mask >>= 1
+		for i in range(9):
+			row,col = MOVES[i]
+			if board[row][col] == X:
+				intX |= SQUARE_MASKS[i]
+			elif board[row][col] == O:
+				intO |= SQUARE_MASKS[i]
 		return (intX, intO)
 
+	@staticmethod
+	def isWinRep(rep):
+		"""
+		Returns true if the given 9-bit representation of one player's
+		pieces covers any of the eight winning lines.
+
+		"""
+		return IS_WIN[rep]
+
 	@staticmethod
 	def numMissing(xRep,oRep):
-		""" 
+		"""
 		Returns the number of blanks (zeroes) in the
 		two given bit representations for X and O.
 
 		"""
-		bits = xRep | oRep
-		count = 0
-		for i in range(9):
-			if (bits & 1) == 0: count += 1
-			bits = bits >> 1
-		return count
+		return BLANK_COUNTS[xRep | oRep]
 
 	def _isFull(self):
 		"""
 		Returns true if the board is full and the game has ended.
-		
+
 		"""
-		for row in range(3):
-			for col in range(3):
-				if self.board[row][col] == BLANK: return False
-		return True
+		return (self.xRep | self.oRep) == FULL_MASK
 
 
 
@@ -417,37 +1015,56 @@ class TTTDiscretePlayer:
 
 	"""
 
-	def __init__(self,player,totalChips):
+	def __init__(self,player,totalChips,vectorized=False):
+		"""
+		INSTANCE VARIABLES:
+		- player (either 'X' or 'O')
+		- opponent (the opposite of player)
+		- totalChips (the total number of chips in play)
+		- vectorized (whether to solve with numpy array operations)
+		- nodesToDiscreteRich (maps states/nodes to discrete-Richman values)
+		- nodesToMoveBid (maps states/nodes to (move,bid) tuples)
+
+		"""
 		self.player = player
 		self.opponent = PlayTTT.getOpponent(player)
 		self.totalChips = totalChips
+		self.vectorized = vectorized
 
-		# nodesToDiscreteRich is a list of dictionaries that hold
-		# entries of the form
-		#
-		# gameNode : discrete-Richman value.
-		#
-		# The nodes are partitioned by their distance away from a
-		# full state, such that nodesToDiscreteRich[k] carries all
-		# entries with node-keys that are k steps away from a full
-		# state.
-		self.nodesToDiscreteRich = [{},{},{},{},{},{},{},{},{},{}]
-
-		# nodesToMoveBid is a list of dictionaries that hold
-		# entries of the form
+		# nodesToDiscreteRich is a flat array that holds the
+		# discrete-Richman value of every node at the node's index
+		# in the shared TTTStateIndex (see TTTGameNode.index()).
+		self.nodesToDiscreteRich = array('d', [0.0]) * getStateIndex().size()
+
+		# nodesToMoveBid is a flat list that holds, at the index of
+		# each non-terminal node, the tuple
 		#
-		# gameNode : (optimalMove, optimalBid),
+		# (optimalMove, optimalBid),
 		#
-		# where optimalMove is of the form (row, col). The nodes 
-		# are partitioned by their distance away from a full state
-		self.nodesToMoveBid = [{},{},{},{},{},{},{},{},{},{}]
+		# where optimalMove is of the form (row, col).  Terminal
+		# nodes have no entry (None).
+		self.nodesToMoveBid = [None] * getStateIndex().size()
 
-		self.generateStrategy()
+		_measure('discrete.generateStrategy', self.generateStrategy)
 
 	def getMoveBid(self,currentNode):
-		numBlanks = TTTGameNode.numMissing(currentNode.getXRep(),currentNode.getORep())
-		move,bid = self.nodesToMoveBid[numBlanks][currentNode]
-		return move,bid
+		idx,symmetry = currentNode.locate()
+		move,bid = self.nodesToMoveBid[idx]
+		return orientMove(move, symmetry),bid
+
+	def getMoveBids(self,nodes):
+		""" Returns the list of (move, bid) tuples for a list of nodes. """
+		locate = getStateIndex().locate
+		moveBids = []
+		for node in nodes:
+			idx,symmetry = locate(node.xRep, node.oRep)
+			move,bid = self.nodesToMoveBid[idx]
+			moveBids.append((orientMove(move, symmetry), bid))
+		return moveBids
+
+	def getValue(self,currentNode):
+		""" Returns the discrete-Richman value of the specified node. """
+		return self.nodesToDiscreteRich[currentNode.index()]
 
 	def generateStrategy(self):
 
@@ -457,19 +1074,16 @@ class TTTDiscretePlayer:
 		"""
 
 		debug(str(time.time()) + "\tGenerating strategy...")
-		
-		"""
-		Having already created the necessary 'distance_' files,
-		we no longer need to call this line when generating
-		strategy.  However, one does not have the 'distance_' files,
-		one must be sure to uncomment this line and run the program
-		at least once.
 
-		"""
-                distances = os.getcwd() + "/.distances"
-                if not os.path.exists(distances):
-                        partitionByDistance()
-		# partitionByDistance()
+		if self.vectorized:
+			self._generateStrategyVectorized()
+			return
+
+		index = getStateIndex()
+		table = getTransitionTable()
+		winner = table.winner
+		myChildren = table.children[self.player]
+		oppChildren = table.children[self.opponent]
 
 		"""
 		BASE CASES:
@@ -486,13 +1100,18 @@ class TTTDiscretePlayer:
 
 		"""
 
-		nodes0 = getNodes(0)
+		instruments = _instruments
+		if instruments is not None:
+			start = time.time()
 
-		for node in nodes0:
-			if node.isWin(self.player):
-				self.nodesToDiscreteRich[0][node] = 0.0
+		for idx in index.layer(0):
+			if winner[idx] == self.player:
+				self.nodesToDiscreteRich[idx] = 0.0
 			else:
-				self.nodesToDiscreteRich[0][node] = self.totalChips + 1.0
+				self.nodesToDiscreteRich[idx] = self.totalChips + 1.0
+
+		if instruments is not None:
+			instruments.addTime('discrete.baseCases', time.time() - start)
 
 		"""
 		BACKWARDS INDUCTION:
@@ -508,41 +1127,41 @@ class TTTDiscretePlayer:
 		"""
 				
 		for i in range(1,10):
-			# Get all nodes that are i steps away from a full state
-			nodes = getNodes(i)
+			_checkCancelled()
+			if instruments is not None:
+				start = time.time()
 
-			for node in nodes:
+			# Get all nodes that are i steps away from a full state
+			for idx in index.layer(i):
 
 				# If the node is a win state for the agent, assign it 
 				# a discrete-Richman value of 0.
-				if node.isWin(self.player):
-					self.nodesToDiscreteRich[i][node] = 0.0
+				if winner[idx] == self.player:
+					self.nodesToDiscreteRich[idx] = 0.0
 					continue
 				# Else if the node is a win state for the opponent, assign
 				# a discrete-Richman value of k+1.
-				elif node.isWin(self.opponent):
-					self.nodesToDiscreteRich[i][node] = self.totalChips + 1.0
+				elif winner[idx] == self.opponent:
+					self.nodesToDiscreteRich[idx] = self.totalChips + 1.0
 					continue
 
 				# For the current node, find the minimum discrete-Richman
 				# value of its children that the agent can move to, and the
 				# maximum discrete-Richman value of its children that the
-				# opponent can move to.  As well, store the child node that
-				# corresponds to the minimum discrete-Richman value, so that
-				# we can determine the optimal move.
+				# opponent can move to.  As well, store the position of the
+				# child that corresponds to the minimum discrete-Richman
+				# value, so that we can determine the optimal move.
 					
 				Fmax = -1.0
 				Fmin = sys.maxint 
-				myChildren = node.generateChildren(self.player)
-				oppChildren = node.generateChildren(self.opponent)
 
-				for myChild in myChildren:
-					if Fmin > self.nodesToDiscreteRich[i-1][myChild]:
-						Fmin = self.nodesToDiscreteRich[i-1][myChild]
-						favoredChild = myChild
+				for j,myChild in enumerate(myChildren[idx]):
+					if Fmin > self.nodesToDiscreteRich[myChild]:
+						Fmin = self.nodesToDiscreteRich[myChild]
+						favored = j
 
-				for oppChild in oppChildren:
-					Fmax = max(Fmax,self.nodesToDiscreteRich[i-1][oppChild])
+				for oppChild in oppChildren[idx]:
+					Fmax = max(Fmax,self.nodesToDiscreteRich[oppChild])
 
 				# Discrete-Richman values may or may not include the tie-breaking
 				# chip *.  Conveniently, as the value of * is strictly positive but
@@ -565,30 +1184,156 @@ class TTTDiscretePlayer:
 				# tie breaking chip, then the agent will bet n+1.  
 
 			    	
-				FmaxVal = math.floor(Fmax)
-				FminVal = math.floor(Fmin)
-				Fsum = FmaxVal + FminVal
-
-				# If Fsum is odd and Fmin \in \N*
-				if (Fsum % 2 == 1) and FminVal < Fmin:
-					epsilon = 1.0
-					bid = math.floor(abs(FmaxVal-FminVal)/2.0) * 1.0
-				# Else if Fsum is odd and Fmin \in \N
-				elif (Fsum % 2 == 1) and FminVal == Fmin:
-					epsilon = 0.5
-					bid = math.floor(abs(FmaxVal-FminVal)/2.0) + 0.25
-				# Else if Fsum is even and Fmin \in \N*
-				elif (Fsum % 2 == 0) and FminVal < Fmin:
-					epsilon = 0.5
-					bid = max(0,abs(FmaxVal-FminVal)/2.0 - 0.75)
-				# Else (i.e., if Fsum is even and Fmin \in \N)
-				else:
-					epsilon = 0.0
-					bid = abs(FmaxVal-FminVal)/2.0
+				self.nodesToDiscreteRich[idx],bid = _discreteCase(Fmin, Fmax)
+				self.nodesToMoveBid[idx] = (MOVES[table.squares[idx][favored]], bid)
+
+			if instruments is not None:
+				layer = index.layer(i)
+				_recordLayer(instruments, 'discrete', i, start, len(layer),
+				             sum(len(myChildren[idx]) + len(oppChildren[idx]) for idx in layer))
+
+
+	def _generateStrategyVectorized(self):
+		"""
+		The vectorized counterpart of generateStrategy, which requires
+		numpy.  Each distance layer is a contiguous block of rows in the
+		state index, so a whole layer is solved at once: children are
+		gathered through the transition table's child array, and the four
+		cases are applied as array operations.  The tables produced
+		are identical to those of the scalar solver.
+
+		"""
+		if numpy is None:
+			raise ImportError("numpy is required for vectorized solving")
+
+		index = getStateIndex()
+		table = getTransitionTable()
+		myKids = table.childArray(self.player)
+		oppKids = table.childArray(self.opponent)
+
+		# Terminal nodes keep these base values; all other nodes are
+		# overwritten layer by layer below.
+		instruments = _instruments
+		if instruments is not None:
+			start = time.time()
+
+		values = numpy.where(table.winArray(self.player), 0.0, self.totalChips + 1.0)
+
+		if instruments is not None:
+			instruments.addTime('discrete.baseCases', time.time() - start)
+
+		for i in range(1,10):
+			_checkCancelled()
+			if instruments is not None:
+				start = time.time()
+			live = table.liveRows(index, i)
+			Fmin,favored,Fmax = _childExtrema(values, myKids[live], oppKids[live])
+			values[live],bids = _discreteCases(Fmin, Fmax)
+			for idx,square,bid in zip(live.tolist(), favored.tolist(), bids.tolist()):
+				self.nodesToMoveBid[idx] = (MOVES[square], bid)
+			if instruments is not None:
+				_recordLayer(instruments, 'discrete', i, start, len(index.layer(i)),
+				             2 * int((myKids[live] >= 0).sum()))
+
+		self.nodesToDiscreteRich = array('d', values.tolist())
+
+
+
+class TTTDiscreteTable:
+	"""
+	Discrete-Richman values and (move, bid) strategies for one player
+	over a whole range of total chip counts, computed in a single sweep
+	over the distance layers.  Every layer is solved for all chip counts
+	at once, with one column per chip count, so any of them can then be
+	served without a fresh solve.  Requires numpy.
+
+	For a given chip count k, the entries are identical to those of
+	TTTDiscretePlayer(player, k).
+
+	"""
+
+	# The number of array elements gathered at once while solving a
+	# layer; layers are split into blocks of rows to stay under it.
+	BLOCK_ELEMENTS = 1 << 22
+
+	def __init__(self,player,chipCounts):
+		"""
+		INSTANCE VARIABLES:
+		- player (either 'X' or 'O')
+		- opponent (the opposite of player)
+		- chipCounts (the list of total chip counts solved for)
+		- values (discrete-Richman values, one row per state and one
+		  column per chip count)
+		- squares (the square of the optimal move, or -1 for terminal
+		  states, in the same layout)
+		- bids (the optimal bids, in the same layout)
+
+		"""
+		if numpy is None:
+			raise ImportError("numpy is required for TTTDiscreteTable")
+
+		self.player = player
+		self.opponent = PlayTTT.getOpponent(player)
+		self.chipCounts = list(chipCounts)
+		self._columns = dict((k,col) for col,k in enumerate(self.chipCounts))
+
+		size = getStateIndex().size()
+		width = len(self.chipCounts)
+		self.squares = numpy.empty((size, width), dtype=numpy.int8)
+		self.squares.fill(-1)
+		self.bids = numpy.zeros((size, width), dtype=numpy.float32)
+
+		_measure('discreteTable.generateStrategy', self.generateStrategy)
+
+	def generateStrategy(self):
+		"""
+		This method populates values, squares and bids.  Values and bids
+		are all integers, halves or quarters, so they are stored exactly
+		in single precision.
+
+		"""
+		debug(str(time.time()) + "\tGenerating strategies for " + str(len(self.chipCounts)) + " chip counts...")
+
+		index = getStateIndex()
+		table = getTransitionTable()
+		myKids = table.childArray(self.player)
+		oppKids = table.childArray(self.opponent)
 
-				self.nodesToDiscreteRich[i][node] = math.floor(Fsum/2.0) + epsilon
-				self.nodesToMoveBid[i][node] = (node.generateMove(favoredChild), bid)
+		# Terminal nodes keep these base values; all other nodes are
+		# overwritten layer by layer below.
+		lossValues = numpy.array(self.chipCounts, dtype=numpy.float32) + 1.0
+		win = table.winArray(self.player).reshape(-1, 1)
+		self.values = numpy.where(win, numpy.float32(0.0), lossValues)
 
+		instruments = _instruments
+		blockRows = max(1, self.BLOCK_ELEMENTS // (9 * max(1, len(self.chipCounts))))
+		for i in range(1,10):
+			_checkCancelled()
+			if instruments is not None:
+				layerStart = time.time()
+			live = table.liveRows(index, i)
+			for start in range(0, len(live), blockRows):
+				rows = live[start:start+blockRows]
+				Fmin,favored,Fmax = _childExtrema(self.values, myKids[rows], oppKids[rows])
+				self.values[rows],self.bids[rows] = _discreteCases(Fmin, Fmax)
+				self.squares[rows] = favored
+			if instruments is not None:
+				width = len(self.chipCounts)
+				_recordLayer(instruments, 'discreteTable', i, layerStart, width * len(index.layer(i)),
+				             2 * width * int((myKids[live] >= 0).sum()))
+
+	def getValue(self,totalChips,currentNode):
+		""" Returns the discrete-Richman value of the node for the given chip count. """
+		return float(self.values[currentNode.index(), self._columns[totalChips]])
+
+	def getMoveBid(self,totalChips,currentNode):
+		""" Returns the (move, bid) tuple for the node for the given chip count. """
+		idx,symmetry = currentNode.locate()
+		col = self._columns[totalChips]
+		square = self.squares[idx, col]
+		if square < 0:
+			raise ValueError("there is no move from a terminal state")
+		return MOVES[UNMAP[symmetry][square]], float(self.bids[idx, col])
 
 
 class TTTRealPlayer:
@@ -597,39 +1342,48 @@ class TTTRealPlayer:
 
 	"""
 
-	def __init__(self,player):
+	def __init__(self,player,vectorized=False,fixedPoint=False):
 		"""
 		INSTANCE VARIABLES:
 		- player (either 'X' or 'O')
 		- opponent (the opposite of player)
+		- vectorized (whether to solve with numpy array operations)
+		- fixedPoint (whether values and bids are stored as integer
+		  numerators over RICHMAN_ONE rather than as floats)
 		- nodesToRichman (maps states/nodes to Richman values)
 		- nodesToMoveBid (maps states/nodes to (move,bid) tuples)
 
 		"""
 		self.player = player
 		self.opponent = PlayTTT.getOpponent(player)
+		self.vectorized = vectorized
+		self.fixedPoint = fixedPoint
+
+		# The factor from stored numbers to Richman values.  Powers of
+		# two convert exactly, so getMoveBid and getValue return the
+		# same floats in either mode.
+		self._scale = 1.0 / RICHMAN_ONE if fixedPoint else 1.0
+
+		# nodesToRichman is a flat array that holds the Richman
+		# value of every node at the node's index in the shared
+		# TTTStateIndex (see TTTGameNode.index()).  In fixed-point
+		# mode it holds the integer numerators of the values.
+		if fixedPoint:
+			self.nodesToRichman = array('i', [0]) * getStateIndex().size()
+		else:
+			self.nodesToRichman = array('d', [0.0]) * getStateIndex().size()
 
-		# nodesToRichman is a list of dictionaries that hold
-		# entries of the form
-		#
-		# gameNode : Richman value.
+		# nodesToMoveBid is a flat list that holds, at the index of
+		# each non-terminal node, the tuple
 		#
-		# The nodes are partitioned by their distance away from a
-		# full state, such that nodesToDiscreteRich[k] carries all
-		# entries with node-keys that are k steps away from a full
-		# state.
-		self.nodesToRichman = [{},{},{},{},{},{},{},{},{},{}]
-
-		# nodesToMoveBid is a list of dictionaries that hold
-		# entries of the form
+		# (optimalMove, optimalBid),
 		#
-		# gameNode : (optimalMove, optimalBid),
-		#
-		# where optimalMove is of the form (row, col). The nodes 
-		# are partitioned by their distance away from a full state.
-		self.nodesToMoveBid = [{},{},{},{},{},{},{},{},{},{}]
+		# where optimalMove is of the form (row, col).  Terminal
+		# nodes have no entry (None).  In fixed-point mode, optimalBid
+		# is an integer numerator.
+		self.nodesToMoveBid = [None] * getStateIndex().size()
 
-		self.generateStrategy()
+		_measure('real.generateStrategy', self.generateStrategy)
 
 	def getMoveBid(self,currentNode):
 		"""
@@ -638,8 +1392,24 @@ class TTTRealPlayer:
 		bidding, agentHasTieBreaker will be either true or false.
 
 		"""
-		numBlanks = TTTGameNode.numMissing(currentNode.getXRep(),currentNode.getORep())
-		return self.nodesToMoveBid[numBlanks][currentNode]
+		idx,symmetry = currentNode.locate()
+		move,bid = self.nodesToMoveBid[idx]
+		return orientMove(move, symmetry),bid * self._scale
+
+	def getMoveBids(self,nodes):
+		""" Returns the list of (move, bid) tuples for a list of nodes. """
+		locate = getStateIndex().locate
+		scale = self._scale
+		moveBids = []
+		for node in nodes:
+			idx,symmetry = locate(node.xRep, node.oRep)
+			move,bid = self.nodesToMoveBid[idx]
+			moveBids.append((orientMove(move, symmetry), bid * scale))
+		return moveBids
+
+	def getValue(self,currentNode):
+		""" Returns the Richman value of the specified node. """
+		return self.nodesToRichman[currentNode.index()] * self._scale
 
 	def generateStrategy(self):
 		"""
@@ -649,8 +1419,9 @@ class TTTRealPlayer:
 
 		debug(str(time.time()) + "\tGenerating strategy...")
 
-		# No need to call again after the first time.
-		# partitionByDistance()
+		if self.vectorized:
+			self._generateStrategyVectorized()
+			return
 
 		
 		"""
@@ -668,13 +1439,33 @@ class TTTRealPlayer:
 
 		"""
 
-		nodes0 = getNodes(0);
+		index = getStateIndex()
+		table = getTransitionTable()
+		winner = table.winner
+		myChildren = table.children[self.player]
+		oppChildren = table.children[self.opponent]
+
+		# The value of a loss or draw.  In fixed-point mode everything
+		# below is integer arithmetic: / 2 is then integer division,
+		# which is exact since the sum of two children's numerators is
+		# always even (see RICHMAN_BITS).
+		if self.fixedPoint:
+			one = RICHMAN_ONE
+		else:
+			one = 1.0
+
+		instruments = _instruments
+		if instruments is not None:
+			start = time.time()
 
-		for node in nodes0:
-			if node.isWin(self.player):
-				self.nodesToRichman[0][node] = 0.0
+		for idx in index.layer(0):
+			if winner[idx] == self.player:
+				self.nodesToRichman[idx] = 0
 			else:
-				self.nodesToRichman[0][node] = 1.0
+				self.nodesToRichman[idx] = one
+
+		if instruments is not None:
+			instruments.addTime('real.baseCases', time.time() - start)
 
 		"""
 		BACKWARDS INDUCTION:
@@ -693,70 +1484,1114 @@ class TTTRealPlayer:
 		"""
 
 		for i in range(1,10):
-			nodes = getNodes(i)
-			
-			for node in nodes:
-				if node.isWin(self.player):
-					self.nodesToRichman[i][node] = 0.0
+			_checkCancelled()
+			if instruments is not None:
+				start = time.time()
+
+			for idx in index.layer(i):
+				if winner[idx] == self.player:
+					self.nodesToRichman[idx] = 0
 					continue
-				elif node.isWin(self.opponent):
-					self.nodesToRichman[i][node] = 1.0
+				elif winner[idx] == self.opponent:
+					self.nodesToRichman[idx] = one
 					continue
 				
-				Rmax = -1.0
-				Rmin = 2.0
-				myChildren = node.generateChildren(self.player)
-				oppChildren = node.generateChildren(self.opponent)
-
-				for myChild in myChildren:
-					if Rmin > self.nodesToRichman[i-1][myChild]:
-						Rmin = self.nodesToRichman[i-1][myChild]
-						favoredChild = myChild
-
-				for oppChild in oppChildren:
-					Rmax = max(Rmax,self.nodesToRichman[i-1][oppChild])
-				
-				self.nodesToRichman[i][node] = (Rmax + Rmin)/2.0
-				self.nodesToMoveBid[i][node] = (node.generateMove(favoredChild), abs(Rmax-Rmin)/2.0)
+				Rmax = -one
+				Rmin = 2*one
 
-		node = TTTGameNode()
-		print self.nodesToRichman[9][node]
+				for j,myChild in enumerate(myChildren[idx]):
+					if Rmin > self.nodesToRichman[myChild]:
+						Rmin = self.nodesToRichman[myChild]
+						favored = j
 
-		
-class PlayTTT:		
-	"""
-	PlayTTT is the game engine for Tic-Tac-Toe.
-	"""
-	def __init__(self):
+				for oppChild in oppChildren[idx]:
+					Rmax = max(Rmax,self.nodesToRichman[oppChild])
+
+				self.nodesToRichman[idx] = (Rmax + Rmin)/2
+				self.nodesToMoveBid[idx] = (MOVES[table.squares[idx][favored]], abs(Rmax-Rmin)/2)
+
+			if instruments is not None:
+				layer = index.layer(i)
+				_recordLayer(instruments, 'real', i, start, len(layer),
+				             sum(len(myChildren[idx]) + len(oppChildren[idx]) for idx in layer))
+
+		if not _isSpeculative():
+			node = TTTGameNode()
+			print self.getValue(node)
+
+	def _generateStrategyVectorized(self):
+		"""
+		The vectorized counterpart of generateStrategy, which requires
+		numpy.  Each distance layer is a contiguous block of rows in the
+		state index, so a whole layer is solved at once, with children
+		gathered through the transition table's child array.  The tables
+		produced are identical to those of the scalar solver.
+
+		"""
+		if numpy is None:
+			raise ImportError("numpy is required for vectorized solving")
+
+		index = getStateIndex()
+		table = getTransitionTable()
+		myKids = table.childArray(self.player)
+		oppKids = table.childArray(self.opponent)
+
+		# Terminal nodes keep these base values; all other nodes are
+		# overwritten layer by layer below.
+		instruments = _instruments
+		if instruments is not None:
+			start = time.time()
+
+		if self.fixedPoint:
+			values = numpy.where(table.winArray(self.player), 0, RICHMAN_ONE).astype(numpy.int32)
+		else:
+			values = numpy.where(table.winArray(self.player), 0.0, 1.0)
+
+		if instruments is not None:
+			instruments.addTime('real.baseCases', time.time() - start)
+
+		for i in range(1,10):
+			_checkCancelled()
+			if instruments is not None:
+				start = time.time()
+			live = table.liveRows(index, i)
+			Rmin,favored,Rmax = _childExtrema(values, myKids[live], oppKids[live])
+			if self.fixedPoint:
+				values[live] = (Rmax + Rmin) >> 1
+				bids = abs(Rmax-Rmin) >> 1
+			else:
+				values[live] = (Rmax + Rmin)/2.0
+				bids = abs(Rmax-Rmin)/2.0
+			for idx,square,bid in zip(live.tolist(), favored.tolist(), bids.tolist()):
+				self.nodesToMoveBid[idx] = (MOVES[square], bid)
+			if instruments is not None:
+				_recordLayer(instruments, 'real', i, start, len(index.layer(i)),
+				             2 * int((myKids[live] >= 0).sum()))
+
+		self.nodesToRichman = array('i' if self.fixedPoint else 'd', values.tolist())
+
+
+# The memo tables of the lazy players, keyed by (biddingType, player,
+# totalChips), and shared by every TTTLazyPlayer of a process.
+_lazyMemos = {}
+
+class TTTLazyPlayer:
+	"""
+	A perfect player of real-valued or discrete-valued bidding
+	Tic-Tac-Toe that solves on demand instead of in its constructor.
+	getMoveBid evaluates the current node top-down, recursively from
+	its children, and memoizes every state it evaluates, so only the
+	states reachable from positions actually played are ever solved.
+
+	The memo is keyed by the canonical form of each state (see
+	canonicalForm) and is shared by every lazy player of the same kind
+	for the life of the process, so later calls and later games reuse
+	earlier work.  Nothing else is built: neither the state index nor
+	the transition table is needed.  Values, moves and bids are the same
+	as those of TTTRealPlayer and TTTDiscretePlayer.
+
+	"""
+
+	def __init__(self,player,biddingType='r',totalChips=0):
+		"""
+		INSTANCE VARIABLES:
+		- player (either 'X' or 'O')
+		- opponent (the opposite of player)
+		- biddingType ('r' or 'd')
+		- totalChips (the total number of chips in play, for 'd')
+		- memo (maps the 18-bit keys of canonical states to
+		  (value, square, bid) tuples, with square None for terminal
+		  states)
+
+		"""
+		self.player = player
+		self.opponent = PlayTTT.getOpponent(player)
+		self.biddingType = biddingType
+		self.totalChips = totalChips
+		self.memo = _lazyMemos.setdefault((biddingType, player, totalChips), {})
+		if biddingType == 'r':
+			self._loss = 1.0
+		else:
+			self._loss = totalChips + 1.0
+
+	def getMoveBid(self,currentNode):
+		""" Returns the (move, bid) tuple for the specified node. """
+		xRep,oRep,symmetry = canonicalForm(currentNode.xRep, currentNode.oRep)
+		value,square,bid = self._evaluate(xRep, oRep)
+		return MOVES[UNMAP[symmetry][square]],bid
+
+	def getMoveBids(self,nodes):
+		""" Returns the list of (move, bid) tuples for a list of nodes. """
+		return [self.getMoveBid(node) for node in nodes]
+
+	def getValue(self,currentNode):
+		""" Returns the (discrete-)Richman value of the specified node. """
+		xRep,oRep,symmetry = canonicalForm(currentNode.xRep, currentNode.oRep)
+		return self._evaluate(xRep, oRep)[0]
+
+	def _evaluate(self,xRep,oRep):
+		"""
+		A private method that returns the (value, square, bid) tuple of
+		the canonical state with the given bit representations, solving
+		its children first if they are not yet in the memo.
+
+		"""
+		key = (xRep << 9) | oRep
+		entry = self.memo.get(key)
+		if entry is not None:
+			return entry
+
+		myRep,oppRep = (xRep,oRep) if self.player == X else (oRep,xRep)
+		bits = xRep | oRep
+		if IS_WIN[myRep]:
+			entry = (0.0, None, None)
+		elif IS_WIN[oppRep] or bits == FULL_MASK:
+			entry = (self._loss, None, None)
+		else:
+			# As in the bottom-up solvers, the favored square is the
+			# first in row-major order among those of minimum value.
+			minimum = None
+			maximum = None
+			for i,mask in enumerate(SQUARE_MASKS):
+				if bits & mask:
+					continue
+				if self.player == X:
+					mine = self._childValue(xRep | mask, oRep)
+					theirs = self._childValue(xRep, oRep | mask)
+				else:
+					mine = self._childValue(xRep, oRep | mask)
+					theirs = self._childValue(xRep | mask, oRep)
+				if minimum is None or mine < minimum:
+					minimum = mine
+					favored = i
+				if maximum is None or theirs > maximum:
+					maximum = theirs
+
+			if self.biddingType == 'r':
+				entry = ((maximum + minimum)/2.0, favored, abs(maximum-minimum)/2.0)
+			else:
+				value,bid = _discreteCase(minimum, maximum)
+				entry = (value, favored, bid)
+
+		self.memo[key] = entry
+		return entry
+
+	def _childValue(self,xRep,oRep):
+		""" A private method that returns the value of any state, via its canonical form. """
+		xRep,oRep,symmetry = canonicalForm(xRep, oRep)
+		return self._evaluate(xRep, oRep)[0]
+
+
+def _packArray(values, typecode):
+	"""
+	Returns the little-endian bytes of a sequence of numbers, packed
+	with the given array typecode ('i', 'f' or 'b').  numpy arrays are
+	packed directly; anything else goes through the array module.
+
+	"""
+	if numpy is not None and isinstance(values, numpy.ndarray):
+		dtype = {'i':'<i4', 'f':'<f4', 'b':'i1'}[typecode]
+		return numpy.ascontiguousarray(values, dtype=dtype).tostring()
+	packed = array(typecode, values)
+	if sys.byteorder == 'big':
+		packed.byteswap()
+	return packed.tostring()
+
+
+def compileStrategies(path, chipCounts=(), sides=(X,O)):
+	"""
+	Writes a compiled strategy file to path, holding the real-valued
+	strategy for each of the given sides, and the discrete-valued
+	strategy for each side and each of the given total chip counts.
+	The file is written to a temporary name and then renamed, so
+	processes that have the old file open keep a consistent view.
+
+	The file is read back with TTTStrategyFile.  Its layout is:
+	- a header (TTTStrategyFile.HEADER);
+	- a lookup table of 2^18 little-endian int32s, mapping each key
+	  (xRep << 9) | oRep to 8 * index + symmetry for its canonical
+	  form (see TTTStateIndex), or -1;
+	- a directory of TTTStrategyFile.ENTRY records, one per strategy,
+	  giving the mode ('r' or 'd'), side, total chip count (0 for
+	  real-valued) and the offset of the strategy's section;
+	- the sections, each holding the value (float32), the optimal bid
+	  (float32) and the square of the optimal move (int8, or -1 for
+	  terminal states) of every state, as three consecutive arrays.
+	Values and bids are all dyadic rationals with small denominators, so
+	single precision stores them exactly; real-valued strategies are
+	solved in fixed point (see RICHMAN_BITS) and so are written without
+	any rounding, and their values times RICHMAN_ONE read back as the
+	exact integer numerators.
+
+	"""
+	debug(str(time.time()) + "\tCompiling strategies to " + path + "...")
+
+	index = getStateIndex()
+	size = index.size()
+	chipCounts = list(chipCounts)
+	entries = [('r', side, 0) for side in sides] + [('d', side, k) for side in sides for k in chipCounts]
+
+	sectionSize = 9 * size
+	dataOffset = TTTStrategyFile.HEADER.size + 4 * (1 << 18) + TTTStrategyFile.ENTRY.size * len(entries)
+
+	tmpPath = path + ".tmp"
+	f = open(tmpPath, "wb")
+	f.write(TTTStrategyFile.HEADER.pack(TTTStrategyFile.MAGIC, TTTStrategyFile.VERSION, size, len(entries)))
+	lookup = [8*idx + symmetry if idx >= 0 else -1 for idx,symmetry in zip(index.ranks, index.symmetries)]
+	f.write(_packArray(lookup, 'i'))
+	for i,(mode,side,k) in enumerate(entries):
+		f.write(TTTStrategyFile.ENTRY.pack(mode, side, k, dataOffset + i * sectionSize))
+
+	def writeSection(values, squares, bids):
+		f.write(_packArray(values, 'f'))
+		f.write(_packArray(bids, 'f'))
+		f.write(_packArray(squares, 'b'))
+
+	def writePlayer(values, moveBids, scale=1.0):
+		writeSection([value * scale for value in values],
+		             [3*mb[0][0] + mb[0][1] if mb else -1 for mb in moveBids],
+		             [mb[1] * scale if mb else 0.0 for mb in moveBids])
+
+	for side in sides:
+		player = TTTRealPlayer(side, vectorized=numpy is not None, fixedPoint=True)
+		writePlayer(player.nodesToRichman, player.nodesToMoveBid, 1.0 / RICHMAN_ONE)
+
+	for side in sides:
+		if numpy is None:
+			for k in chipCounts:
+				player = TTTDiscretePlayer(side, k)
+				writePlayer(player.nodesToDiscreteRich, player.nodesToMoveBid)
+			continue
+		# Solve the chip counts in batches to bound memory use.
+		for start in range(0, len(chipCounts), 256):
+			table = TTTDiscreteTable(side, chipCounts[start:start+256])
+			for col in range(len(table.chipCounts)):
+				writeSection(table.values[:,col], table.squares[:,col], table.bids[:,col])
+
+	f.close()
+	os.rename(tmpPath, path)
+
+
+class TTTStrategyFile:
+	"""
+	A read-only view of a compiled strategy file (see compileStrategies).
+	The file is memory-mapped, so opening it only reads the header and
+	directory, and the pages holding a strategy are only read from disk
+	when a lookup touches them.  Processes that open the same file share
+	the same physical pages.
+
+	"""
+
+	MAGIC = 'BTTTSTRT'
+	VERSION = 2
+	# magic, version, number of states, number of strategies
+	HEADER = struct.Struct('<8sIII')
+	# mode, side, total chip count, section offset
+	ENTRY = struct.Struct('<ccxxiQ')
+
+	def __init__(self,path):
+		"""
+		INSTANCE VARIABLES:
+		- size (the number of states)
+		- sections (maps (mode, side, totalChips) to section offsets)
+
+		"""
+		f = open(path, "rb")
+		self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		f.close()
+
+		magic,version,self.size,count = self.HEADER.unpack_from(self._map, 0)
+		if magic != self.MAGIC or version != self.VERSION:
+			raise ValueError(path + " is not a compiled strategy file of version " + str(self.VERSION))
+
+		self._lookupOffset = self.HEADER.size
+		entryOffset = self._lookupOffset + 4 * (1 << 18)
+		self.sections = {}
+		for i in range(count):
+			mode,side,k,offset = self.ENTRY.unpack_from(self._map, entryOffset + i * self.ENTRY.size)
+			self.sections[(mode, side, k)] = offset
+
+	def hasStrategy(self,mode,side,totalChips=0):
+		""" Returns true if the file holds the given strategy. """
+		return (mode, side, totalChips) in self.sections
+
+	def getPlayer(self,mode,side,totalChips=0):
+		"""
+		Returns a TTTCompiledPlayer for the given mode ('r' or 'd'),
+		side and, for discrete-valued bidding, total chip count.
+
+		"""
+		return TTTCompiledPlayer(self, mode, side, totalChips, self.sections[(mode, side, totalChips)])
+
+	def locate(self,xRep,oRep):
+		"""
+		Returns the (index, symmetry) pair of the given bit
+		representations.  Raises ValueError if the state is not legal.
+
+		"""
+		packed = struct.unpack_from('<i', self._map, self._lookupOffset + 4 * ((xRep << 9) | oRep))[0]
+		if packed < 0:
+			raise ValueError("illegal state: (%d, %d)" % (xRep, oRep))
+		return packed >> 3, packed & 7
+
+	def read(self,offset,fmt):
+		""" Returns the single value of the given struct format at offset. """
+		return struct.unpack_from(fmt, self._map, offset)[0]
+
+	def close(self):
+		self._map.close()
+
+
+class TTTCompiledPlayer:
+	"""
+	A player that answers from one strategy of a TTTStrategyFile, with
+	the same getMoveBid and getValue methods as the solved players.
+
+	"""
+
+	def __init__(self,strategies,biddingType,player,totalChips,offset):
+		self.strategies = strategies
+		self.biddingType = biddingType
+		self.player = player
+		self.opponent = PlayTTT.getOpponent(player)
+		self.totalChips = totalChips
+		self._offset = offset
+
+	def getMoveBid(self,currentNode):
+		""" Returns the (move, bid) tuple for the specified node. """
+		idx,symmetry = self.strategies.locate(currentNode.xRep, currentNode.oRep)
+		size = self.strategies.size
+		bid = self.strategies.read(self._offset + 4*size + 4*idx, '<f')
+		square = self.strategies.read(self._offset + 8*size + idx, '<b')
+		if square < 0:
+			raise ValueError("there is no move from a terminal state")
+		return MOVES[UNMAP[symmetry][square]], bid
+
+	def getMoveBids(self,nodes):
+		""" Returns the list of (move, bid) tuples for a list of nodes. """
+		return [self.getMoveBid(node) for node in nodes]
+
+	def getValue(self,currentNode):
+		""" Returns the value of the specified node. """
+		idx,symmetry = self.strategies.locate(currentNode.xRep, currentNode.oRep)
+		return self.strategies.read(self._offset + 4*idx, '<f')
+
+
+# UNMAP as a numpy array, for orienting many moves at once.
+_unmapArray = None
+
+class TTTVerdictTable:
+	"""
+	Answers batches of "does the player win from this state with these
+	chips?" queries, with the recommended (move, bid) for each, as numpy
+	array operations over a solved or compiled player's tables.
+	Requires numpy.
+
+	In real-valued bidding, the player wins from a state G with c chips
+	iff R(G) == 0 or c > R(G).  In discrete-valued bidding, the player
+	wins with c chips (plus the tie-breaking chip *, if held) iff
+	c (+ *) >= F(G), with * counted as 0.5 as in the value tables.
+
+	"""
+
+	def __init__(self,player):
+		"""
+		INSTANCE VARIABLES:
+		- player (the side the tables are solved for)
+		- biddingType ('r' or 'd')
+		- values, squares, bids (numpy arrays indexed by state; squares
+		  are in canonical orientation, -1 for terminal states)
+
+		"""
+		global _unmapArray
+		if numpy is None:
+			raise ImportError("numpy is required for TTTVerdictTable")
+		if _unmapArray is None:
+			_unmapArray = numpy.array(UNMAP, dtype=numpy.int8)
+
+		self.player = player.player
+		size = getStateIndex().size()
+		if isinstance(player, TTTCompiledPlayer):
+			self.biddingType = player.biddingType
+			buf = player.strategies._map
+			offset = player._offset
+			self.values = numpy.frombuffer(buf, '<f4', size, offset).astype(numpy.float64)
+			self.bids = numpy.frombuffer(buf, '<f4', size, offset + 4*size).astype(numpy.float64)
+			self.squares = numpy.frombuffer(buf, 'i1', size, offset + 8*size).copy()
+		elif isinstance(player, (TTTRealPlayer, TTTDiscretePlayer)):
+			if isinstance(player, TTTRealPlayer):
+				self.biddingType = 'r'
+				values = player.nodesToRichman
+				scale = player._scale
+			else:
+				self.biddingType = 'd'
+				values = player.nodesToDiscreteRich
+				scale = 1.0
+			moveBids = player.nodesToMoveBid
+			self.values = numpy.array(values, dtype=numpy.float64) * scale
+			self.bids = numpy.array([mb[1] if mb else 0 for mb in moveBids], dtype=numpy.float64) * scale
+			self.squares = numpy.array([3*mb[0][0] + mb[0][1] if mb else -1 for mb in moveBids], dtype=numpy.int8)
+		else:
+			raise TypeError("TTTVerdictTable needs a solved or compiled player")
+
+	def query(self,xReps,oReps,chips,tieBreakers=None):
+		"""
+		Given arrays of the bit representations of states, the player's
+		chips in each, and (for discrete-valued bidding) whether the
+		player holds the tie-breaking chip in each, returns the arrays
+		(wins, rows, cols, bids): whether the player wins, and the
+		recommended move and bid, with rows and cols -1 at terminal
+		states.  Bids are capped at the player's chips, and discrete
+		bids are resolved as TTTGameSession.resolveBid does.  Raises
+		ValueError if any state is not legal.
+
+		"""
+		xReps = numpy.asarray(xReps, dtype=numpy.int32)
+		oReps = numpy.asarray(oReps, dtype=numpy.int32)
+		chips = numpy.asarray(chips, dtype=numpy.float64)
+		ranks,symmetries = getStateIndex().locateArrays()
+		keys = (xReps << 9) | oReps
+		idx = ranks[keys]
+		if (idx < 0).any():
+			raise ValueError("illegal state in batch")
+
+		values = self.values[idx]
+		bids = self.bids[idx]
+		if self.biddingType == 'r':
+			wins = (values == 0) | (chips > values)
+			bids = numpy.minimum(bids, chips)
+		else:
+			if tieBreakers is None:
+				tieBreakers = numpy.zeros(len(idx), dtype=bool)
+			held = chips + numpy.where(numpy.asarray(tieBreakers, dtype=bool), 0.5, 0.0)
+			wins = held >= values
+			bids = TTTGameSession.resolveBids(bids, held)
+
+		squares = self.squares[idx]
+		live = squares >= 0
+		oriented = _unmapArray[symmetries[keys], numpy.maximum(squares, 0)]
+		rows = numpy.where(live, oriented // 3, -1)
+		cols = numpy.where(live, oriented % 3, -1)
+		return wins, rows, cols, numpy.where(live, bids, 0.0)
+
+
+_strategyCache = None
+
+def getStrategyCache():
+	"""
+	Returns the process-wide TTTStrategyCache, created with the default
+	budget on the first call.
+
+	"""
+	global _strategyCache
+	if _strategyCache is None:
+		_strategyCache = TTTStrategyCache()
+	return _strategyCache
+
+
+class TTTStrategyCache:
+	"""
+	A thread-safe cache of solved players, keyed by (side, mode,
+	totalChips), so that games of the same kind share one player instead
+	of each solving its own.  The cache holds players up to a memory
+	budget and evicts the least recently used beyond it.  A player is
+	solved at most once at a time: threads asking for a player that is
+	being solved wait for it rather than solving it again.
+
+	Players can also be solved speculatively, on a background thread,
+	before anyone asks for them (see speculate()).  A request for a
+	player being solved speculatively joins that solve, and a request
+	that misses cancels the speculation, so that its own solve does not
+	compete with it.
+
+	"""
+
+	# The default memory budget, in bytes.  A solved player takes a few
+	# hundred kilobytes, so this holds a couple of hundred of them.
+	DEFAULT_BUDGET = 64 << 20
+
+	def __init__(self,budget=DEFAULT_BUDGET):
+		"""
+		INSTANCE VARIABLES:
+		- budget (the memory budget, in bytes)
+		- size (the estimated size of the cached players, in bytes)
+		- hits, misses, evictions (counts since creation)
+		- requests (maps keys to the number of times they were asked for)
+		- speculation (the running TTTSpeculativeSolver, or None)
+
+		"""
+		self.budget = budget
+		self.size = 0
+		self.hits = 0
+		self.misses = 0
+		self.evictions = 0
+		self.requests = {}
+		self._players = OrderedDict()
+		self._sizes = {}
+		self._pending = {}
+		self._lock = threading.Lock()
+		self.speculation = None
+
+	def get(self,side,mode,totalChips=0):
+		"""
+		Returns the solved player for the given side, mode ('r' or 'd')
+		and, for discrete-valued bidding, total chip count, solving it
+		if it is not cached.
+
+		"""
+		return self._get(self._key(side, mode, totalChips), True)
+
+	def _get(self,key,requested):
+		"""
+		A private method that returns the player for a key, solving it
+		if need be.  Speculative solves pass requested=False, and are
+		neither counted as requests nor cancel the speculation.
+
+		"""
+		while True:
+			with self._lock:
+				if requested:
+					self.requests[key] = self.requests.get(key, 0) + 1
+				player = self._players.pop(key, None)
+				if player is not None:
+					self._players[key] = player
+					self.hits += 1
+					return player
+				pending = self._pending.get(key)
+				if pending is None:
+					pending = self._pending[key] = threading.Event()
+					self.misses += 1
+					speculation = self.speculation
+					break
+			pending.wait()
+			# The player is in the cache now, unless its solve failed.
+			if requested:
+				with self._lock:
+					self.requests[key] -= 1
+
+		if requested and speculation is not None:
+			speculation.cancel()
+		try:
+			player = self.solve(*key)
+			self.put(key, player)
+		finally:
+			with self._lock:
+				del self._pending[key]
+			pending.set()
+		return player
+
+	def put(self,key,player):
+		"""
+		Adds a solved player under the given (side, mode, totalChips)
+		key, then evicts least recently used players until the cache
+		is within its budget.  The player just added is never evicted.
+
+		"""
+		key = self._key(*key)
+		size = TTTStrategyCache.estimateSize(player)
+		with self._lock:
+			if key in self._players:
+				self.size -= self._sizes[key]
+				del self._players[key]
+			self._players[key] = player
+			self._sizes[key] = size
+			self.size += size
+			while self.size > self.budget and len(self._players) > 1:
+				oldKey,oldPlayer = self._players.popitem(last=False)
+				self.size -= self._sizes.pop(oldKey)
+				self.evictions += 1
+
+	def prewarm(self,chipCounts,side=O,mode='d'):
+		"""
+		Solves and caches the players for each of the given total chip
+		counts (e.g. those of popular(), from a previous process).
+
+		"""
+		for k in chipCounts:
+			self.get(side, mode, k)
+
+	def speculate(self,keys):
+		"""
+		Starts solving the players for the given (side, mode,
+		totalChips) keys, in order, on a background thread, cancelling
+		any speculation already running.  Returns the started
+		TTTSpeculativeSolver.
+
+		"""
+		speculation = TTTSpeculativeSolver(self, keys)
+		with self._lock:
+			previous = self.speculation
+			self.speculation = speculation
+		if previous is not None:
+			previous.cancel()
+		return speculation.start()
+
+	def popular(self,n):
+		""" Returns the n most requested (side, mode, totalChips) keys. """
+		with self._lock:
+			keys = sorted(self.requests.items(), key=lambda item: -item[1])
+		return [key for key,count in keys[:n]]
+
+	def contains(self,side,mode,totalChips=0):
+		""" Returns true if the given player is cached. """
+		with self._lock:
+			return self._key(side, mode, totalChips) in self._players
+
+	def clear(self):
+		""" Evicts every player; the statistics are kept. """
+		with self._lock:
+			self._players.clear()
+			self._sizes.clear()
+			self.size = 0
+
+	def stats(self):
+		""" Returns the cache statistics as a dictionary. """
+		with self._lock:
+			return {'hits':self.hits, 'misses':self.misses, 'evictions':self.evictions,
+			        'players':len(self._players), 'size':self.size, 'budget':self.budget}
+
+	def solve(self,side,mode,totalChips):
+		""" Returns a freshly solved player for the given key. """
+		if mode == 'r':
+			return TTTRealPlayer(side, vectorized=numpy is not None, fixedPoint=True)
+		return TTTDiscretePlayer(side, totalChips, vectorized=numpy is not None)
+
+	@staticmethod
+	def _key(side,mode,totalChips=0):
+		# Real-valued games have no chip count.
+		if mode == 'r':
+			totalChips = 0
+		return (side, mode, totalChips)
+
+	@staticmethod
+	def estimateSize(player):
+		"""
+		Returns an estimate, in bytes, of the memory held by a solved
+		player's tables.  Moves are shared tuples and are not counted.
+
+		"""
+		if isinstance(player, TTTRealPlayer):
+			values = player.nodesToRichman
+		else:
+			values = player.nodesToDiscreteRich
+		size = sys.getsizeof(values) + sys.getsizeof(player.nodesToMoveBid)
+		for moveBid in player.nodesToMoveBid:
+			if moveBid is not None:
+				size += sys.getsizeof(moveBid) + sys.getsizeof(moveBid[1])
+		return size
+
+
+class TTTSpeculativeSolver:
+	"""
+	Solves players into a TTTStrategyCache on a daemon thread, one key
+	after another, until every key is cached or it is cancelled.  A
+	cancelled solve stops at the end of its current distance layer.
+
+	"""
+
+	def __init__(self,cache,keys):
+		"""
+		INSTANCE VARIABLES:
+		- cache (the TTTStrategyCache to fill)
+		- keys (the (side, mode, totalChips) keys to solve, in order)
+		- solved (the keys cached so far)
+		- cancelled (an Event set by cancel())
+
+		"""
+		self.cache = cache
+		self.keys = [TTTStrategyCache._key(*key) for key in keys]
+		self.solved = []
+		self.cancelled = threading.Event()
+		self._thread = threading.Thread(target=self._run, name='TTTSpeculativeSolver')
+		self._thread.daemon = True
+
+	def start(self):
+		""" Starts the thread and returns self. """
+		self._thread.start()
+		return self
+
+	def cancel(self):
+		""" Stops solving, at the end of the current layer. """
+		self.cancelled.set()
+
+	def isAlive(self):
+		""" Returns true while the thread is solving. """
+		return self._thread.is_alive()
+
+	def join(self,timeout=None):
+		""" Waits for the thread to finish. """
+		self._thread.join(timeout)
+
+	def _run(self):
+		_solveControl.cancel = self.cancelled
+		try:
+			for key in self.keys:
+				if self.cancelled.is_set():
+					break
+				self.cache._get(key, False)
+				self.solved.append(key)
+		except TTTSolveCancelled:
+			pass
+		finally:
+			_solveControl.cancel = None
+			with self.cache._lock:
+				if self.cache.speculation is self:
+					self.cache.speculation = None
+
+
+def getAgentMoveBids(sessions):
+	"""
+	Returns the agents' (move, bid) decisions for the current nodes of
+	all the given sessions, in order, with one getMoveBids call per
+	distinct agent.  Sessions that share an agent share its tables, so
+	any number of concurrent games needs only one solved player per
+	kind of game.
+
+	"""
+	byAgent = {}
+	for i,session in enumerate(sessions):
+		byAgent.setdefault(id(session.agent), []).append(i)
+	decisions = [None] * len(sessions)
+	instruments = _instruments
+	for positions in byAgent.values():
+		agent = sessions[positions[0]].agent
+		if instruments is not None:
+			start = time.time()
+		moveBids = agent.getMoveBids([sessions[i].gamenode for i in positions])
+		if instruments is not None:
+			instruments.observe('getMoveBids', time.time() - start)
+			instruments.count('tableLookups', len(positions))
+		for i,moveBid in zip(positions, moveBids):
+			decisions[i] = moveBid
+	return decisions
+
+
+def resolveSessions(sessions):
+	"""
+	Resolves the current turn of every given session, all of which must
+	be ready (see TTTGameSession.isReady), fetching all the agents'
+	decisions at once with getAgentMoveBids.  Returns the list of
+	TTTGameSession.resolve results.
+
+	"""
+	decisions = getAgentMoveBids(sessions)
+	return [session.resolve(decision) for session,decision in zip(sessions, decisions)]
+
+
+class TTTGameSession:
+	"""
+	A headless game of bidding Tic-Tac-Toe between a user and an agent,
+	with no terminal input or output.  Each turn, the user submits a
+	bid and a move, and resolve() applies the same arbitration rules as
+	PlayTTT.playReal and PlayTTT.playDiscrete.  Should a discrete-valued
+	turn require the user to decide whether to use the tie-breaking
+	chip, resolve() returns None and the turn is finished by
+	submitTieBreak().
+
+	"""
+
+	def __init__(self, agent, biddingType, chips, rng=random):
+		"""
+		INSTANCE VARIABLES:
+		- agent (a solved or compiled player, which may be shared)
+		- user (the opponent of the agent)
+		- biddingType ('r' or 'd')
+		- chips (maps X and O to chip counts; in discrete-valued games
+		  the tie-breaking chip is a decimal part of 0.5)
+		- gamenode (the current node)
+		- agentLastBid, userLastBid (the bids of the last turn)
+		- userWonLastBid (1 or 0 for the last turn, -1 before any)
+		- rng (the source of coin tosses for tied real-valued bids)
+		- turns (a (xBid, oBid, winner, move, paid, xChips, oChips)
+		  tuple for each turn played, with the chips before the turn;
+		  see logRecord)
+
+		"""
+		self.agent = agent
+		self.user = PlayTTT.getOpponent(agent.player)
+		self.biddingType = biddingType
+		self.chips = dict(chips)
+		self.turns = []
+		self.gamenode = TTTGameNode()
+		self.agentLastBid = None
+		self.userLastBid = None
+		self.userWonLastBid = -1
+		self.rng = rng
+		self._bid = None
+		self._move = None
+		self._tie = None
+
+	@staticmethod
+	def start(agent, biddingType, chipNo=1, userHasTieBreaker=False, rng=random, agentShare=AGENT_SHARE):
+		"""
+		Returns a new session with the chips split as in PlayTTT: the
+		agent starts with agentShare of the chips (rounded up to a
+		whole chip in discrete-valued games), and in discrete-valued
+		games the tie-breaking chip goes to the chosen player.
+
+		"""
+		user = PlayTTT.getOpponent(agent.player)
+		if biddingType == 'r':
+			chips = {user:1-agentShare, agent.player:agentShare}
+		else:
+			agentChips = float(math.ceil(agentShare*chipNo))
+			chips = {user:chipNo-agentChips, agent.player:agentChips}
+			if userHasTieBreaker:
+				chips[user] += 0.5
+			else:
+				chips[agent.player] += 0.5
+		return TTTGameSession(agent, biddingType, chips, rng)
+
+	def isOver(self):
+		""" Returns true if the game has ended. """
+		return self.gamenode.isTerminal()
+
+	def winner(self):
+		""" Returns the winning player, or None for a draw or an unfinished game. """
+		return self.gamenode.winner
+
+	def isLegalBid(self, bid):
+		"""
+		Returns true if bid is a legal bid for the user (i.e., if it is
+		non-negative and at most the number of chips the user has, and
+		in discrete-valued games an integer).
+
+		"""
+		if not 0 <= bid <= self.chips[self.user]:
+			return False
+		return self.biddingType != 'd' or float(bid).is_integer()
+
+	def isLegalMove(self, move):
+		"""
+		Returns true if move, a (row, column) tuple, is a legal move
+		(i.e., if it's blank on the board).
+
+		"""
+		row,col = move
+		if row is None or col is None:
+			return False
+		if not (0 <= row < 3 and 0 <= col < 3):
+			return False
+		return self.gamenode.isBlank(row, col)
+
+	def submitBid(self, bid):
+		""" Records the user's bid for the current turn. """
+		if self.isOver() or self._tie is not None:
+			raise ValueError("no bid is expected")
+		if not self.isLegalBid(bid):
+			raise ValueError("illegal bid: " + str(bid))
+		self._bid = bid
+
+	def submitMove(self, move):
+		""" Records the user's move for the current turn. """
+		if self.isOver() or self._tie is not None:
+			raise ValueError("no move is expected")
+		if not self.isLegalMove(move):
+			raise ValueError("illegal move: " + str(move))
+		self._move = move
+
+	def isReady(self):
+		""" Returns true if the user has submitted both a bid and a move. """
+		return self._bid is not None and self._move is not None and self._tie is None
+
+	def isAwaitingTieBreak(self):
+		""" Returns true if the user must decide whether to use the tie-breaking chip. """
+		return self._tie is not None
+
+	def resolve(self, decision=None):
+		"""
+		Resolves the current turn, given the agent's raw (move, bid)
+		decision for the current node (which is looked up if not given),
+		and returns userWonLastBid.  Returns None instead if the turn
+		waits on submitTieBreak().
+
+		"""
+		if not self.isReady():
+			raise ValueError("the turn is not ready to be resolved")
+		instruments = _instruments
+		if instruments is None:
+			if decision is None:
+				decision = self.agent.getMoveBid(self.gamenode)
+			return self._arbitrate(decision)
+
+		if decision is None:
+			start = time.time()
+			decision = self.agent.getMoveBid(self.gamenode)
+			instruments.observe('getMoveBid', time.time() - start)
+			instruments.count('tableLookups')
+		start = time.time()
+		result = self._arbitrate(decision)
+		instruments.observe('arbitration', time.time() - start)
+		return result
+
+	@staticmethod
+	def resolveBid(bid, chips):
+		"""
+		Returns the whole number of chips a player holding the given
+		chips actually bids for a discrete-valued solved bid.  A bid
+		marked with 0.25 is its underlying integer amount if the player
+		has the tie-breaking chip (which it then uses if a tie arises),
+		and that amount plus 1 if not and it holds more than the bid.
+		No bid exceeds the player's whole chips.
+
+		"""
+		if bid % 1 == 0.25:
+			if chips % 1 == 0.5:
+				bid = math.floor(bid)
+			elif bid < chips:
+				bid = math.ceil(bid)
+		return min(bid, math.floor(chips))
+
+	@staticmethod
+	def resolveBids(bids, chips):
+		"""
+		Returns resolveBid of every bid, as a numpy array, for numpy
+		arrays of discrete-valued solved bids and of the chips held
+		(with the tie-breaking chip counted as 0.5).
+
+		"""
+		marked = (bids % 1 == 0.25)
+		hasTieBreaker = (chips % 1 == 0.5)
+		bids = numpy.where(marked & hasTieBreaker, numpy.floor(bids), bids)
+		bids = numpy.where(marked & ~hasTieBreaker & (bids < chips), numpy.ceil(bids), bids)
+		return numpy.minimum(bids, numpy.floor(chips))
+
+	def _arbitrate(self, decision):
+		"""
+		A private method that settles the current turn between the
+		user's submitted bid and move and the agent's (move, bid)
+		decision, for resolve().
+
+		"""
+		agentMove,agentBid = decision
+		userBid,userMove = self._bid,self._move
+		self._bid = self._move = None
+		agent = self.agent.player
+		user = self.user
+
+		if self.biddingType == 'r':
+			# Below the share it was solved for, the agent's strategy may bid
+			# more than it holds; it can bid no more than everything.
+			agentBid = min(agentBid, self.chips[agent])
+			self.agentLastBid = agentBid
+			self.userLastBid = userBid
+			if userBid > agentBid:
+				self.updateGameState(user, userMove, userBid)
+			elif agentBid > userBid:
+				self.updateGameState(agent, agentMove, agentBid)
+
+			# In real-valued bidding, the event of a tie is so rare that it is
+			# not even considered by many authors.  However, in their paper titled
+			# 'Richman Games', Lazarus et. al state in their introduction that
+			# "Should the two bids be equal, the tie is broken by a toss of a coin."
+			elif self.rng.random() < 0.5:
+				self.updateGameState(user, userMove, userBid)
+			else:
+				self.updateGameState(agent, agentMove, agentBid)
+			return self.userWonLastBid
+
+		agentHasTieBreaker = ((self.chips[agent] % 1) == 0.5)
+		agentBid = self.resolveBid(agentBid, self.chips[agent])
+
+		self.agentLastBid = agentBid
+		self.userLastBid = userBid
+
+		# Cast bid values to ints to get underlying bid values.
+		if int(userBid) > int(agentBid):
+			self.updateGameState(user, userMove, userBid)
+
+		elif int(userBid) < int(agentBid):
+			self.updateGameState(agent, agentMove, agentBid)
+
+		elif agentHasTieBreaker:
+			self.updateGameState(agent, agentMove, agentBid+0.5)
+
+		else: # int(userBid) == int(agentBid) and not agentHasTieBreaker
+			self._tie = (userMove, userBid, agentMove, agentBid)
+			return None
+
+		return self.userWonLastBid
+
+	def logRecord(self, game=None):
+		"""
+		Returns the game played so far as a record of the game log
+		format read by TTTLog: a dictionary with the bidding type, the
+		total chip count, the agent's side, an optional game id, and a
+		list of turns, each with the bids of X and O, the winner of the
+		bid, the move, the amount paid (the bid, plus 0.5 if the
+		tie-breaking chip changed hands) and the chips of X and O before
+		the turn.
+
+		"""
+		record = {'mode':self.biddingType, 'chipNo':int(sum(self.chips.values())) if self.biddingType == 'd' else 0,
+		          'agent':self.agent.player,
+		          'turns':[{'bids':[xBid, oBid], 'winner':winner, 'move':list(move), 'paid':paid,
+		                    'chips':[xChips, oChips]}
+		                   for xBid,oBid,winner,move,paid,xChips,oChips in self.turns]}
+		if game is not None:
+			record['game'] = game
+		return record
+
+	def submitTieBreak(self, useTieBreaker):
+		"""
+		Finishes a discrete-valued turn whose bids tied while the user
+		holds the tie-breaking chip.  If useTieBreaker, the user wins
+		the bid and pays the tie-breaking chip along with the bid.
+		Returns userWonLastBid.
+
+		"""
+		if self._tie is None:
+			raise ValueError("no tie-break decision is expected")
+		userMove,userBid,agentMove,agentBid = self._tie
+		self._tie = None
+		if useTieBreaker:
+			self.updateGameState(self.user, userMove, userBid+0.5)
+		else:
+			self.updateGameState(self.agent.player, agentMove, agentBid)
+		return self.userWonLastBid
+
+	def updateGameState(self, player, move, bid):
+		"""
+		Updates current gamenode and chip counts
+
+		"""
+		bids = {self.agent.player:self.agentLastBid, self.user:self.userLastBid}
+		self.turns.append((bids[X], bids[O], player, move, bid, self.chips[X], self.chips[O]))
+		self.gamenode = self.gamenode.generateChild(player,move)
+		opponent = PlayTTT.getOpponent(player)
+		self.userWonLastBid = 1 if player == self.user else 0
+		self.chips[player] -= bid
+		self.chips[opponent] += bid
+
+
+class PlayTTT:		
+	"""
+	PlayTTT is the game engine for Tic-Tac-Toe.
+	"""
+	def __init__(self):
 
 		debug(str(time.time()) + "\tInitializing game...")
+		# The compiled strategy file, opened once for _speculate and
+		# _loadAgent, or None if there is none.
+		self.strategies = TTTStrategyFile(STRATEGY_FILE) if os.path.exists(STRATEGY_FILE) else None
+		self._speculate()
 		self.biddingType = self._queryBiddingType()
 
-		debug(str(time.time()) + "\tInitializing root node...")
-		self.gamenode = TTTGameNode()
+		debug(str(time.time()) + "\tInitializing game session...")
 
 		if self.biddingType == 'r':
-			self.chips = {X:1-0.51953126,O:0.51953126}
 			self.rules = "You are playing real-valued bidding Tic-Tac-Toe."
-			self.agent = TTTRealPlayer(O) 
-			print self.agent.nodesToRichman[9][self.gamenode]
+			self.agent = self._loadAgent(0)
+			self.session = TTTGameSession.start(self.agent, 'r')
 
 		elif self.biddingType == 'd':
 			chipNo = self._queryChipCount()
-			agentChips = float(math.ceil(0.51953126*chipNo))
-			self.chips = {X:chipNo-agentChips,O:agentChips}
-			
-			if self._queryStartWithTieBreakingChip():
-				self.chips[X] += 0.5
-			else:
-				self.chips[O] += 0.5
+			userHasTieBreaker = self._queryStartWithTieBreakingChip()
 			self.rules = "You are playing discrete-valued bidding Tic-Tac-Toe."	
-			self.agent = TTTDiscretePlayer(O, chipNo)
-			print self.agent.nodesToDiscreteRich[9][self.gamenode]
+			self.agent = self._loadAgent(chipNo)
+			self.session = TTTGameSession.start(self.agent, 'd', chipNo, userHasTieBreaker)
 
-		self.agentLastBid = None
-
-		self.userWonLastBid = -1
+		print self.agent.getValue(self.session.gamenode)
 
 		debug(str(time.time()) + "\tPlaying...")
 
@@ -766,22 +2601,30 @@ class PlayTTT:
 		elif self.biddingType == 'd':
 			self.playDiscrete()
 
-	def updateGameState(self, player, move, bid):
+	def _speculate(self):
 		"""
-		Updates current gamenode and chip counts
+		A private method that starts solving the likely games
+		(SPECULATIVE_KEYS) in the background while the user answers
+		the prompts, except those the compiled strategy file holds.
+		_loadAgent then joins the solve of the chosen game, or cancels
+		the speculation if the user chose another.
 
 		"""
+		keys = [(side, mode, chipNo) for side,mode,chipNo in SPECULATIVE_KEYS
+		        if self.strategies is None or not self.strategies.hasStrategy(mode, side, chipNo)]
+		if keys:
+			getStrategyCache().speculate(keys)
 
-		self.gamenode = self.gamenode.generateChild(player,move) 
+	def _loadAgent(self, chipNo):
+		"""
+		A private method that returns the agent for this game: the
+		compiled strategy from STRATEGY_FILE if it has one for this game,
+		and otherwise the solved player from the strategy cache.
 
-		if player == X:
-			self.userWonLastBid = 1
-			self.chips[X] -= bid
-			self.chips[O] += bid
-		else:
-			self.userWonLastBid = 0
-			self.chips[X] += bid
-			self.chips[O] -= bid
+		"""
+		if self.strategies is not None and self.strategies.hasStrategy(self.biddingType, O, chipNo):
+			return self.strategies.getPlayer(self.biddingType, O, chipNo)
+		return getStrategyCache().get(O, self.biddingType, chipNo)
 
 	def playDiscrete(self):
 		"""
@@ -789,54 +2632,15 @@ class PlayTTT:
 		
 		"""
 		self._printBoard()
-		while not self.gamenode.isTerminal():
-			userBid = self._queryBid() # must be an int
-			userMove = self._queryMove()
-
-			agentMove,agentBid = self.agent.getMoveBid(self.gamenode)
-			agentHasTieBreaker = ((self.chips[O] % 1) == 0.5)
-
-
-			# If agentBid is marked with 0.25, then check if the agent
-			# has the tie breaking chip.  If the agent does, then bid
-			# the underlying integer amount (and use the tie-breaking
-			# chip if a tie arises); else, bid the underlying integer
-			# amount plus 1.
-			if agentBid % 1 == 0.25:
-				if agentHasTieBreaker:
-					agentBid = math.floor(agentBid)
-				else:
-					if agentBid < self.chips[O]:
-						agentBid = math.ceil(agentBid)
-						
-						
-			self.agentLastBid = agentBid
-
-			# Cast bid values to ints to get underlying bid values.
-			if int(userBid) > int(agentBid):
-				self.updateGameState(X, userMove, userBid)
-
-			elif int(userBid) < int(agentBid):
-				self.updateGameState(O, agentMove, agentBid)
-			
-			elif int(userBid) == int(agentBid) and agentHasTieBreaker:
- 				self.updateGameState(O, agentMove, agentBid+0.5)
-			
-			else: # int(userBid) == int(agentBid) and not agentHasTieBreaker
-				if self._queryUseTieBreakingChip():
-					self.updateGameState(X, userMove, userBid+0.5)
-				else:
-					self.updateGameState(O, agentMove, agentBid)
-				
+		while not self.session.isOver():
+			self.session.submitBid(self._queryBid()) # must be an int
+			self.session.submitMove(self._queryMove())
+			if self.session.resolve() is None:
+				# The bids tied and the user holds the tie-breaking chip.
+				self.session.submitTieBreak(self._queryUseTieBreakingChip())
 			self._printStatus()
-			
-		if self.gamenode.isWin(X):
-			print "You won!"
-		elif self.gamenode.isWin(O):
-			print "Sorry, the computer bested you this time."
-		else:
-			print "You seem to be an even match... Just watch out next time..."
 
+		self._printResult()
 		sys.exit("GAME OVER.")
 
 	def playReal(self):
@@ -846,44 +2650,26 @@ class PlayTTT:
 		"""
 		
 		self._printBoard()
-		while not self.gamenode.isTerminal():
-			userBid = self._queryBid()
-			userMove = self._queryMove()
-
-			agentMove,agentBid = self.agent.getMoveBid(self.gamenode)
-
-			self.agentLastBid = agentBid
-
-			if userBid > agentBid:
+		while not self.session.isOver():
+			self.session.submitBid(self._queryBid())
+			self.session.submitMove(self._queryMove())
+			if self.session.resolve() == 1:
 				print 'You won the bid.\n'
-				self.updateGameState(X, userMove, userBid)
-				
-			elif agentBid > userBid:
-				print 'You lost the bid.\n'
-				self.updateGameState(O, agentMove, agentBid) 
-
-			# In real-valued bidding, the event of a tie is so rare that it is
-			# not even considered by many authors.  However, in their paper titled
-			# 'Richman Games', Lazarus et. al state in their introduction that
-			# "Should the two bids be equal, the tie is broken by a toss of a coin."
 			else:
-				if random.random() < 0.5:
-					print 'You won the bid.\n'
-					self.updateGameState(X, userMove, userBid)
-				else:
-					print 'You lost the bid.\n'
-					self.updateGameState(O, agentMove, agentBid)
-
+				print 'You lost the bid.\n'
 			self._printStatus()
 
-		if self.gamenode.isWin(X):
+		self._printResult()
+		sys.exit("GAME OVER.")
+
+	def _printResult(self):
+		winner = self.session.winner()
+		if winner == X:
 			print "You won!"
-		elif self.gamenode.isWin(O):
+		elif winner == O:
 			print "Sorry, the computer bested you this time."
 		else:
 			print "You seem to be an even match... Just watch out next time..."
-			
-		sys.exit("GAME OVER.")
 
 	@staticmethod
 	def getOpponent(player):
@@ -892,7 +2678,7 @@ class PlayTTT:
 		return X
 
 	def _printBoard(self):
-		board = self.gamenode.getBoard()
+		board = self.session.gamenode.getBoard()
 		c = ['' for i in range(9)]
 		i = 0
 		for row in range(len(board)):
@@ -930,19 +2716,20 @@ class PlayTTT:
 
 		"""
 		
-		c1 = str(self.chips[X])
-		c2 = str(self.chips[O])
+		chips = self.session.chips
+		c1 = str(chips[X])
+		c2 = str(chips[O])
 
 		if self.biddingType == 'd':
 			c1 = c1[:-2]
 			c2 = c2[:-2]
-			if ((self.chips[X] % 1) == 0.5):
+			if ((chips[X] % 1) == 0.5):
 				c1 += "*"
-			if ((self.chips[O] % 1) == 0.5):
+			if ((chips[O] % 1) == 0.5):
 				c2 += "*"
 
 		### TESTING ###
-		l = str(self.agentLastBid)
+		l = str(self.session.agentLastBid)
 		header = " " + "YOU:".rjust(len(c1)) + "\t" + "CPU:".rjust(len(c2)) + "\t" + "LAST CPU BID:".rjust(len(l))
 		footer = " " + c1 + "\t" + c2 + "\t" + l
 		print header
@@ -963,9 +2750,9 @@ class PlayTTT:
 		self._printBoard()
 		print '\n'
 
-		if self.userWonLastBid == 1:
+		if self.session.userWonLastBid == 1:
 			print "You won the bid!\n\n"
-		elif self.userWonLastBid == 0:
+		elif self.session.userWonLastBid == 0:
 			print "You lost the bid!\n\n"
 		else:
 			print "\n\n"
@@ -1032,7 +2819,7 @@ class PlayTTT:
 
 		"""
 		if self.biddingType == 'r':
-			query = "Enter a non-negative real-valued bid up to " + str(self.chips[X]) + ": "
+			query = "Enter a non-negative real-valued bid up to " + str(self.session.chips[X]) + ": "
 			while True:
 				self._printStatus()
 				try:
@@ -1043,7 +2830,7 @@ class PlayTTT:
 					break
 
 		elif self.biddingType == 'd':
-			query = "Enter a non-negative integer bid up to " + str(int(self.chips[X])) + ": "
+			query = "Enter a non-negative integer bid up to " + str(int(self.session.chips[X])) + ": "
 			while True:
 				self._printStatus()
 				try:
@@ -1102,23 +2889,25 @@ class PlayTTT:
 		A private method that determines whether a given move, encoded as a 
 		(row, column) tuple, is legal (i.e., if it's blank on the board).
 		"""
-		if row is None or col is None: 
-			return False
-		try:
-			return self.gamenode.board[row][col] == BLANK
-		except IndexError:
-			return False
+		return self.session.isLegalMove((row, col))
 	
 	def _isLegalBid(self, bid):
 		"""
 		A private method that determines if a bid is legal (i.e., if it is
 		greater than 0 and less than the number of chips the user has).
 		"""
-		return 0 <= bid <= self.chips[X]
+		return self.session.isLegalBid(bid)
 
 
 
 if __name__ == '__main__':
 
-	PlayTTT()
+	# 'python TTT.py compile [maxChips]' writes STRATEGY_FILE with the
+	# real-valued strategies and the discrete-valued strategies for
+	# every total chip count up to maxChips.
+	if len(sys.argv) > 1 and sys.argv[1] == 'compile':
+		maxChips = int(sys.argv[2]) if len(sys.argv) > 2 else -1
+		compileStrategies(STRATEGY_FILE, range(maxChips + 1))
+	else:
+		PlayTTT()
 
@@ -0,0 +1,258 @@
+"""
+A KevPaDa module for benchmarking bidding Tic-Tac-Toe: TTTGameNode operations,
+state enumeration, strategy generation, random-turn playouts, and the
+cold-start time to the first getMoveBid answer.
+
+Results are written as JSON.  Given a saved baseline, the benchmarks are
+compared against it and any that became slower than the tolerance allows are
+reported as regressions (with a non-zero exit status).
+
+Run 'python TTTBenchmark.py --help' for the options.
+
+"""
+
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import TTT
+from TTT import X, O, TTTGameNode
+
+
+def measure(func, number=1, repeat=5):
+	"""
+	Calls func number times in each of repeat rounds, and returns the
+	best and median time per call, in seconds.
+
+	"""
+	times = []
+	for r in range(repeat):
+		start = time.time()
+		for n in xrange(number):
+			func()
+		times.append((time.time() - start) / number)
+	times.sort()
+	return {'best':times[0], 'median':times[len(times) // 2], 'number':number, 'repeat':repeat}
+
+
+def sampleNodes():
+	""" Returns one node from each distance layer, plus a won node. """
+	nodes = [TTT.getNodes(i)[0] for i in range(10)]
+	nodes.append(TTTGameNode(xRep=0b111000000, oRep=0b000110110))
+	return nodes
+
+
+def benchNodes(scale):
+	""" Microbenchmarks of TTTGameNode operations, per call on a sample of nodes. """
+	nodes = sampleNodes()
+	boards = [node.getBoard() for node in nodes]
+	reps = [(node.xRep, node.oRep) for node in nodes]
+	number = 2000 * scale
+
+	def isWin():
+		for node in nodes:
+			node.isWin(X)
+			node.isWin(O)
+
+	def generateChildren():
+		for node in nodes:
+			node.generateChildren(X)
+
+	def generateBitReps():
+		for board in boards:
+			TTTGameNode.generateBitReps(board)
+
+	def construct():
+		# Nodes are interned, so this measures the lookup of the existing node.
+		for xRep,oRep in reps:
+			TTTGameNode(xRep=xRep, oRep=oRep)
+
+	def index():
+		for node in nodes:
+			node.locate()
+
+	results = {}
+	for name,func in [('isWin', isWin), ('generateChildren', generateChildren),
+	                  ('generateBitReps', generateBitReps), ('construct', construct), ('locate', index)]:
+		results['node.' + name] = measure(func, number)
+	return results
+
+
+def benchStates(scale):
+	""" Benchmarks of state enumeration and of reading the nodes of each layer. """
+	def enumerate():
+		TTT._layers = None
+		TTT.enumerateStates()
+
+	def stateIndex():
+		TTT._stateIndex = None
+		TTT.getStateIndex()
+
+	def transitionTable():
+		TTT._transitionTable = None
+		TTT.getTransitionTable()
+
+	results = {'states.enumerate':measure(enumerate, scale),
+	           'states.index':measure(stateIndex, scale),
+	           'states.transitions':measure(transitionTable, scale)}
+	for i in range(10):
+		results['states.getNodes%d' % i] = measure(lambda: TTT.getNodes(i), 5 * scale)
+	return results
+
+
+def benchStrategies(scale, chipCounts):
+	""" Benchmarks of full strategy generation, scalar and (with numpy) vectorized. """
+	modes = [False]
+	if TTT.numpy is not None:
+		modes.append(True)
+	results = {}
+	for vectorized in modes:
+		suffix = '.vectorized' if vectorized else ''
+		results['strategy.real' + suffix] = measure(lambda: TTT.TTTRealPlayer(O, vectorized), scale)
+		for k in chipCounts:
+			results['strategy.discrete%d%s' % (k, suffix)] = \
+				measure(lambda: TTT.TTTDiscretePlayer(O, k, vectorized), scale)
+	if TTT.numpy is not None:
+		results['strategy.discreteTable%d' % len(chipCounts)] = \
+			measure(lambda: TTT.TTTDiscreteTable(O, chipCounts), scale)
+	return results
+
+
+def benchMonteCarlo(scale):
+	""" Benchmarks of random-turn playouts (per batch of 10000), with playouts per second. """
+	if TTT.numpy is None:
+		return {}
+	import TTTMonteCarlo
+	engine = TTTMonteCarlo.TTTMonteCarlo(player=TTT.getStrategyCache().get(O, 'r'))
+	results = {}
+	for policy in ('uniform', 'table'):
+		result = measure(lambda: engine.playBatch(0, 0, 10000, policy), scale)
+		result['playoutsPerSecond'] = 10000 / result['best']
+		results['montecarlo.' + policy] = result
+	return results
+
+
+COLD_START = """
+import sys, time
+start = time.time()
+sys.path.insert(0, %r)
+import TTT
+TTT.DEBUG = False
+%s
+agent.getMoveBid(TTT.TTTGameNode())
+sys.stdout.write(repr(time.time() - start))
+"""
+
+def coldStart(setup, repeat):
+	""" Runs a fresh interpreter that sets up an agent and answers one getMoveBid. """
+	here = os.path.dirname(os.path.abspath(__file__))
+	times = []
+	for r in range(repeat):
+		start = time.time()
+		output = subprocess.check_output([sys.executable, '-c', COLD_START % (here, setup)])
+		# The solvers may print along the way; the time is the last line.
+		times.append({'total':time.time() - start, 'inProcess':float(output.splitlines()[-1])})
+	times.sort(key=lambda t: t['total'])
+	return {'best':times[0]['total'], 'median':times[len(times) // 2]['total'],
+	        'bestInProcess':min(t['inProcess'] for t in times), 'number':1, 'repeat':repeat}
+
+
+def benchColdStart(scale):
+	""" Cold-start time to the first getMoveBid answer: solving, lazily, or from a compiled file. """
+	repeat = 3 * scale
+	results = {'coldStart.real':coldStart("agent = TTT.TTTRealPlayer(TTT.O)", repeat),
+	           'coldStart.discrete':coldStart("agent = TTT.TTTDiscretePlayer(TTT.O, 20)", repeat),
+	           'coldStart.lazy':coldStart("agent = TTT.TTTLazyPlayer(TTT.O)", repeat)}
+
+	directory = tempfile.mkdtemp()
+	path = os.path.join(directory, 'strategies')
+	try:
+		TTT.compileStrategies(path, [20])
+		setup = "agent = TTT.TTTStrategyFile(%r).getPlayer('d', TTT.O, 20)" % path
+		results['coldStart.compiled'] = coldStart(setup, repeat)
+	finally:
+		shutil.rmtree(directory)
+	return results
+
+
+def runBenchmarks(scale=1, chipCounts=(1, 10, 100)):
+	"""
+	Runs every benchmark and returns a dictionary with the environment
+	and the results, keyed by benchmark name.
+
+	"""
+	TTT.DEBUG = False
+	# Build the shared tables first, so the node benchmarks measure warm lookups.
+	TTT.getTransitionTable()
+	results = {}
+	results.update(benchNodes(scale))
+	results.update(benchStates(scale))
+	results.update(benchStrategies(scale, list(chipCounts)))
+	results.update(benchMonteCarlo(scale))
+	results.update(benchColdStart(scale))
+	return {'python':platform.python_version(),
+	        'numpy':TTT.numpy.__version__ if TTT.numpy is not None else None,
+	        'machine':platform.machine(),
+	        'time':time.time(),
+	        'results':results}
+
+
+def compare(current, baseline, tolerance):
+	"""
+	Compares the best times of current against baseline and returns a
+	list of (name, baseline, current, ratio, regressed) tuples, where a
+	benchmark has regressed if it is more than tolerance (a fraction)
+	slower than the baseline.
+
+	"""
+	rows = []
+	for name in sorted(current['results']):
+		if name not in baseline['results']:
+			continue
+		old = baseline['results'][name]['best']
+		new = current['results'][name]['best']
+		ratio = new / old if old else float('inf')
+		rows.append((name, old, new, ratio, ratio > 1 + tolerance))
+	return rows
+
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Benchmark bidding Tic-Tac-Toe.")
+	parser.add_argument('--output', help="write the results as JSON to this file")
+	parser.add_argument('--compare', metavar='BASELINE', help="compare against a saved JSON baseline")
+	parser.add_argument('--tolerance', type=float, default=0.2,
+	                    help="allowed slowdown before a benchmark counts as a regression (default 0.2)")
+	parser.add_argument('--scale', type=int, default=1, help="multiply the number of iterations")
+	args = parser.parse_args(argv)
+
+	current = runBenchmarks(args.scale)
+	if args.output:
+		f = open(args.output, 'w')
+		json.dump(current, f, indent=2, sort_keys=True)
+		f.close()
+
+	if not args.compare:
+		for name in sorted(current['results']):
+			print "%-40s %12.3f us" % (name, current['results'][name]['best'] * 1e6)
+		return 0
+
+	f = open(args.compare)
+	baseline = json.load(f)
+	f.close()
+	regressions = 0
+	for name,old,new,ratio,regressed in compare(current, baseline, args.tolerance):
+		flag = "REGRESSION" if regressed else ""
+		print "%-40s %12.3f us %12.3f us %6.2fx %s" % (name, old * 1e6, new * 1e6, ratio, flag)
+		regressions += regressed
+	print "%d regression(s)" % regressions
+	return 1 if regressions else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main(sys.argv[1:]))
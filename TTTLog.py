@@ -0,0 +1,197 @@
+"""
+A KevPaDa module for logging played games of bidding Tic-Tac-Toe and auditing
+them against the solved strategies.
+
+A game log is a text file with one game per line, as JSON (see
+TTT.TTTGameSession.logRecord):
+
+  {"game": 17, "mode": "d", "chipNo": 20, "agent": "O",
+   "turns": [{"bids": [3, 4], "winner": "O", "move": [1, 1], "paid": 4,
+              "chips": [9.5, 11]}, ...]}
+
+where bids and chips list X first, and chips are held before the turn (in
+discrete-valued games the tie-breaking chip is a decimal part of 0.5).
+
+The analyzer reads a log one line at a time, so it runs in constant memory
+whatever the size of the log.  For every turn and each side, it looks up the
+side's value of the position, its optimal move and bid in the shared solved
+tables, and how much of its chip advantage (its chips beyond the value of the
+position) the turn cost it.  In discrete-valued games the tie-breaking chip
+counts as 0.5 here, as in the value tables, so a turn in which it changes
+hands may show a loss of 0.5 even when both bids were optimal.
+
+Run 'python TTTLog.py --help' for the options.
+
+"""
+
+import argparse
+import json
+import sys
+import time
+
+import TTT
+from TTT import X, O
+
+
+def writeGame(f, record):
+	""" Appends one game record to an open log file. """
+	f.write(json.dumps(record, separators=(',', ':')))
+	f.write('\n')
+
+
+def readGames(f):
+	""" Yields the game records of an open log file, one at a time. """
+	for line in f:
+		line = line.strip()
+		if line:
+			yield json.loads(line)
+
+
+class TTTLogAnalyzer:
+	"""
+	Scores the decisions of logged games against the solved strategies,
+	game by game, and keeps aggregate totals.  Players come from the
+	process-wide strategy cache, so every game of the same kind shares
+	them.
+
+	"""
+
+	def __init__(self, tolerance=1e-9):
+		"""
+		INSTANCE VARIABLES:
+		- tolerance (how far a bid may be from the optimal bid and still
+		  count as optimal)
+		- games, turns (counts of games and turns analyzed)
+		- sides (maps X and O to aggregate totals: decisions, optimal
+		  bids, optimal moves, and chip advantage lost)
+		- wins (maps X, O and None to numbers of games)
+
+		"""
+		self.tolerance = tolerance
+		self.games = 0
+		self.turns = 0
+		self.sides = dict((side, {'decisions':0, 'optimalBids':0, 'moves':0, 'optimalMoves':0,
+		                          'advantageLost':0.0}) for side in (X, O))
+		self.wins = {X:0, O:0, None:0}
+
+	def analyzeGame(self, record):
+		"""
+		Scores one game record and adds it to the totals.  Returns the
+		game's report: per side, the number of bids that matched the
+		optimal bid, the number of moves that reached a child of
+		optimal value, and the chip advantage lost over the game, and
+		per turn, each side's value, optimal move and bid, bid played
+		and advantage lost.
+
+		"""
+		mode = record['mode']
+		chipNo = record.get('chipNo', 0)
+		cache = TTT.getStrategyCache()
+		players = {X:cache.get(X, mode, chipNo), O:cache.get(O, mode, chipNo)}
+		node = TTT.TTTGameNode()
+		sides = dict((side, {'optimalBids':0, 'optimalMoves':0, 'moves':0, 'advantageLost':0.0}) for side in (X, O))
+		turns = []
+
+		for turn in record['turns']:
+			winner = turn['winner']
+			move = tuple(turn['move'])
+			chips = dict(zip((X, O), turn['chips']))
+			bids = dict(zip((X, O), turn['bids']))
+			child = node.generateChild(winner, move)
+			afterChips = dict(chips)
+			afterChips[winner] -= turn['paid']
+			afterChips[TTT.PlayTTT.getOpponent(winner)] += turn['paid']
+
+			entry = {}
+			for side in (X, O):
+				player = players[side]
+				value = player.getValue(node)
+				optimalMove,optimalBid = player.getMoveBid(node)
+				if mode == 'd':
+					optimalBid = TTT.TTTGameSession.resolveBid(optimalBid, chips[side])
+				lost = (chips[side] - value) - (afterChips[side] - player.getValue(child))
+				stats = sides[side]
+				if abs(bids[side] - optimalBid) <= self.tolerance:
+					stats['optimalBids'] += 1
+				stats['advantageLost'] += max(lost, 0.0)
+				if side == winner:
+					stats['moves'] += 1
+					best = player.getValue(node.generateChild(side, optimalMove))
+					if player.getValue(child) <= best + self.tolerance:
+						stats['optimalMoves'] += 1
+				entry[side] = {'value':value, 'optimalMove':list(optimalMove), 'optimalBid':optimalBid,
+				               'bid':bids[side], 'advantageLost':lost}
+			turns.append(entry)
+			node = child
+
+		result = None
+		if node.isWin(X):
+			result = X
+		elif node.isWin(O):
+			result = O
+
+		self.games += 1
+		self.turns += len(turns)
+		self.wins[result] += 1
+		for side in (X, O):
+			totals = self.sides[side]
+			totals['decisions'] += len(turns)
+			for key in ('optimalBids', 'moves', 'optimalMoves', 'advantageLost'):
+				totals[key] += sides[side][key]
+
+		return {'game':record.get('game'), 'mode':mode, 'chipNo':chipNo, 'winner':result,
+		        'turns':len(turns), 'sides':sides, 'decisions':turns}
+
+	def report(self):
+		""" Returns the aggregate totals as a dictionary. """
+		sides = {}
+		for side,totals in self.sides.items():
+			decisions = max(totals['decisions'], 1)
+			sides[side] = {'decisions':totals['decisions'],
+			               'optimalBidRate':totals['optimalBids'] / float(decisions),
+			               'optimalMoveRate':totals['optimalMoves'] / float(max(totals['moves'], 1)),
+			               'advantageLostPerGame':totals['advantageLost'] / float(max(self.games, 1))}
+		return {'games':self.games, 'turns':self.turns,
+		        'wins':{X:self.wins[X], O:self.wins[O], 'draws':self.wins[None]},
+		        'sides':sides}
+
+
+def analyzeLog(f, perGame=None, decisions=False):
+	"""
+	Analyzes every game of an open log file and returns the aggregate
+	report.  If perGame is an open file, each game's report is written
+	to it as a line of JSON as soon as the game is analyzed (with the
+	per-turn decisions only if asked for).
+
+	"""
+	analyzer = TTTLogAnalyzer()
+	for record in readGames(f):
+		game = analyzer.analyzeGame(record)
+		if perGame is not None:
+			if not decisions:
+				del game['decisions']
+			perGame.write(json.dumps(game, sort_keys=True))
+			perGame.write('\n')
+	return analyzer.report()
+
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Audit a bidding Tic-Tac-Toe game log against the solved strategies.")
+	parser.add_argument('log', help="the game log ('-' for standard input)")
+	parser.add_argument('--per-game', metavar='PATH', help="write a report per game to this file, as JSON lines")
+	parser.add_argument('--decisions', action='store_true', help="include every decision in the per-game reports")
+	args = parser.parse_args(argv)
+
+	TTT.DEBUG = False
+	f = sys.stdin if args.log == '-' else open(args.log)
+	perGame = open(args.per_game, 'w') if args.per_game else None
+	start = time.time()
+	report = analyzeLog(f, perGame, args.decisions)
+	report['seconds'] = time.time() - start
+	if perGame is not None:
+		perGame.close()
+	print json.dumps(report, indent=2, sort_keys=True)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
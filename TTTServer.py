@@ -0,0 +1,481 @@
+"""
+A KevPaDa module for serving bidding Tic-Tac-Toe to many players at once over
+TCP, on a single event loop.
+
+The protocol is line-delimited JSON: each request is one JSON object on one
+line, and each gets one response line, in order per connection.  A request may
+carry an 'id', which is echoed in its response.  A connection may host any
+number of games at once; the user plays X and the agent O.
+
+  {"op": "new", "mode": "d", "chipNo": 20, "tieBreaker": false}
+      starts a game (tieBreaker: whether the user starts with the
+      tie-breaking chip) and returns its state, including its 'session' id
+  {"op": "turn", "session": 1, "bid": 3, "move": [1, 1]}
+      plays one turn; the response's state says whether the user won the
+      bid, or whether the user must now decide on the tie-breaking chip
+  {"op": "tieBreak", "session": 1, "use": true}
+      finishes a turn that waits on the tie-breaking chip
+  {"op": "state", "session": 1}      returns the state of a game
+  {"op": "close", "session": 1}      ends a game
+  {"op": "metrics"}                  returns the server's metrics
+
+Turns are arbitrated by TTT.TTTGameSession, with the same rules as
+PlayTTT.playReal and PlayTTT.playDiscrete.  The server serves the
+real-valued game and discrete-valued games of a fixed set of total chip
+counts (--chips), and solves them all before serving, so no request makes
+the loop wait on a solve.  Every game of the same kind is played by one
+agent: from the compiled strategy file if it has that kind of game, and
+otherwise from the process-wide strategy cache, within its memory budget.
+The turns that became ready during one pass of the loop are resolved
+together, with one table lookup per agent.
+
+A connection is not read from while it has too many responses waiting to be
+sent, which leaves the rest to TCP flow control; games expire after a period
+without a turn, and connections after a period without a request.
+
+Run 'python TTTServer.py --help' for the options.
+
+"""
+
+import argparse
+import asynchat
+import asyncore
+import json
+import math
+import os
+import random
+import socket
+import sys
+import time
+
+import TTT
+from TTT import X, O
+
+
+class TTTHostedGame:
+	""" A game hosted by a TTTServer, with the connection that owns it. """
+
+	def __init__(self, id, session, channel):
+		"""
+		INSTANCE VARIABLES:
+		- id (the session id sent to the client)
+		- session (the TTTGameSession)
+		- channel (the TTTServerChannel that owns the game)
+		- lastActive (the time of the last request for the game)
+		- queued (true while a turn waits to be resolved)
+
+		"""
+		self.id = id
+		self.session = session
+		self.channel = channel
+		self.lastActive = time.time()
+		self.queued = False
+
+
+class TTTServerChannel(asynchat.async_chat):
+	""" One client connection of a TTTServer. """
+
+	def __init__(self, server, sock):
+		"""
+		INSTANCE VARIABLES:
+		- server (the TTTServer)
+		- games (maps session ids to the games this connection owns)
+		- lastActive (the time of the last request)
+		- pending (the number of requests waiting on a resolution)
+		- closed (true once the connection has been dropped)
+
+		"""
+		asynchat.async_chat.__init__(self, sock, map=server.socketMap)
+		self.server = server
+		self.set_terminator('\n')
+		self.games = {}
+		self.lastActive = time.time()
+		self.pending = 0
+		self.closed = False
+		self._line = []
+		self._lineSize = 0
+
+	def collect_incoming_data(self, data):
+		self._lineSize += len(data)
+		if self._lineSize > self.server.maxLine:
+			if self._line or self._lineSize == len(data):
+				self._line = []
+				self.server.metrics.count('errors.lineTooLong')
+				self.respond({'ok':False, 'error':"request line too long"})
+				self.close_when_done()
+			return
+		self._line.append(data)
+
+	def found_terminator(self):
+		line = ''.join(self._line)
+		self._line = []
+		tooLong = self._lineSize > self.server.maxLine
+		self._lineSize = 0
+		if tooLong or self.closed:
+			return
+		self.lastActive = time.time()
+		if line.strip():
+			self.server.handleLine(self, line)
+
+	def readable(self):
+		# Backpressure: stop reading while too many responses are unsent.
+		return len(self.producer_fifo) + self.pending < self.server.maxQueued
+
+	def respond(self, response):
+		""" Queues one response line. """
+		self.push(json.dumps(response, separators=(',', ':')) + '\n')
+
+	def handle_close(self):
+		self.server.dropChannel(self)
+		self.close()
+
+
+class TTTServer(asyncore.dispatcher):
+	"""
+	Serves bidding Tic-Tac-Toe games over TCP (see the module docstring
+	for the protocol).  Call serve() to run the event loop.
+
+	"""
+
+	def __init__(self, host='127.0.0.1', port=0, strategies=None, maxConnections=10000,
+	             maxQueued=64, maxLine=4096, chipCounts=(20,), sessionTimeout=300.0,
+	             idleTimeout=600.0, rng=None):
+		"""
+		INSTANCE VARIABLES:
+		- socketMap (the asyncore map of the listening socket and the
+		  connections)
+		- address (the (host, port) the server listens on)
+		- strategies (a TTT.TTTStrategyFile, or None)
+		- maxConnections (connections beyond this are refused)
+		- maxQueued (the number of unsent responses and unresolved turns
+		  at which a connection stops being read)
+		- maxLine (the longest request line, in bytes)
+		- chipCounts (the total chip counts of the discrete-valued games
+		  served)
+		- sessionTimeout, idleTimeout (seconds without a request after
+		  which a game expires or a connection is closed)
+		- rng (the source of coin tosses for tied real-valued bids)
+		- compiled (maps (mode, chipNo) to the players loaded from the
+		  compiled strategy file, for the kinds of games served)
+		- games (maps session ids to TTTHostedGames)
+		- channels (the open connections)
+		- ready (the (game, request id, time received) turns waiting to
+		  be resolved)
+		- metrics (a TTT.TTTInstruments of the server's counters and
+		  latency histograms)
+
+		"""
+		self.socketMap = {}
+		asyncore.dispatcher.__init__(self, map=self.socketMap)
+		self.create_socket(socket.AF_INET, socket.SOCK_STREAM)
+		self.set_reuse_addr()
+		self.bind((host, port))
+		self.listen(1024)
+		self.address = self.socket.getsockname()
+		self.strategies = strategies
+		self.maxConnections = maxConnections
+		self.maxQueued = maxQueued
+		self.maxLine = maxLine
+		self.chipCounts = frozenset(chipCounts)
+		self.sessionTimeout = sessionTimeout
+		self.idleTimeout = idleTimeout
+		self.rng = rng if rng is not None else random.Random()
+		self.compiled = {}
+		self.games = {}
+		self.channels = set()
+		self.ready = []
+		self.metrics = TTT.TTTInstruments()
+		self._nextId = 1
+		self._running = False
+		self._started = time.time()
+		self._handlers = {'new':self.handleNew, 'turn':self.handleTurn, 'tieBreak':self.handleTieBreak,
+		                  'state':self.handleState, 'close':self.handleClose, 'metrics':self.handleMetrics}
+
+	def getAgent(self, mode, chipNo):
+		"""
+		Returns the agent for the given kind of game, which must be
+		served: from the compiled strategy file if it has one, and
+		otherwise from the strategy cache (which solves it again only if
+		it has been evicted).
+
+		"""
+		if mode == 'd' and chipNo not in self.chipCounts:
+			raise ValueError("chipNo must be one of %s" % ', '.join(str(k) for k in sorted(self.chipCounts)))
+		key = (mode, chipNo if mode == 'd' else 0)
+		agent = self.compiled.get(key)
+		if agent is not None:
+			return agent
+		if self.strategies is not None and self.strategies.hasStrategy(mode, O, key[1]):
+			agent = self.compiled[key] = self.strategies.getPlayer(mode, O, key[1])
+			return agent
+		cache = TTT.getStrategyCache()
+		if cache.contains(O, mode, key[1]):
+			return cache.get(O, mode, key[1])
+		start = time.time()
+		agent = cache.get(O, mode, key[1])
+		self.metrics.addTime('loadAgent', time.time() - start)
+		return agent
+
+	def prewarm(self):
+		""" Loads the agents of every kind of game served. """
+		self.getAgent('r', 0)
+		for chipNo in sorted(self.chipCounts):
+			self.getAgent('d', chipNo)
+
+	def handle_accept(self):
+		pair = self.accept()
+		if pair is None:
+			return
+		sock,address = pair
+		if len(self.channels) >= self.maxConnections:
+			self.metrics.count('connections.refused')
+			try:
+				sock.send(json.dumps({'ok':False, 'error':"too many connections"}) + '\n')
+			except socket.error:
+				pass
+			sock.close()
+			return
+		self.metrics.count('connections.accepted')
+		self.channels.add(TTTServerChannel(self, sock))
+
+	def dropChannel(self, channel):
+		""" Forgets a closed connection and ends its games. """
+		if channel.closed:
+			return
+		channel.closed = True
+		self.channels.discard(channel)
+		self.metrics.count('connections.closed')
+		for id in channel.games:
+			del self.games[id]
+			self.metrics.count('sessions.dropped')
+		channel.games = {}
+
+	def handleLine(self, channel, line):
+		""" Handles one request line, responding now or once its turn is resolved. """
+		received = time.time()
+		self.metrics.count('requests')
+		request = {}
+		try:
+			request = json.loads(line)
+			if not isinstance(request, dict):
+				request = {}
+				raise ValueError("a request must be a JSON object")
+			handler = self._handlers.get(request.get('op'))
+			if handler is None:
+				raise ValueError("unknown op: %r" % (request.get('op'),))
+			response = handler(channel, request, received)
+		except (ValueError, OverflowError, TypeError), e:
+			self.metrics.count('errors')
+			response = {'ok':False, 'error':str(e)}
+		if response is not None:
+			self._respond(channel, request.get('id'), response, received)
+
+	def _respond(self, channel, id, response, received):
+		""" A private method that sends a response and records its latency. """
+		if id is not None:
+			response['id'] = id
+		channel.respond(response)
+		self.metrics.observe('latency', time.time() - received)
+
+	def _getGame(self, channel, request):
+		""" A private method that returns the channel's game named by the request. """
+		game = channel.games.get(request.get('session'))
+		if game is None:
+			raise ValueError("unknown session: %r" % (request.get('session'),))
+		game.lastActive = time.time()
+		return game
+
+	def handleNew(self, channel, request, received):
+		mode = request.get('mode', 'r')
+		if mode not in ('r', 'd'):
+			raise ValueError("mode must be 'r' or 'd'")
+		chipNo = request.get('chipNo', 0)
+		if mode == 'd' and (not isinstance(chipNo, (int, long)) or isinstance(chipNo, bool)):
+			raise ValueError("chipNo must be an integer")
+		session = TTT.TTTGameSession.start(self.getAgent(mode, chipNo), mode, chipNo,
+		                                   bool(request.get('tieBreaker', False)), self.rng)
+		game = TTTHostedGame(self._nextId, session, channel)
+		self._nextId += 1
+		self.games[game.id] = game
+		channel.games[game.id] = game
+		self.metrics.count('sessions.started')
+		return self.describe(game)
+
+	def handleTurn(self, channel, request, received):
+		game = self._getGame(channel, request)
+		if game.queued:
+			raise ValueError("the last turn has not been resolved")
+		bid = request.get('bid')
+		move = request.get('move')
+		if not isinstance(bid, (int, long, float)) or isinstance(bid, bool) or \
+		   math.isinf(bid) or math.isnan(bid):
+			raise ValueError("bid must be a finite number")
+		if not isinstance(move, list) or len(move) != 2 or \
+		   not all(isinstance(i, (int, long)) and not isinstance(i, bool) for i in move):
+			raise ValueError("move must be a [row, column] pair")
+		game.session.submitBid(bid)
+		game.session.submitMove(tuple(move))
+		game.queued = True
+		channel.pending += 1
+		self.ready.append((game, request.get('id'), received))
+		return None
+
+	def handleTieBreak(self, channel, request, received):
+		game = self._getGame(channel, request)
+		game.session.submitTieBreak(bool(request.get('use')))
+		self._finishTurn(game)
+		return self.describe(game)
+
+	def handleState(self, channel, request, received):
+		return self.describe(self._getGame(channel, request))
+
+	def handleClose(self, channel, request, received):
+		game = self._getGame(channel, request)
+		if game.queued:
+			raise ValueError("the last turn has not been resolved")
+		self._endGame(game, 'sessions.closed')
+		return {'ok':True, 'session':game.id}
+
+	def handleMetrics(self, channel, request, received):
+		return {'ok':True, 'metrics':self.report()}
+
+	def _finishTurn(self, game):
+		""" A private method that counts a played turn, and the game if it is over. """
+		self.metrics.count('turns')
+		if game.session.isOver():
+			self._endGame(game, 'sessions.finished')
+
+	def _endGame(self, game, counter):
+		""" A private method that forgets a game. """
+		self.games.pop(game.id, None)
+		game.channel.games.pop(game.id, None)
+		self.metrics.count(counter)
+
+	def resolveReady(self):
+		"""
+		Resolves every turn submitted since the last call, looking up
+		the agents' decisions in one batch, and sends the responses.
+
+		"""
+		if not self.ready:
+			return
+		ready = self.ready
+		self.ready = []
+		start = time.time()
+		games = [game for game,id,received in ready if game.id in self.games]
+		decisions = TTT.getAgentMoveBids([game.session for game in games])
+		decisions = dict(zip([game.id for game in games], decisions))
+		self.metrics.observe('resolveBatch', time.time() - start)
+		self.metrics.count('resolveBatches')
+		for game,id,received in ready:
+			game.queued = False
+			game.channel.pending -= 1
+			if game.channel.closed or game.id not in decisions:
+				continue
+			game.session.resolve(decisions[game.id])
+			if not game.session.isAwaitingTieBreak():
+				self._finishTurn(game)
+			self._respond(game.channel, id, self.describe(game), received)
+
+	def expire(self, now=None):
+		""" Expires the games and closes the connections that have timed out. """
+		if now is None:
+			now = time.time()
+		for game in self.games.values():
+			if not game.queued and now - game.lastActive > self.sessionTimeout:
+				self._endGame(game, 'sessions.expired')
+				game.channel.respond({'ok':False, 'session':game.id, 'error':"session expired"})
+		for channel in list(self.channels):
+			if channel.pending == 0 and now - channel.lastActive > self.idleTimeout:
+				self.metrics.count('connections.timedOut')
+				channel.handle_close()
+
+	def describe(self, game):
+		""" Returns the state of a game as a response. """
+		session = game.session
+		return {'ok':True, 'session':game.id, 'mode':session.biddingType,
+		        'board':[''.join(row) for row in session.gamenode.getBoard()],
+		        'chips':[session.chips[X], session.chips[O]],
+		        'userLastBid':session.userLastBid, 'agentLastBid':session.agentLastBid,
+		        'userWonLastBid':session.userWonLastBid,
+		        'awaitingTieBreak':session.isAwaitingTieBreak(),
+		        'over':session.isOver(), 'winner':session.winner()}
+
+	def report(self):
+		""" Returns the server's metrics: gauges, counters and latency histograms. """
+		report = self.metrics.report()
+		del report['profiles']
+		report['gauges'] = {'connections':len(self.channels), 'sessions':len(self.games),
+		                    'uptime':time.time() - self._started}
+		report['strategyCache'] = TTT.getStrategyCache().stats()
+		return report
+
+	def serve(self, duration=None, pollInterval=0.05):
+		"""
+		Runs the event loop until stop() is called, or for the given
+		number of seconds.
+
+		"""
+		self._running = True
+		end = None if duration is None else time.time() + duration
+		lastExpiry = time.time()
+		while self._running:
+			asyncore.loop(timeout=pollInterval, use_poll=True, map=self.socketMap, count=1)
+			self.resolveReady()
+			now = time.time()
+			if now - lastExpiry >= 1.0:
+				self.expire(now)
+				lastExpiry = now
+			if end is not None and now >= end:
+				break
+		self._running = False
+
+	def stop(self):
+		""" Makes serve() return after the current pass of the loop. """
+		self._running = False
+
+	def shutdown(self):
+		""" Closes every connection and the listening socket. """
+		for channel in list(self.channels):
+			channel.handle_close()
+		self.close()
+
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Serve bidding Tic-Tac-Toe over TCP.")
+	parser.add_argument('--host', default='127.0.0.1', help="the address to listen on (default 127.0.0.1)")
+	parser.add_argument('--port', type=int, default=8765, help="the port to listen on (default 8765)")
+	parser.add_argument('--max-connections', type=int, default=10000, help="refuse connections beyond this many")
+	parser.add_argument('--max-queued', type=int, default=64,
+	                    help="stop reading a connection with this many unsent responses (default 64)")
+	parser.add_argument('--chips', default='10,20,100', metavar='CHIPS',
+	                    help="the comma-separated total chip counts of the discrete-valued games served, "
+	                         "all solved before serving (default 10,20,100)")
+	parser.add_argument('--session-timeout', type=float, default=300.0, help="seconds before an idle game expires")
+	parser.add_argument('--idle-timeout', type=float, default=600.0, help="seconds before an idle connection is closed")
+	parser.add_argument('--metrics', metavar='PATH', help="write the metrics to this file as JSON on exit")
+	parser.add_argument('--seed', type=int, help="seed the coin tosses of tied real-valued bids")
+	args = parser.parse_args(argv)
+
+	TTT.DEBUG = False
+	strategies = TTT.TTTStrategyFile(TTT.STRATEGY_FILE) if os.path.exists(TTT.STRATEGY_FILE) else None
+	server = TTTServer(args.host, args.port, strategies, args.max_connections, args.max_queued,
+	                   chipCounts=[int(chipNo) for chipNo in args.chips.split(',') if chipNo],
+	                   sessionTimeout=args.session_timeout, idleTimeout=args.idle_timeout,
+	                   rng=random.Random(args.seed))
+	server.prewarm()
+	print "Serving on %s:%d" % server.address
+	sys.stdout.flush()
+	try:
+		server.serve()
+	except KeyboardInterrupt:
+		pass
+	server.shutdown()
+	if args.metrics:
+		f = open(args.metrics, 'w')
+		json.dump(server.report(), f, indent=2, sort_keys=True)
+		f.close()
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
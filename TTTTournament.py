@@ -0,0 +1,353 @@
+"""
+A KevPaDa module for running self-play tournaments of the bidding Tic-Tac-Toe
+agent against scripted opponents, sharded across a process pool.
+
+Run 'python TTTTournament.py --help' for the options.
+
+"""
+
+import argparse
+import json
+import math
+import multiprocessing
+import random
+import sys
+import time
+
+import TTT
+from TTT import X, O
+
+
+class RandomBidder:
+	"""
+	An opponent that bids a uniformly random legal amount and moves to
+	a uniformly random blank square.
+
+	"""
+
+	def __init__(self, mode, chipNo):
+		self.mode = mode
+
+	def bidMove(self, session, rng):
+		chips = session.chips[session.user]
+		if self.mode == 'r':
+			bid = rng.uniform(0, chips)
+		else:
+			bid = rng.randint(0, int(chips))
+		return bid, randomMove(session, rng)
+
+	def useTieBreaker(self, session, rng):
+		return rng.random() < 0.5
+
+
+class AllInBidder(RandomBidder):
+	"""
+	An opponent that bids all of its chips every turn and moves to a
+	uniformly random blank square.
+
+	"""
+
+	def bidMove(self, session, rng):
+		chips = session.chips[session.user]
+		if self.mode == 'd':
+			chips = int(chips)
+		return chips, randomMove(session, rng)
+
+	def useTieBreaker(self, session, rng):
+		return True
+
+
+class FractionBidder(RandomBidder):
+	"""
+	An opponent that bids a fixed fraction of its chips (rounded down
+	to a whole chip in discrete-valued games) and moves to a uniformly
+	random blank square.
+
+	"""
+
+	def __init__(self, mode, chipNo, fraction):
+		self.mode = mode
+		self.fraction = fraction
+
+	def bidMove(self, session, rng):
+		bid = self.fraction * session.chips[session.user]
+		if self.mode == 'd':
+			bid = int(bid)
+		return bid, randomMove(session, rng)
+
+
+class AgentBidder(RandomBidder):
+	"""
+	An opponent that plays the agent's own strategy for its side.  Bids
+	are capped at its chips; in discrete-valued games they are resolved
+	by TTTGameSession.resolveBid, and the tie-breaking chip is used
+	exactly when the bid was marked with 0.25.
+
+	"""
+
+	def __init__(self, mode, chipNo):
+		self.mode = mode
+		self.player = _getAgent(mode, chipNo, X)
+
+	def bidMove(self, session, rng):
+		move,bid = self.player.getMoveBid(session.gamenode)
+		chips = session.chips[session.user]
+		if self.mode == 'd':
+			bid = int(TTT.TTTGameSession.resolveBid(bid, chips))
+		else:
+			bid = min(bid, chips)
+		return bid, move
+
+	def useTieBreaker(self, session, rng):
+		move,bid = self.player.getMoveBid(session.gamenode)
+		return bid % 1 == 0.25
+
+
+OPPONENTS = {'random':RandomBidder, 'allin':AllInBidder, 'agent':AgentBidder}
+
+def parseFraction(spec):
+	"""
+	Returns the fraction F of an opponent spec 'fraction:F'.  Raises
+	ValueError unless F is a number from 0 to 1.
+
+	"""
+	try:
+		fraction = float(spec.split(':', 1)[1])
+	except ValueError:
+		raise ValueError("fraction:F needs a number F, not %r" % spec)
+	if not 0 <= fraction <= 1:
+		raise ValueError("the fraction F of fraction:F must be from 0 to 1, not %r" % spec)
+	return fraction
+
+
+def checkOpponent(spec):
+	"""
+	Returns spec if it describes an opponent (see makeOpponent), and
+	raises ValueError otherwise.
+
+	"""
+	if spec.startswith('fraction:'):
+		parseFraction(spec)
+	elif spec not in OPPONENTS:
+		raise ValueError("unknown opponent %r: use random, allin, agent or fraction:F" % spec)
+	return spec
+
+
+def makeOpponent(spec, mode, chipNo):
+	"""
+	Returns the opponent described by spec: 'random', 'allin', 'agent',
+	or 'fraction:F' for a FractionBidder bidding the fraction F (from 0
+	to 1) of its chips.
+
+	"""
+	if spec.startswith('fraction:'):
+		return FractionBidder(mode, chipNo, parseFraction(spec))
+	return OPPONENTS[checkOpponent(spec)](mode, chipNo)
+
+
+def randomMove(session, rng):
+	""" Returns a uniformly random blank square of the session's board. """
+	return rng.choice([move for move in TTT.MOVES if session.gamenode.isBlank(*move)])
+
+
+# The solved players come from the process-wide strategy cache.  They are
+# solved in the parent before the pool is created, so forked workers share
+# the parent's tables read-only instead of solving their own.
+def _getAgent(mode, chipNo, player=O):
+	return TTT.getStrategyCache().get(player, mode, chipNo)
+
+
+class TTTTournamentStats:
+	"""
+	Aggregate results of a number of games: win, draw and loss counts
+	for the agent, and per-turn statistics of the agent's share of the
+	chips after each turn.  Stats of separate shards are combined with
+	merge().
+
+	"""
+
+	def __init__(self):
+		self.games = 0
+		self.wins = 0
+		self.draws = 0
+		self.losses = 0
+		self.turns = 0
+		# Per turn number: count, sum, sum of squares, min and max of
+		# the agent's chip share after that turn.
+		self.trajectory = [[0, 0.0, 0.0, None, None] for turn in range(9)]
+
+	def addGame(self, session, shares):
+		self.games += 1
+		self.turns += len(shares)
+		winner = session.winner()
+		if winner == session.agent.player:
+			self.wins += 1
+		elif winner is None:
+			self.draws += 1
+		else:
+			self.losses += 1
+		for turn,share in enumerate(shares):
+			entry = self.trajectory[turn]
+			entry[0] += 1
+			entry[1] += share
+			entry[2] += share * share
+			entry[3] = share if entry[3] is None else min(entry[3], share)
+			entry[4] = share if entry[4] is None else max(entry[4], share)
+
+	def merge(self, other):
+		self.games += other.games
+		self.wins += other.wins
+		self.draws += other.draws
+		self.losses += other.losses
+		self.turns += other.turns
+		for entry,otherEntry in zip(self.trajectory, other.trajectory):
+			entry[0] += otherEntry[0]
+			entry[1] += otherEntry[1]
+			entry[2] += otherEntry[2]
+			for i,pick in ((3, min), (4, max)):
+				if otherEntry[i] is not None:
+					entry[i] = otherEntry[i] if entry[i] is None else pick(entry[i], otherEntry[i])
+
+	def report(self):
+		""" Returns the results as a dictionary. """
+		games = max(self.games, 1)
+		trajectory = []
+		for turn,(count,total,squares,low,high) in enumerate(self.trajectory):
+			if not count: break
+			mean = total / count
+			trajectory.append({'turn':turn + 1, 'games':count, 'mean':mean,
+			                   'stdev':math.sqrt(max(squares / count - mean * mean, 0.0)),
+			                   'min':low, 'max':high})
+		return {'games':self.games,
+		        'winRate':self.wins / float(games),
+		        'drawRate':self.draws / float(games),
+		        'lossRate':self.losses / float(games),
+		        'turnsPerGame':self.turns / float(games),
+		        'agentChipShare':trajectory}
+
+
+def playShard(shard):
+	"""
+	Plays one shard of games and returns its TTTTournamentStats.  shard
+	is a (mode, chipNo, agentShare, opponentSpec, userHasTieBreaker,
+	seed, games) tuple; the shard's games are played with their own
+	random.Random(seed), so the results depend only on the shard.  The
+	games are played in lockstep, so each turn's agent decisions come
+	from a single TTT.resolveSessions call.
+
+	"""
+	mode,chipNo,agentShare,opponentSpec,userHasTieBreaker,seed,games = shard
+	rng = random.Random(seed)
+	agent = _getAgent(mode, chipNo)
+	opponent = makeOpponent(opponentSpec, mode, chipNo)
+	total = 1.0 if mode == 'r' else float(chipNo)
+
+	sessions = [TTT.TTTGameSession.start(agent, mode, chipNo, userHasTieBreaker, rng, agentShare)
+	            for game in range(games)]
+	shares = [[] for game in range(games)]
+	live = range(games)
+	while live:
+		for i in live:
+			bid,move = opponent.bidMove(sessions[i], rng)
+			sessions[i].submitBid(bid)
+			sessions[i].submitMove(move)
+		results = TTT.resolveSessions([sessions[i] for i in live])
+		for i,result in zip(live, results):
+			session = sessions[i]
+			if result is None:
+				session.submitTieBreak(opponent.useTieBreaker(session, rng))
+			shares[i].append(session.chips[agent.player] / total if total else 0.0)
+		live = [i for i in live if not sessions[i].isOver()]
+
+	stats = TTTTournamentStats()
+	for session,gameShares in zip(sessions, shares):
+		stats.addGame(session, gameShares)
+	return stats
+
+
+def runTournament(games, mode='r', chipNo=0, agentShare=TTT.AGENT_SHARE, opponent='random',
+                  userHasTieBreaker=False, workers=None, seed=0, shardSize=1000):
+	"""
+	Plays the given number of games of the agent (as O) against the
+	given opponent, sharded across a pool of worker processes, and
+	returns the report of the combined TTTTournamentStats along with
+	the elapsed time and throughput.  Shard i is played with the seed
+	seed * 1000003 + i, so the results are reproducible for a given seed and
+	shard size, whatever the number of workers.
+
+	"""
+	checkOpponent(opponent)
+
+	# Solve before forking, so the workers share the tables.
+	_getAgent(mode, chipNo)
+	if opponent == 'agent':
+		_getAgent(mode, chipNo, X)
+
+	shards = []
+	for i,start in enumerate(range(0, games, shardSize)):
+		shardSeed = seed * 1000003 + i
+		shards.append((mode, chipNo, agentShare, opponent, userHasTieBreaker, shardSeed,
+		               min(shardSize, games - start)))
+
+	startTime = time.time()
+	stats = TTTTournamentStats()
+	if workers == 1:
+		for shard in shards:
+			stats.merge(playShard(shard))
+	else:
+		pool = multiprocessing.Pool(workers)
+		try:
+			for shardStats in pool.imap(playShard, shards):
+				stats.merge(shardStats)
+		finally:
+			pool.close()
+			pool.join()
+	elapsed = time.time() - startTime
+
+	report = stats.report()
+	report.update({'mode':mode, 'chipNo':chipNo, 'agentShare':agentShare, 'opponent':opponent,
+	               'seed':seed, 'seconds':elapsed, 'gamesPerSecond':stats.games / max(elapsed, 1e-9)})
+	return report
+
+
+def _opponentArgument(spec):
+	""" The argparse type of --opponent. """
+	try:
+		return checkOpponent(spec)
+	except ValueError, e:
+		raise argparse.ArgumentTypeError(str(e))
+
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Run a self-play tournament of the bidding Tic-Tac-Toe agent.")
+	parser.add_argument('--games', type=int, default=100000)
+	parser.add_argument('--mode', choices=['r', 'd'], default='r')
+	parser.add_argument('--chips', type=int, default=0, help="total chip count (discrete-valued games)")
+	parser.add_argument('--share', type=float, default=TTT.AGENT_SHARE, help="the agent's starting share of the chips")
+	parser.add_argument('--opponent', type=_opponentArgument, default='random',
+	                    help="random, allin, agent or fraction:F, with F from 0 to 1")
+	parser.add_argument('--user-tie-breaker', action='store_true', help="give the opponent the tie-breaking chip")
+	parser.add_argument('--workers', type=int, default=None, help="worker processes (default: one per CPU)")
+	parser.add_argument('--seed', type=int, default=0)
+	parser.add_argument('--shard-size', type=int, default=1000)
+	parser.add_argument('--json', action='store_true', help="print the report as JSON")
+	args = parser.parse_args(argv)
+
+	TTT.DEBUG = False
+	report = runTournament(args.games, args.mode, args.chips, args.share, args.opponent,
+	                       args.user_tie_breaker, args.workers, args.seed, args.shard_size)
+	if args.json:
+		print json.dumps(report, indent=2, sort_keys=True)
+		return
+
+	print "%d games in %.2fs (%.0f games/sec)" % (report['games'], report['seconds'], report['gamesPerSecond'])
+	print "agent win/draw/loss: %.4f / %.4f / %.4f" % (report['winRate'], report['drawRate'], report['lossRate'])
+	print "turns per game: %.2f" % report['turnsPerGame']
+	print "agent chip share after each turn (mean, stdev, min, max):"
+	for entry in report['agentChipShare']:
+		print "  %d: %.4f %.4f %.4f %.4f (%d games)" % (entry['turn'], entry['mean'], entry['stdev'],
+		                                               entry['min'], entry['max'], entry['games'])
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,717 @@
+"""
+A KevPaDa module for bidding m,n,k-games: Tic-Tac-Toe generalized to a board
+of m rows and n columns, won by k in a row (horizontally, vertically or
+diagonally).  TTTVariant(3, 3, 3) is ordinary Tic-Tac-Toe, and solves to the
+same values and bids as TTT's players; TTT keeps its own engine for that
+case, with lookup tables that only fit a 3x3 board.
+
+Every state is stored as a pair of (m*n)-bit representations, as in TTT, and
+the state index is a dictionary over the canonical states only, so that
+storage grows with the number of states actually reachable rather than with
+the 4^(m*n) possible keys.
+
+Run 'python TTTVariant.py rows cols k [workers]' to solve a variant.
+
+"""
+
+import mmap
+import multiprocessing
+import os
+import shutil
+import struct
+import sys
+import tempfile
+import time
+from array import array
+
+import TTT
+from TTT import X, O, BLANK
+
+
+class TTTVariant:
+	"""
+	The geometry of an m,n,k-game: squares, winning lines and the
+	symmetries of the board.  Square i (numbered in row-major order) is
+	the bit squareMasks[i] = 1 << (size-1-i) and the move moves[i].
+
+	"""
+
+	def __init__(self, rows=3, cols=3, k=3):
+		"""
+		INSTANCE VARIABLES:
+		- rows, cols, k
+		- size (the number of squares)
+		- squareMasks, moves, fullMask
+		- winMasks (a mask for every line of k squares)
+		- symmetries (the rotations and reflections of the board:
+		  symmetry s moves the piece on square i to square
+		  symmetries[s][i]; the identity is symmetry 0)
+		- unmap (unmap[s][symmetries[s][i]] == i)
+
+		"""
+		if k > max(rows, cols):
+			raise ValueError("no line of %d fits on a %dx%d board" % (k, rows, cols))
+		self.rows = rows
+		self.cols = cols
+		self.k = k
+		self.size = rows * cols
+		self.squareMasks = [1 << (self.size-1-i) for i in range(self.size)]
+		self.moves = [(i / cols, i % cols) for i in range(self.size)]
+		self.fullMask = (1 << self.size) - 1
+		self.winMasks = self._generateWinMasks()
+
+		# Square boards have the eight symmetries of TTT.SYMMETRIES, in
+		# the same order; other boards only the four that keep the shape.
+		n = rows - 1
+		if rows == cols:
+			flips = [lambda r,c: (r, c),   lambda r,c: (c, n-r),   lambda r,c: (n-r, n-c), lambda r,c: (n-c, r),
+			         lambda r,c: (r, n-c), lambda r,c: (n-r, c),   lambda r,c: (c, r),     lambda r,c: (n-c, n-r)]
+		else:
+			flips = [lambda r,c: (r, c),   lambda r,c: (rows-1-r, cols-1-c),
+			         lambda r,c: (r, cols-1-c),   lambda r,c: (rows-1-r, c)]
+		self.symmetries = [[cols*r + c for r,c in [f(row, col) for row,col in self.moves]] for f in flips]
+		self.unmap = [[perm.index(i) for i in range(self.size)] for perm in self.symmetries]
+
+		# Each symmetry is applied a byte at a time: _byteTransforms[s][j][b]
+		# is the representation whose j-th byte (from the least significant)
+		# is b, moved by symmetry s.
+		self._byteTransforms = []
+		for perm in self.symmetries:
+			tables = []
+			for j in range((self.size + 7) // 8):
+				table = []
+				for b in range(256):
+					rep = 0
+					for bit in range(8):
+						position = 8*j + bit
+						if b & (1 << bit) and position < self.size:
+							rep |= self.squareMasks[perm[self.size-1-position]]
+					table.append(rep)
+				tables.append(table)
+			self._byteTransforms.append(tables)
+
+	def _generateWinMasks(self):
+		masks = []
+		for row in range(self.rows):
+			for col in range(self.cols):
+				for dr,dc in ((0, 1), (1, 0), (1, 1), (1, -1)):
+					endRow = row + dr*(self.k-1)
+					endCol = col + dc*(self.k-1)
+					if endRow < self.rows and 0 <= endCol < self.cols:
+						masks.append(sum(self.squareMasks[(row + dr*j)*self.cols + col + dc*j]
+						                 for j in range(self.k)))
+		return masks
+
+	def isWin(self, rep):
+		""" Returns true if the given representation covers a winning line. """
+		for mask in self.winMasks:
+			if rep & mask == mask:
+				return True
+		return False
+
+	def transform(self, rep, symmetry):
+		""" Returns the representation rep moved by the given symmetry. """
+		moved = 0
+		for table in self._byteTransforms[symmetry]:
+			moved |= table[rep & 255]
+			rep >>= 8
+		return moved
+
+	def canonicalForm(self, xRep, oRep):
+		"""
+		Returns (xRep, oRep, symmetry) for the canonical form of the
+		given state: of its images under the symmetries of the board,
+		the one with the smallest key (xRep << size) | oRep, preferring
+		the identity, as TTT.canonicalForm does.
+
+		"""
+		best = None
+		for s in range(len(self.symmetries)):
+			key = (self.transform(xRep, s) << self.size) | self.transform(oRep, s)
+			if best is None or key < best:
+				best = key
+				symmetry = s
+		return best >> self.size, best & self.fullMask, symmetry
+
+	def __repr__(self):
+		return "TTTVariant(%d, %d, %d)" % (self.rows, self.cols, self.k)
+
+
+class TTTVariantNode:
+	"""
+	A state of an m,n,k-game, with the same queries as TTT.TTTGameNode.
+
+	"""
+
+	def __init__(self, variant, xRep=0, oRep=0):
+		"""
+		INSTANCE VARIABLES:
+		- variant
+		- xRep
+		- oRep
+
+		"""
+		self.variant = variant
+		self.xRep = xRep
+		self.oRep = oRep
+
+	def getRep(self, player):
+		""" Returns the representation of the given player's pieces. """
+		if player == X:
+			return self.xRep
+		return self.oRep
+
+	def isWin(self, player):
+		return self.variant.isWin(self.getRep(player))
+
+	def isBlank(self, row, col):
+		""" Returns true if the square at (row, col) is unoccupied. """
+		return not ((self.xRep | self.oRep) & self.variant.squareMasks[self.variant.cols*row + col])
+
+	def isTerminal(self):
+		""" Terminal states are either full or won. """
+		return self.isWin(X) or self.isWin(O) or (self.xRep | self.oRep) == self.variant.fullMask
+
+	def generateLegalMoves(self):
+		""" Returns the list of blank squares, as (row, column) tuples, or [] if terminal. """
+		if self.isTerminal():
+			return []
+		bits = self.xRep | self.oRep
+		return [move for move,mask in zip(self.variant.moves, self.variant.squareMasks) if not (bits & mask)]
+
+	def generateChild(self, player, (row,col)):
+		""" Returns the node that results from player moving to (row, col). """
+		mask = self.variant.squareMasks[self.variant.cols*row + col]
+		if player == X:
+			return TTTVariantNode(self.variant, self.xRep | mask, self.oRep & ~mask)
+		return TTTVariantNode(self.variant, self.xRep & ~mask, self.oRep | mask)
+
+	def generateChildren(self, player):
+		""" Returns the nodes of all the moves of player, in row-major order. """
+		return [self.generateChild(player, move) for move in self.generateLegalMoves()]
+
+	def getBoard(self):
+		""" Returns the board as a new list of lists. """
+		board = [[BLANK] * self.variant.cols for row in range(self.variant.rows)]
+		for (row,col),mask in zip(self.variant.moves, self.variant.squareMasks):
+			if self.xRep & mask:
+				board[row][col] = X
+			elif self.oRep & mask:
+				board[row][col] = O
+		return board
+
+	def __hash__(self):
+		return (self.xRep << self.variant.size) | self.oRep
+
+	def __eq__(self, other):
+		return self.xRep == other.xRep and self.oRep == other.oRep
+
+	def __ne__(self, other):
+		return not self == other
+
+	def __str__(self):
+		rule = '+'.join(['---'] * self.variant.cols) + '\n'
+		return rule.join('|'.join(' ' + square + ' ' for square in row) + '\n' for row in self.getBoard())
+
+
+class TTTVariantIndex:
+	"""
+	The legal states of a variant, up to symmetry, ranked layer by layer
+	as in TTT.TTTStateIndex: the states with i blank squares occupy the
+	contiguous indices layerStart[i] to layerStart[i+1]-1.  Only
+	canonical states are enumerated, from the canonical states of the
+	layer before (the children of symmetric states are symmetric), and
+	ranks is a dictionary over their keys.
+
+	"""
+
+	def __init__(self, variant):
+		"""
+		INSTANCE VARIABLES:
+		- variant
+		- keys (the key (xRep << size) | oRep of each canonical state)
+		- winner (X, O or None for each state)
+		- layerStart (the first index of each layer, plus the size)
+		- ranks (maps canonical keys to indices)
+
+		"""
+		self.variant = variant
+		size = variant.size
+		full = variant.fullMask
+
+		layers = [[] for i in range(size + 1)]
+		layers[size] = [0]
+		for blanks in range(size, 0, -1):
+			children = set()
+			for key in layers[blanks]:
+				xRep = key >> size
+				oRep = key & full
+				if variant.isWin(xRep) or variant.isWin(oRep):
+					continue
+				bits = xRep | oRep
+				for mask in variant.squareMasks:
+					if not (bits & mask):
+						for childX,childO in ((xRep | mask, oRep), (xRep, oRep | mask)):
+							childX,childO,symmetry = variant.canonicalForm(childX, childO)
+							children.add((childX << size) | childO)
+			layers[blanks-1] = sorted(children)
+
+		self.keys = array('L')
+		self.winner = []
+		self.layerStart = []
+		self.ranks = {}
+		for blanks in range(size + 1):
+			self.layerStart.append(len(self.keys))
+			for key in layers[blanks]:
+				self.ranks[key] = len(self.keys)
+				self.keys.append(key)
+				if variant.isWin(key >> size):
+					self.winner.append(X)
+				elif variant.isWin(key & full):
+					self.winner.append(O)
+				else:
+					self.winner.append(None)
+			layers[blanks] = None
+		self.layerStart.append(len(self.keys))
+
+	def size(self):
+		""" Returns the number of canonical legal states. """
+		return len(self.keys)
+
+	def layer(self, i):
+		""" Returns the range of indices of the states with i blank squares. """
+		return xrange(self.layerStart[i], self.layerStart[i+1])
+
+	def locate(self, xRep, oRep):
+		""" Returns the (index, symmetry) pair of the state with the given representations. """
+		xRep,oRep,symmetry = self.variant.canonicalForm(xRep, oRep)
+		return self.ranks[(xRep << self.variant.size) | oRep], symmetry
+
+
+class TTTVariantPlayer:
+	"""
+	A perfect player of a bidding m,n,k-game, real-valued (mode 'r') or
+	discrete-valued (mode 'd'), solved bottom-up over the layers of a
+	TTTVariantIndex exactly as TTT.TTTRealPlayer and
+	TTT.TTTDiscretePlayer are.  Tables are flat arrays indexed by state:
+	values, bids, and the square of the optimal move (-1 for terminal
+	states), in canonical orientation.
+
+	"""
+
+	# Layers with fewer states than this are solved in the parent even
+	# when solving in parallel, as handing them out costs more than it saves.
+	PARALLEL_MIN_STATES = 4096
+
+	def __init__(self, index, player, biddingType='r', totalChips=0, workers=1):
+		"""
+		INSTANCE VARIABLES:
+		- index (the TTTVariantIndex solved over)
+		- player (either 'X' or 'O')
+		- opponent (the opposite of player)
+		- biddingType ('r' or 'd')
+		- totalChips (the total number of chips in play, for 'd')
+		- workers (the number of processes to solve with; None for
+		  one per CPU)
+		- values, bids, squares
+
+		"""
+		self.index = index
+		self.player = player
+		self.opponent = TTT.PlayTTT.getOpponent(player)
+		self.biddingType = biddingType
+		self.totalChips = totalChips
+		self.workers = workers if workers is not None else multiprocessing.cpu_count()
+		size = index.size()
+		self.values = array('d', [0.0]) * size
+		self.bids = array('d', [0.0]) * size
+		self.squares = array('b', [-1]) * size
+		TTT._measure(biddingType == 'r' and 'variant.real' or 'variant.discrete', self.generateStrategy)
+
+	def getMoveBid(self, currentNode):
+		""" Returns the (move, bid) tuple for the specified node. """
+		idx,symmetry = self.index.locate(currentNode.xRep, currentNode.oRep)
+		square = self.squares[idx]
+		if square < 0:
+			raise ValueError("there is no move from a terminal state")
+		variant = self.index.variant
+		return variant.moves[variant.unmap[symmetry][square]], self.bids[idx]
+
+	def getValue(self, currentNode):
+		""" Returns the (discrete-)Richman value of the specified node. """
+		return self.values[self.index.locate(currentNode.xRep, currentNode.oRep)[0]]
+
+	def generateStrategy(self):
+		"""
+		This method populates values, bids and squares, one layer at a
+		time with _solveLayer.
+
+		"""
+		if self.workers > 1:
+			self._generateStrategyParallel()
+			return
+
+		index = self.index
+		previous = None
+		for i in range(index.variant.size + 1):
+			start,end = index.layerStart[i],index.layerStart[i+1]
+			keys = index.keys[start:end]
+			values,bids,squares = _solveLayer(index.variant, self.player, self.biddingType,
+			                                  self.totalChips, keys, previous)
+			self.values[start:end] = values
+			self.bids[start:end] = bids
+			self.squares[start:end] = squares
+			previous = dict(zip(keys, values))
+
+	def _generateStrategyParallel(self):
+		"""
+		The parallel counterpart of generateStrategy.  The tables are
+		shared-memory arrays, and a pool of worker processes is forked
+		with the index and the tables.  Each layer is split into chunks
+		that the workers solve into the shared tables, reading the
+		previous layer from them; the layer is finished (a barrier)
+		before the next one is handed out.  The tables are identical to
+		those of the serial solve.
+
+		"""
+		global _shared, _previous
+		index = self.index
+		size = index.size()
+		values = multiprocessing.RawArray('d', size)
+		bids = multiprocessing.RawArray('d', size)
+		squares = multiprocessing.RawArray('b', size)
+		_shared = (index, self.player, self.biddingType, self.totalChips, values, bids, squares)
+		_previous = (None, None)
+
+		pool = multiprocessing.Pool(self.workers)
+		try:
+			for i in range(index.variant.size + 1):
+				start,end = index.layerStart[i],index.layerStart[i+1]
+				if end - start < self.PARALLEL_MIN_STATES:
+					_solveChunk((i, start, end))
+					continue
+				step = max(1, (end - start) // (4 * self.workers))
+				pool.map(_solveChunk, [(i, chunk, min(chunk + step, end)) for chunk in range(start, end, step)])
+		finally:
+			pool.close()
+			pool.join()
+			_shared = None
+			_previous = (None, None)
+
+		self.values = array('d', values)
+		self.bids = array('d', bids)
+		self.squares = array('b', squares)
+
+
+# The index, side, mode, chip count and shared tables of the parallel
+# solve in progress, inherited by the forked workers; and, in each
+# worker, the previous layer's values of the last layer it solved.
+_shared = None
+_previous = (None, None)
+
+def _solveChunk((i, start, end)):
+	"""
+	Solves the states start to end-1 of layer i of the parallel solve in
+	progress into its shared tables.
+
+	"""
+	global _previous
+	index,player,biddingType,totalChips,values,bids,squares = _shared
+	if i == 0:
+		_previous = (i, None)
+	elif _previous[0] != i:
+		previousStart,previousEnd = index.layerStart[i-1],index.layerStart[i]
+		_previous = (i, dict(zip(index.keys[previousStart:previousEnd], values[previousStart:previousEnd])))
+	layerValues,layerBids,layerSquares = _solveLayer(index.variant, player, biddingType, totalChips,
+	                                                 index.keys[start:end], _previous[1])
+	values[start:end] = layerValues
+	bids[start:end] = layerBids
+	squares[start:end] = layerSquares
+
+
+def _solveLayer(variant, player, biddingType, totalChips, keys, previous):
+	"""
+	Solves the canonical states with the given keys, all of which have
+	the same number of blank squares, given previous, which maps the
+	keys of the canonical states with one blank fewer to their values.
+	Returns the arrays of their values, bids and squares.
+
+	Wins for the player are worth 0, and losses and draws 1
+	(real-valued) or totalChips+1 (discrete-valued); every other state
+	combines the minimum value of the player's children with the
+	maximum value of the opponent's, as in TTT's solvers, and the
+	favored square is the first in row-major order.
+
+	"""
+	size = variant.size
+	full = variant.fullMask
+	canonicalForm = variant.canonicalForm
+	opponent = TTT.PlayTTT.getOpponent(player)
+	loss = 1.0 if biddingType == 'r' else totalChips + 1.0
+
+	values = array('d', [0.0]) * len(keys)
+	bids = array('d', [0.0]) * len(keys)
+	squares = array('b', [-1]) * len(keys)
+	for idx,key in enumerate(keys):
+		xRep = key >> size
+		oRep = key & full
+		myRep,oppRep = (xRep,oRep) if player == X else (oRep,xRep)
+		bits = xRep | oRep
+		if variant.isWin(myRep):
+			values[idx] = 0.0
+			continue
+		if variant.isWin(oppRep) or bits == full:
+			values[idx] = loss
+			continue
+
+		minimum = None
+		maximum = None
+		for square,mask in enumerate(variant.squareMasks):
+			if bits & mask:
+				continue
+			childX,childO,s = canonicalForm(xRep | mask, oRep)
+			xValue = previous[(childX << size) | childO]
+			childX,childO,s = canonicalForm(xRep, oRep | mask)
+			oValue = previous[(childX << size) | childO]
+			mine,theirs = (xValue,oValue) if player == X else (oValue,xValue)
+			if minimum is None or mine < minimum:
+				minimum = mine
+				favored = square
+			if maximum is None or theirs > maximum:
+				maximum = theirs
+
+		if biddingType == 'r':
+			values[idx] = (maximum + minimum)/2.0
+			bids[idx] = abs(maximum-minimum)/2.0
+		else:
+			values[idx],bids[idx] = TTT._discreteCase(minimum, maximum)
+		squares[idx] = favored
+	return values,bids,squares
+
+
+def _writeArray(f, values):
+	""" Writes an array to f in little-endian order. """
+	if sys.byteorder == 'big':
+		values = array(values.typecode, values)
+		values.byteswap()
+	values.tofile(f)
+
+
+def _readArray(f, typecode, offset, count):
+	""" Reads count items of the given typecode, stored little-endian at offset of f. """
+	values = array(typecode)
+	f.seek(offset)
+	values.fromfile(f, count)
+	if sys.byteorder == 'big':
+		values.byteswap()
+	return values
+
+
+def spillStates(variant, directory):
+	"""
+	Enumerates the canonical legal states of a variant as
+	TTTVariantIndex does, but keeps only two layers in memory: each
+	layer's sorted keys are written to the file 'layer<i>' in directory
+	(i being the number of blank squares) as soon as it is complete.
+	Returns the list of the number of states in each layer.
+
+	"""
+	size = variant.size
+	full = variant.fullMask
+	counts = [0] * (size + 1)
+	layer = [0]
+	for blanks in range(size, -1, -1):
+		counts[blanks] = len(layer)
+		f = open(os.path.join(directory, 'layer%d' % blanks), 'wb')
+		_writeArray(f, array('L', layer))
+		f.close()
+		if blanks == 0:
+			break
+		children = set()
+		for key in layer:
+			xRep = key >> size
+			oRep = key & full
+			if variant.isWin(xRep) or variant.isWin(oRep):
+				continue
+			bits = xRep | oRep
+			for mask in variant.squareMasks:
+				if not (bits & mask):
+					for childX,childO in ((xRep | mask, oRep), (xRep, oRep | mask)):
+						childX,childO,symmetry = variant.canonicalForm(childX, childO)
+						children.add((childX << size) | childO)
+		layer = sorted(children)
+	return counts
+
+
+# The estimated memory, in bytes, of one state of the previous layer
+# (its key and value, and their dictionary entry) and of one state of
+# the chunk of the current layer being solved.
+RESIDENT_BYTES = 120
+CHUNK_BYTES = 8 + 8 + 8 + 1
+
+def solveToFile(variant, path, player=O, biddingType='r', totalChips=0, memoryCeiling=None, workDir=None):
+	"""
+	Solves a variant out of core, writing the strategy to a file at path
+	that is read with TTTVariantStrategyFile.  The states are enumerated
+	with spillStates, and then solved bottom-up with only the previous
+	layer resident: each layer is solved in chunks, and every chunk's
+	values, bids and squares are written to the file as soon as it is
+	solved.  The previous layer is read back from the file.
+
+	memoryCeiling, if given, bounds the estimated memory of the solve
+	(RESIDENT_BYTES per state of the previous layer, CHUNK_BYTES per
+	state of a chunk); a MemoryError is raised if a layer cannot be
+	solved within it.  The tables are identical to those of
+	TTTVariantPlayer.  The file's layout is:
+	- a header (TTTVariantStrategyFile.HEADER);
+	- a directory of (count, offset) pairs of uint64s, one per layer;
+	- the layers, each holding the sorted keys (uint64), values
+	  (float64), bids (float64) and squares (int8, -1 for terminal
+	  states) of its states, as four consecutive arrays.
+
+	"""
+	if array('L').itemsize != 8:
+		raise ValueError("keys are stored as 8-byte unsigned longs")
+	spillDir = tempfile.mkdtemp(dir=workDir)
+	try:
+		counts = spillStates(variant, spillDir)
+		offsets = []
+		offset = TTTVariantStrategyFile.HEADER.size + 16 * len(counts)
+		for count in counts:
+			offsets.append(offset)
+			offset += 25 * count
+
+		f = open(path + ".tmp", 'w+b')
+		f.write(TTTVariantStrategyFile.HEADER.pack(TTTVariantStrategyFile.MAGIC, TTTVariantStrategyFile.VERSION,
+		                                           variant.rows, variant.cols, variant.k,
+		                                           biddingType, player, totalChips))
+		for count,offset in zip(counts, offsets):
+			f.write(struct.pack('<QQ', count, offset))
+
+		previous = None
+		for i,(count,offset) in enumerate(zip(counts, offsets)):
+			chunkRows = count
+			if memoryCeiling is not None:
+				resident = RESIDENT_BYTES * (counts[i-1] if i else 0)
+				chunkRows = min(count, (memoryCeiling - resident) // CHUNK_BYTES)
+				if chunkRows < 1 and count:
+					raise MemoryError("layer %d of %r does not fit in %d bytes" % (i, variant, memoryCeiling))
+
+			layerFile = open(os.path.join(spillDir, 'layer%d' % i), 'rb')
+			for start in range(0, count, max(chunkRows, 1)):
+				rows = min(chunkRows, count - start)
+				keys = _readArray(layerFile, 'L', 8 * start, rows)
+				values,bids,squares = _solveLayer(variant, player, biddingType, totalChips, keys, previous)
+				for section,data,width in ((0, keys, 8), (8, values, 8), (16, bids, 8), (24, squares, 1)):
+					f.seek(offset + section * count + width * start)
+					_writeArray(f, data)
+			layerFile.close()
+
+			# This layer becomes the previous one; the old one is
+			# released before the new one is read.
+			previous = None
+			keys = _readArray(f, 'L', offset, count)
+			values = _readArray(f, 'd', offset + 8 * count, count)
+			previous = dict(zip(keys, values))
+			del keys,values
+
+		f.close()
+		os.rename(path + ".tmp", path)
+	except:
+		if os.path.exists(path + ".tmp"):
+			os.remove(path + ".tmp")
+		raise
+	finally:
+		shutil.rmtree(spillDir)
+
+
+class TTTVariantStrategyFile:
+	"""
+	A memory-mapped strategy written by solveToFile, with the same
+	getMoveBid and getValue methods as TTTVariantPlayer.  A state is
+	found by binary search among the sorted keys of its layer (given by
+	its number of blank squares), so nothing is loaded up front.
+
+	"""
+
+	MAGIC = 'BTTTVRNT'
+	VERSION = 1
+	# magic, version, rows, columns, k, mode, side, total chip count
+	HEADER = struct.Struct('<8sIIIIccxxi')
+
+	def __init__(self, path):
+		"""
+		INSTANCE VARIABLES:
+		- variant
+		- biddingType, player, totalChips
+		- layers (the (count, offset) pair of each layer)
+
+		"""
+		f = open(path, 'rb')
+		self._map = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+		f.close()
+
+		magic,version,rows,cols,k,self.biddingType,self.player,self.totalChips = \
+			self.HEADER.unpack_from(self._map, 0)
+		if magic != self.MAGIC or version != self.VERSION:
+			raise ValueError(path + " is not a variant strategy file of version " + str(self.VERSION))
+		self.variant = TTTVariant(rows, cols, k)
+		self.layers = [struct.unpack_from('<QQ', self._map, self.HEADER.size + 16*i)
+		               for i in range(self.variant.size + 1)]
+
+	def locate(self, xRep, oRep):
+		"""
+		Returns the (layer, position, symmetry) of the state with the
+		given representations: its position among its layer's states.
+
+		"""
+		variant = self.variant
+		xRep,oRep,symmetry = variant.canonicalForm(xRep, oRep)
+		key = (xRep << variant.size) | oRep
+		layer = variant.size - bin(xRep | oRep).count('1')
+		count,offset = self.layers[layer]
+		low,high = 0,count
+		while low < high:
+			middle = (low + high) // 2
+			if struct.unpack_from('<Q', self._map, offset + 8*middle)[0] < key:
+				low = middle + 1
+			else:
+				high = middle
+		if low == count or struct.unpack_from('<Q', self._map, offset + 8*low)[0] != key:
+			raise KeyError("not a legal state")
+		return layer,low,symmetry
+
+	def getMoveBid(self, currentNode):
+		""" Returns the (move, bid) tuple for the specified node. """
+		layer,position,symmetry = self.locate(currentNode.xRep, currentNode.oRep)
+		count,offset = self.layers[layer]
+		bid = struct.unpack_from('<d', self._map, offset + 16*count + 8*position)[0]
+		square = struct.unpack_from('<b', self._map, offset + 24*count + position)[0]
+		if square < 0:
+			raise ValueError("there is no move from a terminal state")
+		return self.variant.moves[self.variant.unmap[symmetry][square]], bid
+
+	def getValue(self, currentNode):
+		""" Returns the (discrete-)Richman value of the specified node. """
+		layer,position,symmetry = self.locate(currentNode.xRep, currentNode.oRep)
+		count,offset = self.layers[layer]
+		return struct.unpack_from('<d', self._map, offset + 8*count + 8*position)[0]
+
+	def close(self):
+		self._map.close()
+
+
+def main(argv):
+	rows,cols,k = [int(arg) for arg in argv[:3]] if len(argv) >= 3 else (3, 3, 3)
+	workers = int(argv[3]) if len(argv) >= 4 else 1
+	variant = TTTVariant(rows, cols, k)
+	start = time.time()
+	index = TTTVariantIndex(variant)
+	print "%r: %d canonical states (%.2fs)" % (variant, index.size(), time.time() - start)
+	start = time.time()
+	player = TTTVariantPlayer(index, O, workers=workers)
+	print "Richman value of the empty board: %r (%.2fs)" % (player.getValue(TTTVariantNode(variant)), time.time() - start)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,282 @@
+"""
+A KevPaDa module for verifying the agent's strategies exactly: for every split
+of the chips, whether the strategy the agent plays wins against every bid and
+move of its opponent, and hence the least chips the agent needs.
+
+The agent's bids and moves do not depend on its chips, so its winning holdings
+in each state form a set that is computed once per state, bottom-up over the
+shared TTTStateIndex, from the sets of the state's children.  Nothing is
+searched by chip count:
+
+- In real-valued play the winning holdings of a state are an interval
+  (threshold, 1], possibly closed at the threshold, and are carried as an
+  exact Fraction threshold.  Tied bids are won by whichever side suits the
+  opponent.
+- In discrete-valued play the winning holdings are kept as a bit mask over
+  the agent's chip count in half chips (odd if it holds the tie-breaking
+  chip), and every bid the opponent may answer is covered by a few shifts
+  and masks.  Bids are resolved as TTT.TTTGameSession resolves them,
+  including the 0.25 marker and the opponent's choice to use the
+  tie-breaking chip.
+
+A draw counts as a failure, and so does a bid the agent cannot pay: the
+session plays it as a bid of all the agent's chips, which the verified
+strategy does not plan for, so holdings that win only through such a bid are
+not counted.
+
+Run 'python TTTVerify.py --help' for the options.
+
+"""
+
+import argparse
+import math
+import sys
+import time
+from fractions import Fraction
+
+import TTT
+from TTT import O
+
+
+# An interval that holds no chip count.
+NEVER = (float('inf'), False)
+
+def _meet(s, t):
+	""" Returns the intersection of two (threshold, closed) intervals. """
+	if s[0] != t[0]:
+		return s if s[0] > t[0] else t
+	return (s[0], s[1] and t[1])
+
+def _join(s, t):
+	""" Returns the union of two (threshold, closed) intervals. """
+	if s[0] != t[0]:
+		return s if s[0] < t[0] else t
+	return (s[0], s[1] or t[1])
+
+def _shift(s, d):
+	""" Returns the interval s moved by d. """
+	return (s[0] + d, s[1])
+
+
+def _agentChild(index, player, idx):
+	"""
+	Returns the agent's (child index, bid) at the canonical state idx,
+	as its getMoveBid answers for that state.
+
+	"""
+	node = index.getNode(idx)
+	move,bid = player.getMoveBid(node)
+	child = node.generateChild(player.player, move)
+	return index.rank(child.xRep, child.oRep), bid
+
+
+class TTTRealVerifier:
+	"""
+	Verifies a real-valued player: the exact least share of the chips
+	from which its strategy wins each state.
+
+	"""
+
+	def __init__(self, player):
+		"""
+		INSTANCE VARIABLES:
+		- player (the verified player; any player with getMoveBid)
+		- thresholds (for each state index, the (threshold, closed) pair:
+		  the player wins with a share above threshold, or at it too if
+		  closed)
+
+		"""
+		self.player = player
+		index = TTT.getStateIndex()
+		table = TTT.getTransitionTable()
+		opponent = TTT.PlayTTT.getOpponent(player.player)
+		thresholds = [None] * index.size()
+
+		for idx in range(index.size()):
+			if table.terminal[idx]:
+				thresholds[idx] = (Fraction(0), True) if table.winner[idx] == player.player else NEVER
+				continue
+			child,bid = _agentChild(index, player, idx)
+			bid = Fraction(bid)
+
+			# The agent must be able to pay its bid, and win after winning
+			# the bid (which the opponent can always concede).
+			s = _meet((bid, True), _shift(thresholds[child], bid))
+
+			# If the opponent can match the bid, it can take the move and
+			# pay the agent as little as the bid.
+			taken = (Fraction(0), True)
+			for oppChild in table.children[opponent][idx]:
+				taken = _meet(taken, _shift(thresholds[oppChild], -bid))
+			thresholds[idx] = _meet(s, _join((1 - bid, False), taken))
+
+		self.thresholds = thresholds
+
+	def threshold(self, node=None):
+		""" Returns the (threshold, closed) pair of a node (the root by default). """
+		if node is None:
+			node = TTT.TTTGameNode()
+		return self.thresholds[node.index()]
+
+	def wins(self, share, node=None):
+		""" Returns true if the strategy wins the node (the root by default) with the given share. """
+		threshold,closed = self.threshold(node)
+		share = Fraction(share)
+		return share > threshold or (closed and share == threshold)
+
+
+class TTTDiscreteVerifier:
+	"""
+	Verifies a discrete-valued player for its total chip count: the
+	exact set of the agent's chip counts, with and without the
+	tie-breaking chip, from which its strategy wins each state.
+
+	"""
+
+	def __init__(self, player):
+		"""
+		INSTANCE VARIABLES:
+		- player (the verified player; any player with getMoveBid and
+		  totalChips)
+		- totalChips (the total chip count, not counting the
+		  tie-breaking chip)
+		- winning (for each state index, a bit mask of the agent's
+		  winning chip counts, in half chips: bit 2n is n chips, and
+		  bit 2n+1 is n chips and the tie-breaking chip)
+
+		"""
+		self.player = player
+		self.totalChips = k = player.totalChips
+		index = TTT.getStateIndex()
+		table = TTT.getTransitionTable()
+		opponent = TTT.PlayTTT.getOpponent(player.player)
+
+		# Holdings run from 0 to top half chips; anything above top is out
+		# of the opponent's reach, so shifted masks read ones there.
+		top = 2*k + 1
+		everything = (1 << (top + 1)) - 1
+		beyond = -1 << (top + 1)
+		classes = [sum(1 << h for h in range(parity, top + 1, 2)) for parity in (0, 1)]
+		tops = [top - 1, top]
+		winning = [0] * index.size()
+
+		for idx in range(index.size()):
+			if table.terminal[idx]:
+				winning[idx] = everything if table.winner[idx] == player.player else 0
+				continue
+			child,bid = _agentChild(index, player, idx)
+			moved = winning[child]
+			taken = everything
+			for oppChild in table.children[opponent][idx]:
+				taken &= winning[oppChild]
+			takenBeyond = taken | beyond
+
+			mask = 0
+			for parity in (0, 1):
+				# The bid the agent makes, as TTTGameSession resolves it; a
+				# marked bid it cannot raise is covered by the legality mask.
+				m = int(math.floor(bid))
+				if bid % 1 == 0.25 and parity == 0:
+					m += 1
+				cls = classes[parity]
+
+				# The holdings from which the opponent cannot match the bid.
+				unmatched = -1 << max(tops[parity] - 2*m + 1, 0)
+				won = cls & (-1 << 2*m)
+				if m > 0:
+					won &= moved << 2*m
+				if parity == 1:
+					won &= (moved << (2*m + 1)) | unmatched
+				else:
+					won &= (((takenBeyond >> (2*m + 1)) & (moved << 2*m)) | unmatched)
+
+				# Every higher bid the opponent can make must lose too: the
+				# holdings above the highest losing one of this parity.
+				losing = cls & ~taken
+				safe = -1 << losing.bit_length()
+				mask |= won & ((cls | beyond) & safe) >> (2*m + 2)
+			winning[idx] = mask & everything
+
+		self.winning = winning
+
+	def wins(self, chips, hasTieBreaker, node=None):
+		"""
+		Returns true if the strategy wins the node (the root by
+		default) holding the given whole number of chips, and the
+		tie-breaking chip if hasTieBreaker.
+
+		"""
+		if node is None:
+			node = TTT.TTTGameNode()
+		return bool(self.winning[node.index()] >> (2*chips + hasTieBreaker) & 1)
+
+	def minimalChips(self, hasTieBreaker, node=None):
+		"""
+		Returns (least, safe) for the node (the root by default): the
+		least chip count from which the strategy wins, and the least
+		from which it wins with that count and every higher one, or
+		(None, None) if it wins from none.
+
+		"""
+		counts = [n for n in range(self.totalChips + 1) if self.wins(n, hasTieBreaker, node)]
+		if not counts:
+			return None, None
+		safe = self.totalChips
+		while safe - 1 in counts:
+			safe -= 1
+		if safe not in counts:
+			return counts[0], None
+		return counts[0], safe
+
+
+def verifyChipCounts(chipCounts, share=TTT.AGENT_SHARE, player=O):
+	"""
+	Verifies the discrete-valued strategies for the given total chip
+	counts, and returns a row per count: (totalChips, allotted, least
+	and safe counts with the tie-breaking chip, least and safe counts
+	without it, and whether the allotted chips win with and without it),
+	where allotted is the count PlayTTT gives the agent.
+
+	"""
+	rows = []
+	for k in chipCounts:
+		verifier = TTTDiscreteVerifier(TTT.getStrategyCache().get(player, 'd', k))
+		allotted = int(math.ceil(share * k))
+		rows.append((k, allotted) + verifier.minimalChips(True) + verifier.minimalChips(False) +
+		            (verifier.wins(allotted, True), verifier.wins(allotted, False)))
+	return rows
+
+
+def main(argv):
+	parser = argparse.ArgumentParser(description="Verify the agent's strategies exactly.")
+	parser.add_argument('--max-chips', type=int, default=100,
+	                    help="verify discrete-valued play for every total chip count up to this (default 100)")
+	parser.add_argument('--share', type=float, default=TTT.AGENT_SHARE,
+	                    help="the agent's share of the chips to verify (default %r)" % TTT.AGENT_SHARE)
+	args = parser.parse_args(argv)
+
+	TTT.DEBUG = False
+	start = time.time()
+	verifier = TTTRealVerifier(TTT.getStrategyCache().get(O, 'r'))
+	threshold,closed = verifier.threshold()
+	print "Real-valued: the agent wins with a share %s %s (%.9f)" % (">=" if closed else ">", threshold, threshold)
+	print "  share %r: %s" % (args.share, "wins" if verifier.wins(args.share) else "DOES NOT WIN")
+	print
+	print "Discrete-valued: least chips the agent needs (least from which every higher count wins)"
+	print "and whether the chips PlayTTT allots win, with and without the tie-breaking chip"
+	print "%6s %9s %14s %14s %10s" % ("total", "allotted", "with tie chip", "without", "wins")
+
+	def show(least, safe):
+		if least is None:
+			return "-"
+		return "%d (%s)" % (least, "-" if safe is None else safe)
+
+	for k,allotted,tieLeast,tieSafe,least,safe,tieWins,wins in verifyChipCounts(range(args.max_chips + 1), args.share):
+		print "%6d %9d %14s %14s %10s" % (k, allotted, show(tieLeast, tieSafe), show(least, safe),
+		                                  "%s/%s" % ("yes" if tieWins else "no", "yes" if wins else "no"))
+	print
+	print "Verified in %.2f s" % (time.time() - start)
+
+
+if __name__ == '__main__':
+	main(sys.argv[1:])
@@ -0,0 +1,545 @@
+"""
+A KevPaDa module of checks that the solvers agree with each other and with
+the original solvers.  The scalar TTTRealPlayer and TTTDiscretePlayer are
+pinned to digests of the original code's values, moves and bids, and every
+other way of solving (vectorized, fixed-point, lazy, the chip-count table,
+the compiled strategy file) is checked against them.  It also checks the
+state index, TTTGameSession's arbitration, the instruments, the verdict
+table and the strategy cache and its speculative solves.
+
+Run 'python test_TTT.py' or 'python -m unittest test_TTT'.
+
+"""
+
+import hashlib
+import math
+import os
+import shutil
+import tempfile
+import threading
+import time
+import unittest
+
+import TTT
+from TTT import X, O, TTTGameNode, TTTGameSession
+
+
+# MD5 digests of the original solvers' values, moves and bids over the
+# canonical states, in state index order (see strategyDigest), keyed by
+# (side, biddingType, totalChips).
+BASELINE_DIGESTS = {
+	(O, 'r', 0):'9925adc46cd721243ec4a6093a6adc62',
+	(O, 'd', 1):'0881dd5e9e5b0180261868c2e142eaaf',
+	(O, 'd', 10):'a355f6fb497ee5c94a669a73a48e2346',
+	(O, 'd', 20):'8d30827125caa5433d4241722c9fa6cc',
+	(X, 'r', 0):'226400dd60f7b1be090214f3b8005f00',
+	(X, 'd', 1):'1e5f7422526583dd69939306473b8933',
+	(X, 'd', 10):'dcf6d85ed4c10135754125de13dcd108',
+	(X, 'd', 20):'4a1890579a76e19898839a22fea178ed',
+}
+
+
+# A board on which both X and O have a line, which no game reaches.
+ILLEGAL = TTTGameNode(xRep=0x007, oRep=0x038)
+
+
+def strategyDigest(player):
+	"""
+	Returns the MD5 digest of the player's value of every canonical
+	state, followed by its (move, bid) for the non-terminal ones.
+
+	"""
+	index = TTT.getStateIndex()
+	table = TTT.getTransitionTable()
+	digest = hashlib.md5()
+	for idx in range(index.size()):
+		node = index.getNode(idx)
+		digest.update(repr(player.getValue(node)))
+		if not table.terminal[idx]:
+			digest.update(repr(player.getMoveBid(node)))
+	return digest.hexdigest()
+
+
+def strategyOf(player):
+	""" Returns the list of (value, (move, bid)) of every canonical state, for comparing players. """
+	index = TTT.getStateIndex()
+	table = TTT.getTransitionTable()
+	strategy = []
+	for idx in range(index.size()):
+		node = index.getNode(idx)
+		moveBid = None if table.terminal[idx] else player.getMoveBid(node)
+		strategy.append((player.getValue(node), moveBid))
+	return strategy
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+class TestBaseline(unittest.TestCase):
+	""" The scalar and vectorized solvers against the original solvers. """
+
+	def testReal(self):
+		for side in (X, O):
+			expected = BASELINE_DIGESTS[(side, 'r', 0)]
+			self.assertEqual(strategyDigest(TTT.TTTRealPlayer(side)), expected)
+			self.assertEqual(strategyDigest(TTT.TTTRealPlayer(side, vectorized=True)), expected)
+
+	def testDiscrete(self):
+		for (side,mode,k),expected in sorted(BASELINE_DIGESTS.items()):
+			if mode == 'd':
+				self.assertEqual(strategyDigest(TTT.TTTDiscretePlayer(side, k)), expected)
+				self.assertEqual(strategyDigest(TTT.TTTDiscretePlayer(side, k, vectorized=True)), expected)
+
+	def testRootValue(self):
+		self.assertEqual(TTT.TTTRealPlayer(O, vectorized=True).getValue(TTTGameNode()), 133 / 256.0)
+
+
+class TestFixedPoint(unittest.TestCase):
+	""" The fixed-point real-valued solvers against the floating-point ones. """
+
+	def testAgreement(self):
+		for side in (X, O):
+			expected = strategyOf(TTT.TTTRealPlayer(side))
+			self.assertEqual(strategyOf(TTT.TTTRealPlayer(side, fixedPoint=True)), expected)
+			self.assertEqual(strategyOf(TTT.TTTRealPlayer(side, True, True)), expected)
+
+	def testExactNumerators(self):
+		player = TTT.TTTRealPlayer(O, True, True)
+		self.assertEqual(player.nodesToRichman[TTTGameNode().index()], 133 * TTT.RICHMAN_ONE // 256)
+		for value,moveBid in strategyOf(player):
+			self.assertEqual(value * TTT.RICHMAN_ONE % 1, 0)
+			if moveBid is not None:
+				self.assertEqual(moveBid[1] * TTT.RICHMAN_ONE % 1, 0)
+
+
+class TestLazy(unittest.TestCase):
+	""" TTTLazyPlayer against the bottom-up solvers. """
+
+	def testAgreement(self):
+		for side in (X, O):
+			self.assertEqual(strategyOf(TTT.TTTLazyPlayer(side)), strategyOf(TTT.TTTRealPlayer(side)))
+			for k in (1, 7):
+				self.assertEqual(strategyOf(TTT.TTTLazyPlayer(side, 'd', k)),
+				                 strategyOf(TTT.TTTDiscretePlayer(side, k)))
+
+	def testSolvesOnlyWhatIsReached(self):
+		node = TTTGameNode()
+		for side,move in ((X, (1, 1)), (O, (0, 0)), (X, (0, 1)), (O, (2, 1)), (X, (1, 0))):
+			node = node.generateChild(side, move)
+		# A chip count no other test solves, so the memo starts empty.
+		player = TTT.TTTLazyPlayer(O, 'd', 11)
+		self.assertEqual(len(player.memo), 0)
+		self.assertEqual(player.getMoveBid(node), TTT.TTTDiscretePlayer(O, 11).getMoveBid(node))
+		self.assertTrue(0 < len(player.memo) < 100)
+		self.assertTrue(TTT.TTTLazyPlayer(O, 'd', 11).memo is player.memo)
+
+
+class TestDiscreteTable(unittest.TestCase):
+	""" TTTDiscreteTable against TTTDiscretePlayer, chip count by chip count. """
+
+	def testAgreement(self):
+		chipCounts = [0, 1, 2, 7, 20, 33]
+		for side in (X, O):
+			table = TTT.TTTDiscreteTable(side, chipCounts)
+			for k in chipCounts:
+				expected = TTT.TTTDiscretePlayer(side, k)
+				for idx in range(TTT.getStateIndex().size()):
+					node = TTT.getStateIndex().getNode(idx)
+					self.assertEqual(table.getValue(k, node), expected.getValue(node))
+					if not TTT.getTransitionTable().terminal[idx]:
+						self.assertEqual(table.getMoveBid(k, node), expected.getMoveBid(node))
+
+	def testTerminalMoveBid(self):
+		node = TTTGameNode()
+		for move in ((0, 0), (0, 1), (0, 2)):
+			node = node.generateChild(X, move)
+		self.assertRaises(ValueError, TTT.TTTDiscreteTable(O, [4]).getMoveBid, 4, node)
+
+	def testUnsolvedChipCount(self):
+		table = TTT.TTTDiscreteTable(O, [4, 9])
+		self.assertRaises(KeyError, table.getValue, 5, TTTGameNode())
+		self.assertRaises(KeyError, table.getMoveBid, 5, TTTGameNode())
+
+
+class TestCompiled(unittest.TestCase):
+	""" Compiled strategy files against the players they were compiled from. """
+
+	def setUp(self):
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def testAgreement(self):
+		path = os.path.join(self.directory, 'strategies')
+		TTT.compileStrategies(path, [1, 20])
+		strategies = TTT.TTTStrategyFile(path)
+		try:
+			for side in (X, O):
+				self.assertEqual(strategyOf(strategies.getPlayer('r', side)),
+				                 strategyOf(TTT.TTTRealPlayer(side)))
+				for k in (1, 20):
+					self.assertEqual(strategyOf(strategies.getPlayer('d', side, k)),
+					                 strategyOf(TTT.TTTDiscretePlayer(side, k)))
+			player = strategies.getPlayer('d', O, 20)
+			self.assertRaises(ValueError, player.getValue, ILLEGAL)
+			self.assertRaises(ValueError, player.getMoveBid, ILLEGAL)
+		finally:
+			strategies.close()
+
+	def testDirectory(self):
+		path = os.path.join(self.directory, 'strategies')
+		TTT.compileStrategies(path, [3], sides=(O,))
+		strategies = TTT.TTTStrategyFile(path)
+		try:
+			self.assertTrue(strategies.hasStrategy('r', O))
+			self.assertTrue(strategies.hasStrategy('d', O, 3))
+			self.assertFalse(strategies.hasStrategy('d', O, 4))
+			self.assertFalse(strategies.hasStrategy('r', X))
+		finally:
+			strategies.close()
+		self.assertEqual(os.listdir(self.directory), ['strategies'])
+
+	def testNotAStrategyFile(self):
+		path = os.path.join(self.directory, 'other')
+		f = open(path, 'wb')
+		f.write('\0' * 4096)
+		f.close()
+		self.assertRaises(ValueError, TTT.TTTStrategyFile, path)
+
+
+class TestStateIndex(unittest.TestCase):
+	""" TTTStateIndex lookups of legal and illegal states. """
+
+	def testIllegalState(self):
+		index = TTT.getStateIndex()
+		self.assertRaises(ValueError, index.rank, ILLEGAL.xRep, ILLEGAL.oRep)
+		self.assertRaises(ValueError, index.locate, ILLEGAL.xRep, ILLEGAL.oRep)
+		for player in (TTT.TTTDiscretePlayer(O, 4, vectorized=True), TTT.TTTRealPlayer(O, vectorized=True)):
+			self.assertRaises(ValueError, player.getValue, ILLEGAL)
+			self.assertRaises(ValueError, player.getMoveBid, ILLEGAL)
+			self.assertRaises(ValueError, player.getMoveBids, [TTTGameNode(), ILLEGAL])
+
+	def testEveryLegalState(self):
+		index = TTT.getStateIndex()
+		for idx in range(index.size()):
+			node = index.getNode(idx)
+			self.assertEqual(index.locate(node.xRep, node.oRep), (idx, 0))
+
+
+class _Toss:
+	""" A stand-in for random.Random whose coin tosses all come out as value. """
+
+	def __init__(self, value):
+		self.value = value
+
+	def random(self):
+		return self.value
+
+
+class TestGameSession(unittest.TestCase):
+	""" TTTGameSession's bids, moves and arbitration, turn by turn. """
+
+	def setUp(self):
+		self.real = TTT.TTTRealPlayer(O, vectorized=True)
+		self.discrete = TTT.TTTDiscretePlayer(O, 4, vectorized=True)
+
+	def play(self, session, bid, move, decision):
+		session.submitBid(bid)
+		session.submitMove(move)
+		return session.resolve(decision)
+
+	def testStart(self):
+		session = TTTGameSession.start(self.real, 'r')
+		self.assertEqual(session.chips, {O:TTT.AGENT_SHARE, X:1 - TTT.AGENT_SHARE})
+		session = TTTGameSession.start(self.discrete, 'd', 20, userHasTieBreaker=True)
+		self.assertEqual(session.chips, {O:11.0, X:9.5})
+		session = TTTGameSession.start(self.discrete, 'd', 20)
+		self.assertEqual(session.chips, {O:11.5, X:9.0})
+		self.assertEqual(session.user, X)
+		self.assertEqual(session.gamenode, TTTGameNode())
+
+	def testLegality(self):
+		session = TTTGameSession(self.discrete, 'd', {X:2.5, O:2.0})
+		for bid in (-1, 3, 1.5, float('inf'), float('-inf'), float('nan')):
+			self.assertFalse(session.isLegalBid(bid), bid)
+			self.assertRaises(ValueError, session.submitBid, bid)
+		self.assertTrue(session.isLegalBid(2) and session.isLegalBid(0))
+		for move in ((3, 0), (0, -1), (None, 1)):
+			self.assertFalse(session.isLegalMove(move), move)
+			self.assertRaises(ValueError, session.submitMove, move)
+		session.submitBid(1)
+		self.assertFalse(session.isReady())
+		self.assertRaises(ValueError, session.resolve)
+
+	def testRealArbitration(self):
+		session = TTTGameSession(self.real, 'r', {X:0.5, O:0.5})
+		self.assertEqual(self.play(session, 0.25, (1, 1), ((0, 0), 0.125)), 1)
+		self.assertEqual(session.chips, {X:0.25, O:0.75})
+		self.assertEqual(self.play(session, 0.125, (0, 1), ((0, 0), 0.25)), 0)
+		self.assertEqual(session.chips, {X:0.5, O:0.5})
+		self.assertEqual(session.gamenode.getBoard(), [[O, TTT.BLANK, TTT.BLANK], [TTT.BLANK, X, TTT.BLANK],
+		                                               [TTT.BLANK, TTT.BLANK, TTT.BLANK]])
+
+		# Tied bids are settled by a coin toss.
+		for toss,winner in ((0.0, X), (0.9, O)):
+			session = TTTGameSession(self.real, 'r', {X:0.5, O:0.5}, _Toss(toss))
+			self.play(session, 0.25, (1, 1), ((0, 0), 0.25))
+			self.assertEqual(session.turns[-1][2], winner)
+
+	def testDiscreteTies(self):
+		# The agent holds the tie-breaking chip, and wins a tie paying it.
+		session = TTTGameSession(self.discrete, 'd', {X:2.0, O:2.5})
+		self.assertEqual(self.play(session, 1, (1, 1), ((0, 0), 1.0)), 0)
+		self.assertEqual(session.chips, {X:3.5, O:1.0})
+
+		# The user holds it, and chooses.
+		for useTieBreaker,chips in ((True, {X:1.0, O:3.5}), (False, {X:3.5, O:1.0})):
+			session = TTTGameSession(self.discrete, 'd', {X:2.5, O:2.0})
+			self.assertEqual(self.play(session, 1, (1, 1), ((0, 0), 1.0)), None)
+			self.assertTrue(session.isAwaitingTieBreak())
+			self.assertRaises(ValueError, session.submitBid, 1)
+			self.assertEqual(session.submitTieBreak(useTieBreaker), int(useTieBreaker))
+			self.assertEqual(session.chips, chips)
+			self.assertRaises(ValueError, session.submitTieBreak, True)
+
+	def testMarkedBids(self):
+		# With the tie-breaking chip the agent bids the underlying amount,
+		# and without it one chip more.
+		for chips,agentBid in ((2.5, 1.0), (2.0, 2.0)):
+			session = TTTGameSession(self.discrete, 'd', {X:4.5 - chips, O:chips})
+			session.submitBid(0)
+			session.submitMove((1, 1))
+			session.resolve(((0, 0), 1.25))
+			self.assertEqual(session.agentLastBid, agentBid)
+
+	def testBidCap(self):
+		# Below the share it was solved for, the agent may be told to bid
+		# more than it holds; it bids everything instead.
+		session = TTTGameSession(self.real, 'r', {X:0.9, O:0.1})
+		self.play(session, 0.05, (1, 1), ((0, 0), 0.3))
+		self.assertEqual((session.agentLastBid, session.chips), (0.1, {X:1.0, O:0.0}))
+		for chips,decision in ((2.0, 2.25), (2.5, 3.0), (1.0, 3.0)):
+			session = TTTGameSession(self.discrete, 'd', {X:4.5 - chips, O:chips})
+			self.play(session, 0, (1, 1), ((0, 0), decision))
+			self.assertEqual(session.agentLastBid, math.floor(chips))
+			self.assertTrue(min(session.chips.values()) >= 0)
+
+	def testBatchedDecisions(self):
+		sessions = [TTTGameSession.start(self.discrete, 'd', 4) for i in range(3)]
+		sessions.append(TTTGameSession.start(self.real, 'r'))
+		for session,move in zip(sessions, ((0, 0), (1, 1), (2, 1), (0, 2))):
+			session.gamenode = session.gamenode.generateChild(X, move)
+		self.assertEqual(TTT.getAgentMoveBids(sessions),
+		                 [session.agent.getMoveBid(session.gamenode) for session in sessions])
+		for session in sessions:
+			session.submitBid(0)
+			session.submitMove((1, 0))
+		self.assertEqual(TTT.resolveSessions(sessions), [0, 0, 0, 0])
+
+
+def _innerPhase():
+	return sum(range(100))
+
+
+class TestInstruments(unittest.TestCase):
+	""" TTTInstruments' timers and profiles. """
+
+	def testNestedProfile(self):
+		instruments = TTT.TTTInstruments(profile=True)
+		result = instruments.measure('outer', lambda: instruments.measure('inner', _innerPhase) + 1)
+		self.assertEqual(result, 4951)
+		self.assertEqual(sorted(instruments.timers), ['inner', 'outer'])
+		self.assertEqual(sorted(instruments.profiles), ['outer'])
+		self.assertTrue('_innerPhase' in instruments.profiles['outer'])
+
+		# Profiling resumes for the next outermost phase.
+		instruments.measure('next', _innerPhase)
+		self.assertTrue('_innerPhase' in instruments.profiles['next'])
+
+
+class TestVerdictTable(unittest.TestCase):
+	""" TTTVerdictTable.query against the players and TTTGameSession.resolveBid, state by state. """
+
+	def check(self, player, chips, tieBreaker):
+		index = TTT.getStateIndex()
+		nodes = [index.getNode(idx) for idx in range(index.size())]
+		count = len(nodes)
+		wins,rows,cols,bids = TTT.TTTVerdictTable(player).query(
+			[node.xRep for node in nodes], [node.oRep for node in nodes], [chips] * count, [tieBreaker] * count)
+		held = chips + 0.5 * tieBreaker
+		for i,node in enumerate(nodes):
+			value = player.getValue(node)
+			if isinstance(player, TTT.TTTRealPlayer):
+				self.assertEqual(wins[i], value == 0 or chips > value)
+			else:
+				self.assertEqual(wins[i], held >= value)
+			if node.isTerminal():
+				self.assertEqual((rows[i], cols[i]), (-1, -1))
+				continue
+			move,bid = player.getMoveBid(node)
+			if isinstance(player, TTT.TTTRealPlayer):
+				bid = min(bid, chips)
+			else:
+				bid = TTTGameSession.resolveBid(bid, held)
+			self.assertEqual(((rows[i], cols[i]), bids[i]), (move, bid), (node.xRep, node.oRep, chips, tieBreaker))
+
+	def testDiscrete(self):
+		for k in (8, 20):
+			player = TTT.TTTDiscretePlayer(O, k, vectorized=True)
+			for chips in range(k + 1):
+				for tieBreaker in (False, True):
+					self.check(player, chips, tieBreaker)
+
+	def testReal(self):
+		player = TTT.TTTRealPlayer(O, vectorized=True)
+		for chips in (0.0, 0.1, 0.25, 133 / 256.0, TTT.AGENT_SHARE, 1.0):
+			self.check(player, chips, False)
+
+	def testMarkedBidWithoutTheTieBreaker(self):
+		self.assertEqual(TTTGameSession.resolveBid(4.25, 4), 4.0)
+		self.assertEqual(TTTGameSession.resolveBid(4.25, 5), 5.0)
+		self.assertEqual(TTTGameSession.resolveBid(4.25, 4.5), 4.0)
+
+
+class _GatedCache(TTT.TTTStrategyCache):
+	"""
+	A TTTStrategyCache whose solves of the keys in gates wait for their
+	gate to open, then stop if their speculation has been cancelled.
+
+	"""
+
+	def __init__(self, budget=TTT.TTTStrategyCache.DEFAULT_BUDGET):
+		TTT.TTTStrategyCache.__init__(self, budget)
+		self.gates = {}
+
+	def solve(self, side, mode, totalChips):
+		gate = self.gates.get((side, mode, totalChips))
+		if gate is not None:
+			gate.wait()
+			TTT._checkCancelled()
+		return TTT.TTTStrategyCache.solve(self, side, mode, totalChips)
+
+	def gate(self, totalChips):
+		""" Closes the gate of O's discrete-valued player of totalChips. """
+		gate = self.gates[(O, 'd', totalChips)] = threading.Event()
+		return gate
+
+	def waitForRequests(self, key, count):
+		""" Waits until key has been asked for count times. """
+		for i in range(3000):
+			with self._lock:
+				if self.requests.get(key, 0) >= count:
+					return
+			time.sleep(0.01)
+		raise AssertionError("%r was not requested" % (key,))
+
+
+class TestStrategyCache(unittest.TestCase):
+	""" The strategy cache's eviction, statistics and shared solves. """
+
+	def testEviction(self):
+		size = TTT.TTTStrategyCache.estimateSize(TTT.TTTDiscretePlayer(O, 2, vectorized=True))
+		cache = TTT.TTTStrategyCache(2 * size)
+		two = cache.get(O, 'd', 2)
+		cache.get(O, 'd', 3)
+		self.assertTrue(cache.get(O, 'd', 2) is two)
+		cache.get(O, 'd', 4)
+		self.assertEqual([cache.contains(O, 'd', k) for k in (2, 3, 4)], [True, False, True])
+		self.assertEqual(cache.stats(), {'hits':1, 'misses':3, 'evictions':1, 'players':2, 'size':2 * size,
+		                                 'budget':2 * size})
+		self.assertEqual(cache.popular(1), [(O, 'd', 2)])
+
+		# The player just added stays, even beyond the budget.
+		cache = TTT.TTTStrategyCache(1)
+		cache.get(O, 'd', 2)
+		cache.get(O, 'd', 3)
+		self.assertEqual([cache.contains(O, 'd', k) for k in (2, 3)], [False, True])
+		cache.clear()
+		self.assertEqual((cache.stats()['players'], cache.stats()['size'], cache.stats()['evictions']), (0, 0, 1))
+
+	def testRealKey(self):
+		cache = TTT.TTTStrategyCache()
+		player = cache.get(O, 'r', 20)
+		self.assertTrue(cache.contains(O, 'r') and cache.get(O, 'r') is player)
+
+	def testJoin(self):
+		# Two requests for the same player share one solve.
+		cache = _GatedCache()
+		gate = cache.gate(4)
+		players = []
+		threads = [threading.Thread(target=lambda: players.append(cache.get(O, 'd', 4))) for i in range(2)]
+		for thread in threads:
+			thread.start()
+		cache.waitForRequests((O, 'd', 4), 2)
+		gate.set()
+		for thread in threads:
+			thread.join(30)
+		self.assertTrue(len(players) == 2 and players[0] is players[1])
+		self.assertEqual((cache.stats()['misses'], cache.stats()['hits']), (1, 1))
+
+
+class TestSpeculation(unittest.TestCase):
+	""" Speculative solves: completion, joining, and cancellation. """
+
+	def testSpeculate(self):
+		cache = TTT.TTTStrategyCache()
+		speculation = cache.speculate([(O, 'd', 2), (O, 'd', 3)])
+		speculation.join(60)
+		self.assertFalse(speculation.isAlive())
+		self.assertEqual(speculation.solved, [(O, 'd', 2), (O, 'd', 3)])
+		self.assertTrue(cache.speculation is None)
+		self.assertEqual(cache.requests, {})
+		cache.get(O, 'd', 3)
+		self.assertEqual((cache.stats()['misses'], cache.stats()['hits']), (2, 1))
+
+	def testJoinSpeculation(self):
+		# A request for the player being solved waits for it, without cancelling.
+		cache = _GatedCache()
+		gate = cache.gate(4)
+		speculation = cache.speculate([(O, 'd', 4)])
+		players = []
+		thread = threading.Thread(target=lambda: players.append(cache.get(O, 'd', 4)))
+		thread.start()
+		cache.waitForRequests((O, 'd', 4), 1)
+		gate.set()
+		thread.join(30)
+		speculation.join(30)
+		self.assertFalse(speculation.cancelled.is_set())
+		self.assertEqual(speculation.solved, [(O, 'd', 4)])
+		self.assertTrue(players[0] is cache.get(O, 'd', 4))
+		self.assertEqual(cache.stats()['misses'], 1)
+
+	def testMissCancels(self):
+		# A request that misses cancels the speculation, which stops unsolved.
+		cache = _GatedCache()
+		gate = cache.gate(4)
+		speculation = cache.speculate([(O, 'd', 4), (O, 'd', 5)])
+		cache.get(O, 'd', 6)
+		self.assertTrue(speculation.cancelled.is_set())
+		gate.set()
+		speculation.join(30)
+		self.assertFalse(speculation.isAlive())
+		self.assertEqual(speculation.solved, [])
+		self.assertTrue(cache.speculation is None)
+		self.assertEqual([cache.contains(O, 'd', k) for k in (4, 5, 6)], [False, False, True])
+
+		# The cancelled solve leaves nothing pending: asking for its player solves it.
+		cache.gates.clear()
+		self.assertTrue(cache.get(O, 'd', 4) is not None and cache.contains(O, 'd', 4))
+
+	def testSpeculateAgain(self):
+		cache = _GatedCache()
+		gate = cache.gate(4)
+		first = cache.speculate([(O, 'd', 4)])
+		second = cache.speculate([(O, 'd', 5)])
+		self.assertTrue(first.cancelled.is_set() and cache.speculation in (second, None))
+		gate.set()
+		first.join(30)
+		second.join(30)
+		self.assertEqual((first.solved, second.solved), ([], [(O, 'd', 5)]))
+
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)
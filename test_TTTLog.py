@@ -0,0 +1,94 @@
+"""
+A KevPaDa module of checks of TTTLog: that the record of a played game goes
+through a log file and back unchanged, and that the analyzer scores optimal
+play as optimal.
+
+Run 'python test_TTTLog.py' or 'python -m unittest test_TTTLog'.
+
+"""
+
+import StringIO
+import unittest
+
+import TTT
+import TTTLog
+from TTT import X, O, TTTGameSession
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+def playOptimally(session):
+	"""
+	Plays a session to the end, the user making the moves and bids of
+	the solved player of its side.  Returns the session.
+
+	"""
+	user = TTT.getStrategyCache().get(session.user, session.biddingType, int(sum(session.chips.values())))
+	while not session.isOver():
+		move,bid = user.getMoveBid(session.gamenode)
+		if session.biddingType == 'd':
+			bid = TTTGameSession.resolveBid(bid, session.chips[session.user])
+		session.submitBid(min(bid, session.chips[session.user]))
+		session.submitMove(move)
+		if session.resolve() is None:
+			session.submitTieBreak(False)
+	return session
+
+
+class TestLog(unittest.TestCase):
+	""" Game records written to a log, read back and analyzed. """
+
+	def setUp(self):
+		cache = TTT.getStrategyCache()
+		self.sessions = [TTTGameSession.start(cache.get(O, 'd', 20), 'd', 20),
+		                 TTTGameSession.start(cache.get(O, 'd', 20), 'd', 20, userHasTieBreaker=True),
+		                 TTTGameSession.start(cache.get(O, 'r'), 'r')]
+		self.records = [playOptimally(session).logRecord(game) for game,session in enumerate(self.sessions)]
+
+	def testRoundTrip(self):
+		f = StringIO.StringIO()
+		for record in self.records:
+			TTTLog.writeGame(f, record)
+		f.seek(0)
+		self.assertEqual(f.getvalue().count('\n'), len(self.records))
+		self.assertEqual(list(TTTLog.readGames(f)), self.records)
+
+	def testRecord(self):
+		record = self.records[0]
+		self.assertEqual((record['game'], record['mode'], record['chipNo'], record['agent']), (0, 'd', 20, O))
+		self.assertEqual(record['turns'][0]['chips'], [9.0, 11.5])
+		self.assertEqual(len(record['turns']), len(self.sessions[0].turns))
+		for turn in record['turns']:
+			self.assertIn(turn['winner'], (X, O))
+			self.assertIn(turn['paid'], turn['bids'] + [turn['bids'][0] + 0.5, turn['bids'][1] + 0.5])
+
+	def testAnalyzeOptimalPlay(self):
+		f = StringIO.StringIO()
+		for record in self.records:
+			TTTLog.writeGame(f, record)
+		f.seek(0)
+		perGame = StringIO.StringIO()
+		report = TTTLog.analyzeLog(f, perGame)
+		self.assertEqual((report['games'], report['turns']), (3, sum(len(r['turns']) for r in self.records)))
+		self.assertEqual(sum(report['wins'].values()), 3)
+		self.assertEqual(report['wins'][O], sum(session.winner() == O for session in self.sessions))
+		for side in (X, O):
+			self.assertEqual(report['sides'][side]['optimalBidRate'], 1.0)
+			self.assertEqual(report['sides'][side]['optimalMoveRate'], 1.0)
+		self.assertEqual(len(perGame.getvalue().splitlines()), 3)
+
+	def testSuboptimalBid(self):
+		# The user overbids by one chip on the first turn of an optimal game.
+		record = dict(self.records[0])
+		xBid,oBid = record['turns'][0]['bids']
+		record['turns'] = [dict(record['turns'][0], bids=[xBid + 1, oBid])]
+		game = TTTLog.TTTLogAnalyzer().analyzeGame(record)
+		self.assertEqual((game['game'], game['turns'], game['winner']), (0, 1, None))
+		self.assertEqual(game['decisions'][0][X]['optimalBid'], xBid)
+		self.assertEqual((game['sides'][X]['optimalBids'], game['sides'][O]['optimalBids']), (0, 1))
+
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)
@@ -0,0 +1,81 @@
+"""
+A KevPaDa module of checks of TTTMonteCarlo: the confidence intervals, that a
+seed reproduces its estimate, and that the table policy's estimate agrees
+with the solved value of the empty board.
+
+Run 'python test_TTTMonteCarlo.py' or 'python -m unittest test_TTTMonteCarlo'.
+
+"""
+
+import unittest
+
+import TTT
+import TTTMonteCarlo
+import TTTVariant
+from TTT import X, O
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+class TestIntervals(unittest.TestCase):
+	""" The normal quantile and the Wilson score interval. """
+
+	def testNormalQuantile(self):
+		self.assertAlmostEqual(TTTMonteCarlo.normalQuantile(0.95), 1.959964, places=5)
+		self.assertAlmostEqual(TTTMonteCarlo.normalQuantile(0.99), 2.575829, places=5)
+
+	def testWilsonInterval(self):
+		self.assertEqual(TTTMonteCarlo.wilsonInterval(0, 0), (0.0, 1.0))
+		self.assertEqual(TTTMonteCarlo.wilsonInterval(0, 100)[0], 0.0)
+		self.assertEqual(TTTMonteCarlo.wilsonInterval(100, 100)[1], 1.0)
+		low,high = TTTMonteCarlo.wilsonInterval(50, 100)
+		self.assertAlmostEqual(low + high, 1.0)
+		self.assertTrue(0.40 < low < 0.41 and 0.59 < high < 0.60, (low, high))
+
+
+class TestMonteCarlo(unittest.TestCase):
+	""" Estimates of random-turn win probabilities. """
+
+	def setUp(self):
+		self.player = TTT.getStrategyCache().get(O, 'r')
+
+	def testReproducible(self):
+		for policy in ('table', 'uniform'):
+			first = TTTMonteCarlo.TTTMonteCarlo(player=self.player, seed=7).estimate(playouts=3000, policy=policy,
+			                                                                          batchSize=1000)
+			second = TTTMonteCarlo.TTTMonteCarlo(player=self.player, seed=7).estimate(playouts=3000, policy=policy,
+			                                                                           batchSize=1000)
+			other = TTTMonteCarlo.TTTMonteCarlo(player=self.player, seed=8).estimate(playouts=3000, policy=policy,
+			                                                                          batchSize=1000)
+			counts = lambda result: (result['wins'], result['draws'], result['losses'])
+			self.assertEqual(counts(first), counts(second))
+			self.assertNotEqual(counts(first), counts(other))
+			self.assertEqual(sum(counts(first)), 3000)
+
+	def testTableEstimate(self):
+		result = TTTMonteCarlo.TTTMonteCarlo(player=self.player).estimate(playouts=20000)
+		rootValue = self.player.getValue(TTT.TTTGameNode())
+		self.assertTrue(result['low'] <= 1 - rootValue <= result['high'], (result, rootValue))
+
+	def testOutcomes(self):
+		monteCarlo = TTTMonteCarlo.TTTMonteCarlo(player=self.player)
+		won = TTT.TTTGameNode().generateChild(X, (0, 0)).generateChild(X, (0, 1)).generateChild(X, (0, 2))
+		outcomes = monteCarlo.playBatch(won.xRep, won.oRep, 10)
+		self.assertEqual(list(outcomes), [TTTMonteCarlo.X_WINS] * 10)
+		self.assertEqual(monteCarlo.estimate(won, playouts=10, player=X, policy='uniform')['p'], 1.0)
+
+	def testPolicies(self):
+		monteCarlo = TTTMonteCarlo.TTTMonteCarlo(player=self.player)
+		self.assertRaises(ValueError, monteCarlo.playBatch, 0, 0, 10, 'greedy')
+		self.assertRaises(ValueError, monteCarlo.estimate, playouts=10, player=X)
+		self.assertRaises(ValueError, TTTMonteCarlo.TTTMonteCarlo().estimate, playouts=10)
+		variant = TTTVariant.TTTVariant(4, 4, 3)
+		result = TTTMonteCarlo.TTTMonteCarlo(variant).estimate(playouts=1000, policy='uniform')
+		self.assertEqual(result['wins'] + result['draws'] + result['losses'], 1000)
+		self.assertRaises(ValueError, TTTMonteCarlo.TTTMonteCarlo(variant, self.player).estimate, playouts=10)
+
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)
@@ -0,0 +1,159 @@
+"""
+A KevPaDa module of checks of TTTServer: the protocol of each op, the errors
+that leave a connection open, and the expiry of games and connections.  Each
+check runs a server on a thread of its own, on a free local port.
+
+Run 'python test_TTTServer.py' or 'python -m unittest test_TTTServer'.
+
+"""
+
+import json
+import random
+import socket
+import threading
+import unittest
+
+import TTT
+import TTTServer
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+class ServerCase(unittest.TestCase):
+	""" A connection to a server of the real-valued game and the 4-chip game. """
+
+	sessionTimeout = 300.0
+	idleTimeout = 600.0
+
+	def setUp(self):
+		self.server = TTTServer.TTTServer(port=0, chipCounts=[4], sessionTimeout=self.sessionTimeout,
+		                                  idleTimeout=self.idleTimeout, rng=random.Random(0))
+		self.server.prewarm()
+		self.thread = threading.Thread(target=self.server.serve, kwargs={'pollInterval':0.01})
+		self.thread.daemon = True
+		self.thread.start()
+		self.connection = socket.create_connection(self.server.address)
+		self.connection.settimeout(30)
+		self.lines = self.connection.makefile()
+
+	def tearDown(self):
+		self.lines.close()
+		self.connection.close()
+		self.server.stop()
+		self.thread.join(30)
+		self.server.shutdown()
+
+	def send(self, request):
+		""" Sends one request line and returns its response. """
+		if not isinstance(request, str):
+			request = json.dumps(request)
+		self.connection.sendall(request + '\n')
+		return self.receive()
+
+	def receive(self):
+		line = self.lines.readline()
+		self.assertTrue(line, "the server closed the connection")
+		return json.loads(line)
+
+	def assertError(self, response, text):
+		self.assertFalse(response['ok'])
+		self.assertTrue(response['error'].startswith(text), response['error'])
+
+
+class TestServer(ServerCase):
+	""" The protocol of each op. """
+
+	def testDiscreteGame(self):
+		state = self.send({'op':'new', 'mode':'d', 'chipNo':4, 'id':'a'})
+		self.assertTrue(state['ok'])
+		self.assertEqual(state['id'], 'a')
+		self.assertEqual((state['mode'], state['chips'], state['board']), ('d', [1, 3.5], [' '*3]*3))
+		self.assertFalse(state['over'])
+		id = state['session']
+		state = self.send({'op':'turn', 'session':id, 'bid':0, 'move':[0, 0], 'id':7})
+		self.assertTrue(state['ok'])
+		self.assertEqual((state['id'], state['session'], state['userLastBid']), (7, id, 0))
+		self.assertFalse(state['userWonLastBid'])
+		self.assertEqual(sum(row.count('O') for row in state['board']), 1)
+		del state['id']
+		self.assertEqual(self.send({'op':'state', 'session':id}), state)
+		self.assertEqual(self.send({'op':'close', 'session':id}), {'ok':True, 'session':id})
+		self.assertError(self.send({'op':'state', 'session':id}), "unknown session")
+
+	def testRealGame(self):
+		state = self.send({'op':'new', 'mode':'r'})
+		self.assertEqual((state['mode'], state['chips']), ('r', [1-TTT.AGENT_SHARE, TTT.AGENT_SHARE]))
+		id = state['session']
+		while not state['over']:
+			row,column = [(i, j) for i in range(3) for j in range(3) if state['board'][i][j] == ' '][0]
+			state = self.send({'op':'turn', 'session':id, 'bid':0.0, 'move':[row, column]})
+			self.assertTrue(state['ok'], state)
+			if state['awaitingTieBreak']:
+				state = self.send({'op':'tieBreak', 'session':id, 'use':False})
+		self.assertEqual(state['winner'], 'O')
+		self.assertError(self.send({'op':'state', 'session':id}), "unknown session")
+
+	def testTieBreak(self):
+		state = self.send({'op':'new', 'mode':'d', 'chipNo':4, 'tieBreaker':True})
+		self.assertEqual(state['chips'], [1.5, 3])
+		id = state['session']
+		self.assertError(self.send({'op':'tieBreak', 'session':id, 'use':True}), "no tie-break decision")
+		state = self.send({'op':'turn', 'session':id, 'bid':1, 'move':[1, 1]})
+		self.assertTrue(state['awaitingTieBreak'])
+		self.assertEqual(state['board'], [' '*3]*3)
+		state = self.send({'op':'tieBreak', 'session':id, 'use':True})
+		self.assertFalse(state['awaitingTieBreak'])
+		self.assertTrue(state['userWonLastBid'])
+		self.assertEqual((state['board'][1], state['chips']), (' X ', [0, 4.5]))
+
+	def testErrors(self):
+		self.assertError(self.send({'op':'new', 'mode':'d', 'chipNo':20}), "chipNo must be one of 4")
+		self.assertError(self.send({'op':'new', 'mode':'x'}), "mode must be")
+		self.assertError(self.send({'op':'state', 'session':99}), "unknown session")
+		self.assertError(self.send('[1, 2]'), "a request must be a JSON object")
+		self.assertError(self.send('not json'), "")
+		self.assertError(self.send({'op':'jump'}), "unknown op")
+		id = self.send({'op':'new', 'mode':'d', 'chipNo':4})['session']
+		for bid in ('NaN', 'Infinity', '"3"', 'true'):
+			response = self.send('{"op":"turn","session":%d,"bid":%s,"move":[0,0]}' % (id, bid))
+			self.assertError(response, "bid must be a finite number")
+		self.assertError(self.send({'op':'turn', 'session':id, 'bid':9, 'move':[0, 0]}), "illegal bid")
+		self.assertError(self.send({'op':'turn', 'session':id, 'bid':1, 'move':[0]}), "move must be")
+		state = self.send({'op':'state', 'session':id})
+		self.assertEqual((state['ok'], state['board']), (True, [' '*3]*3))
+		self.assertTrue(self.send({'op':'turn', 'session':id, 'bid':1, 'move':[0, 0]})['ok'])
+
+	def testMetrics(self):
+		id = self.send({'op':'new', 'mode':'d', 'chipNo':4})['session']
+		self.send({'op':'turn', 'session':id, 'bid':1, 'move':[0, 0]})
+		self.send({'op':'jump'})
+		metrics = self.send({'op':'metrics'})['metrics']
+		self.assertEqual(metrics['counters']['sessions.started'], 1)
+		self.assertEqual(metrics['counters']['turns'], 1)
+		self.assertEqual(metrics['counters']['errors'], 1)
+		self.assertEqual(metrics['counters']['requests'], 4)
+		self.assertEqual((metrics['gauges']['connections'], metrics['gauges']['sessions']), (1, 1))
+		self.assertIn('strategyCache', metrics)
+
+
+class TestTimeouts(ServerCase):
+	""" A server whose games and connections time out quickly. """
+
+	sessionTimeout = 0.2
+	idleTimeout = 60.0
+
+	def testSessionExpiry(self):
+		id = self.send({'op':'new', 'mode':'d', 'chipNo':4})['session']
+		self.assertEqual(self.receive(), {'ok':False, 'session':id, 'error':"session expired"})
+		self.assertError(self.send({'op':'state', 'session':id}), "unknown session")
+		self.assertEqual(self.send({'op':'metrics'})['metrics']['counters']['sessions.expired'], 1)
+
+	def testIdleTimeout(self):
+		self.server.idleTimeout = 0.2
+		self.assertEqual(self.lines.readline(), '')
+
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)
@@ -0,0 +1,56 @@
+"""
+A KevPaDa module of checks of TTTTournament: the opponents, the agent's chip
+shares, and that the results of a seed do not depend on the number of
+workers.
+
+Run 'python test_TTTTournament.py' or 'python -m unittest test_TTTTournament'.
+
+"""
+
+import unittest
+
+import TTT
+import TTTTournament
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+class TestTournament(unittest.TestCase):
+	""" Tournaments of the agent against the scripted opponents. """
+
+	def testFractionOpponents(self):
+		for spec in ('fraction:1.5', 'fraction:-0.1', 'fraction:nan', 'fraction:x', 'nobody'):
+			self.assertRaises(ValueError, TTTTournament.checkOpponent, spec)
+			self.assertRaises(ValueError, TTTTournament.runTournament, 10, opponent=spec, workers=1)
+		for spec in ('fraction:0', 'fraction:1'):
+			self.assertEqual(TTTTournament.runTournament(50, 'd', 10, opponent=spec, workers=1)['games'], 50)
+
+	def testSharesBelowTheThreshold(self):
+		# Below 133/256 the agent's strategy may bid more than it holds, but
+		# its bids are capped, so its share of the chips never goes negative.
+		for mode,chipNo,opponent in (('r', 0, 'random'), ('d', 20, 'random'), ('d', 20, 'allin')):
+			report = TTTTournament.runTournament(500, mode, chipNo, 0.3, opponent, workers=1)
+			self.assertTrue(min(turn['min'] for turn in report['agentChipShare']) >= 0)
+
+	def testWorkers(self):
+		# Shards are seeded by their number, so the pool does not change
+		# the results.
+		serial = TTTTournament.runTournament(3000, 'd', 20, opponent='agent', workers=1, seed=3)
+		pooled = TTTTournament.runTournament(3000, 'd', 20, opponent='agent', workers=2, seed=3)
+		for key in ('games', 'winRate', 'drawRate', 'lossRate', 'turnsPerGame', 'agentChipShare'):
+			self.assertEqual(serial[key], pooled[key], key)
+
+	def testMerge(self):
+		stats = TTTTournament.TTTTournamentStats()
+		for seed in range(3):
+			stats.merge(TTTTournament.playShard(('r', 0, TTT.AGENT_SHARE, 'random', False, seed, 100)))
+		report = stats.report()
+		self.assertEqual(report['games'], 300)
+		self.assertAlmostEqual(report['winRate'] + report['drawRate'] + report['lossRate'], 1.0)
+		self.assertEqual(report['agentChipShare'][0]['games'], 300)
+
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)
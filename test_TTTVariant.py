@@ -0,0 +1,134 @@
+"""
+A KevPaDa module of checks of TTTVariant: that TTTVariant(3, 3, 3) solves to
+the same values, moves and bids as TTT's players, and that the out-of-core
+and parallel solvers produce the same strategies as the serial in-memory
+one.
+
+Run 'python test_TTTVariant.py' or 'python -m unittest test_TTTVariant'.
+
+"""
+
+import os
+import shutil
+import tempfile
+import unittest
+
+import TTT
+import TTTVariant
+from TTT import X, O
+
+
+def variantStrategyOf(index, player):
+	""" Returns the list of (value, (move, bid)) of every canonical state of a TTTVariantIndex. """
+	variant = index.variant
+	mask = (1 << variant.size) - 1
+	strategy = []
+	for key in index.keys:
+		node = TTTVariant.TTTVariantNode(variant, key >> variant.size, key & mask)
+		moveBid = None if node.isTerminal() else player.getMoveBid(node)
+		strategy.append((player.getValue(node), moveBid))
+	return strategy
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+class TestVariant(unittest.TestCase):
+	""" TTTVariant against TTT. """
+
+	def testWinMasks(self):
+		self.assertEqual(sorted(TTTVariant.TTTVariant(3, 3, 3).winMasks), sorted(TTT.WIN_MASKS))
+
+	def testTicTacToe(self):
+		variant = TTTVariant.TTTVariant(3, 3, 3)
+		index = TTTVariant.TTTVariantIndex(variant)
+		self.assertEqual(index.size(), TTT.getStateIndex().size())
+		for side in (X, O):
+			for mode,k,player in (('r', 0, TTT.TTTRealPlayer(side)), ('d', 10, TTT.TTTDiscretePlayer(side, 10))):
+				solved = TTTVariant.TTTVariantPlayer(index, side, mode, k)
+				for idx in range(TTT.getStateIndex().size()):
+					node = TTT.getStateIndex().getNode(idx)
+					twin = TTTVariant.TTTVariantNode(variant, node.xRep, node.oRep)
+					self.assertEqual(solved.getValue(twin), player.getValue(node))
+					if not node.isTerminal():
+						self.assertEqual(solved.getMoveBid(twin), player.getMoveBid(node))
+
+	def testTerminalMoveBid(self):
+		variant = TTTVariant.TTTVariant(3, 3, 3)
+		player = TTTVariant.TTTVariantPlayer(TTTVariant.TTTVariantIndex(variant), O, 'd', 4)
+		self.assertRaises(ValueError, player.getMoveBid, TTTVariant.TTTVariantNode(variant, 0x007, 0x018))
+
+
+
+class TestOutOfCore(unittest.TestCase):
+	""" solveToFile and TTTVariantStrategyFile against TTTVariantPlayer. """
+
+	def setUp(self):
+		self.variant = TTTVariant.TTTVariant(3, 4, 3)
+		self.index = TTTVariant.TTTVariantIndex(self.variant)
+		self.directory = tempfile.mkdtemp()
+
+	def tearDown(self):
+		shutil.rmtree(self.directory)
+
+	def solve(self, mode, k, memoryCeiling=None):
+		""" Solves the variant to a file, and returns it opened. """
+		path = os.path.join(self.directory, '%s%d' % (mode, k))
+		TTTVariant.solveToFile(self.variant, path, O, mode, k, memoryCeiling)
+		return TTTVariant.TTTVariantStrategyFile(path)
+
+	def testStrategies(self):
+		for mode,k in (('r', 0), ('d', 10)):
+			strategies = self.solve(mode, k)
+			try:
+				player = TTTVariant.TTTVariantPlayer(self.index, O, mode, k)
+				self.assertEqual(variantStrategyOf(self.index, strategies), variantStrategyOf(self.index, player))
+				won = TTTVariant.TTTVariantNode(self.variant, 0x007, 0x030)
+				self.assertRaises(ValueError, player.getMoveBid, won)
+				self.assertRaises(ValueError, strategies.getMoveBid, won)
+			finally:
+				strategies.close()
+
+	def testMemoryCeiling(self):
+		# Room for the largest layer to be resident and a chunk of 16 states,
+		# so that the layers after it are solved in many chunks.
+		largest = max(len(self.index.layer(i)) for i in range(self.variant.size + 1))
+		ceiling = TTTVariant.RESIDENT_BYTES * largest + TTTVariant.CHUNK_BYTES * 16
+		strategies = self.solve('d', 10, ceiling)
+		try:
+			player = TTTVariant.TTTVariantPlayer(self.index, O, 'd', 10)
+			self.assertEqual(variantStrategyOf(self.index, strategies), variantStrategyOf(self.index, player))
+		finally:
+			strategies.close()
+
+		self.assertRaises(MemoryError, self.solve, 'r', 0, TTTVariant.CHUNK_BYTES - 1)
+		self.assertEqual(os.listdir(self.directory), ['d10'])
+
+
+class TestParallel(unittest.TestCase):
+	""" Parallel solves of TTTVariantPlayer against serial ones. """
+
+	def check(self, variant, workers, minStates):
+		index = TTTVariant.TTTVariantIndex(variant)
+		default = TTTVariant.TTTVariantPlayer.PARALLEL_MIN_STATES
+		TTTVariant.TTTVariantPlayer.PARALLEL_MIN_STATES = minStates
+		try:
+			for mode,k in (('r', 0), ('d', 10)):
+				parallel = TTTVariant.TTTVariantPlayer(index, X, mode, k, workers=workers)
+				self.assertEqual(variantStrategyOf(index, parallel),
+				                 variantStrategyOf(index, TTTVariant.TTTVariantPlayer(index, X, mode, k)))
+		finally:
+			TTTVariant.TTTVariantPlayer.PARALLEL_MIN_STATES = default
+		self.assertEqual(TTTVariant._shared, None)
+
+	def testEveryLayerInWorkers(self):
+		# Hand out every layer, however small, to the workers.
+		self.check(TTTVariant.TTTVariant(3, 3, 3), 3, 0)
+		self.check(TTTVariant.TTTVariant(3, 4, 3), 2, 0)
+
+	def testLargeLayersInWorkers(self):
+		self.check(TTTVariant.TTTVariant(3, 4, 3), 2, TTTVariant.TTTVariantPlayer.PARALLEL_MIN_STATES)
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)
@@ -0,0 +1,124 @@
+"""
+A KevPaDa module of checks of TTTVerify: the exact winning thresholds of the
+real-valued strategy against its Richman values, and the winning chip counts
+of the discrete-valued strategies against a brute-force play-out of every
+opponent through TTT.TTTGameSession.
+
+Run 'python test_TTTVerify.py' or 'python -m unittest test_TTTVerify'.
+
+"""
+
+import math
+import random
+import unittest
+from fractions import Fraction
+
+import TTT
+import TTTVerify
+from TTT import O, TTTGameNode, TTTGameSession
+
+
+def setUpModule():
+	TTT.DEBUG = False
+
+
+def bruteForceWins(player, k):
+	"""
+	Returns a function of (node, chips) that says, by playing out every
+	bid, move and tie-breaking choice of the opponent through
+	TTTGameSession, whether the discrete-valued player's strategy wins
+	the node holding the given chips (in half chips, as TTTGameSession
+	holds them) out of k.
+
+	"""
+	opponent = TTT.PlayTTT.getOpponent(player.player)
+	memo = {}
+
+	def session(node, chips, bid, move):
+		game = TTTGameSession(player, 'd', {player.player:chips, opponent:k + 0.5 - chips})
+		game.gamenode = node
+		game.submitBid(bid)
+		game.submitMove(move)
+		return game
+
+	def wins(node, chips):
+		key = (node.xRep, node.oRep, chips)
+		if key in memo:
+			return memo[key]
+		if node.isTerminal():
+			result = node.isWin(player.player)
+		else:
+			result = True
+			for bid in range(int(k + 0.5 - chips) + 1):
+				for move in node.generateLegalMoves():
+					games = []
+					if session(node, chips, bid, move).resolve() is None:
+						for useTieBreaker in (True, False):
+							game = session(node, chips, bid, move)
+							game.resolve()
+							game.submitTieBreak(useTieBreaker)
+							games.append(game)
+					else:
+						game = session(node, chips, bid, move)
+						game.resolve()
+						games.append(game)
+					if not all(wins(game.gamenode, game.chips[player.player]) for game in games):
+						result = False
+						break
+				if not result:
+					break
+		memo[key] = result
+		return result
+
+	return wins
+
+
+class TestVerify(unittest.TestCase):
+	""" The exact verifiers against the solved values and against brute force. """
+
+	def testRealThresholds(self):
+		player = TTT.TTTRealPlayer(O, vectorized=True)
+		verifier = TTTVerify.TTTRealVerifier(player)
+		index = TTT.getStateIndex()
+		for idx in range(index.size()):
+			threshold,closed = verifier.thresholds[idx]
+			value = Fraction(player.getValue(index.getNode(idx)))
+			if threshold == float('inf'):
+				self.assertTrue(value >= 1)
+			else:
+				self.assertEqual(max(threshold, 0), value)
+		self.assertEqual(verifier.threshold(), (Fraction(133, 256), False))
+		self.assertTrue(verifier.wins(TTT.AGENT_SHARE))
+
+	def testDiscreteBruteForce(self):
+		index = TTT.getStateIndex()
+		rng = random.Random(0)
+		for k in range(7):
+			player = TTT.TTTDiscretePlayer(O, k, vectorized=True)
+			verifier = TTTVerify.TTTDiscreteVerifier(player)
+			wins = bruteForceWins(player, k)
+			for n in range(k + 1):
+				for hasTieBreaker in (False, True):
+					self.assertEqual(verifier.wins(n, hasTieBreaker), wins(TTTGameNode(), n + 0.5 * hasTieBreaker),
+					                 (k, n, hasTieBreaker))
+			for i in range(100):
+				node = index.getNode(rng.randrange(index.size()))
+				n = rng.randint(0, k)
+				hasTieBreaker = rng.random() < 0.5
+				self.assertEqual(verifier.wins(n, hasTieBreaker, node), wins(node, n + 0.5 * hasTieBreaker),
+				                 (k, n, hasTieBreaker, node.xRep, node.oRep))
+
+	def testVerifyChipCounts(self):
+		for row in TTTVerify.verifyChipCounts([0, 7, 20]):
+			k,allotted,tieLeast,tieSafe,least,safe,tieWins,wins = row
+			verifier = TTTVerify.TTTDiscreteVerifier(TTT.getStrategyCache().get(O, 'd', k))
+			self.assertEqual(allotted, int(math.ceil(TTT.AGENT_SHARE * k)))
+			self.assertEqual((tieLeast, tieSafe), verifier.minimalChips(True))
+			self.assertEqual((least, safe), verifier.minimalChips(False))
+			self.assertEqual((tieWins, wins), (verifier.wins(allotted, True), verifier.wins(allotted, False)))
+			if tieSafe is not None:
+				self.assertTrue(all(verifier.wins(n, True) for n in range(tieSafe, k + 1)))
+
+
+if __name__ == '__main__':
+	unittest.main(buffer=True)